@@ -1,26 +1,35 @@
 import json
-import numpy as np
+import statistics
+import run_registry
+from llm_providers import is_same_member
 
 RAW_PREDICTIONS_FILE = "hotel_preds_raw.json"
 FINAL_FORECAST_FILE = "hotel_final.json"
 
-def main():
-    try:
-        with open(RAW_PREDICTIONS_FILE, 'r') as f:
-            raw_predictions = json.load(f)
-    except FileNotFoundError:
-        print(f"Error: Raw predictions file {RAW_PREDICTIONS_FILE} not found.")
-        return
-    except json.JSONDecodeError:
-        print(f"Error: Could not decode JSON from {RAW_PREDICTIONS_FILE}.")
-        return
-
+def aggregate_predictions(raw_predictions, excluded_members=None):
+    """
+    Aggregates the valid forecasts in raw_predictions into the final forecast dict.
+    Entries matching any of excluded_members (e.g. outliers flagged by a critic) are left out.
+    Forecasts answered by a hedge call (see the ensemble scripts' run_member) are counted in
+    hedged_forecasts, and those from a substitute model also in substitute_forecasts.
+    """
+    excluded_members = excluded_members or []
     valid_forecasts = []
+    excluded_count = 0
+    hedged_count = substitute_count = 0
     for pred in raw_predictions:
+        if any(is_same_member(pred, member) for member in excluded_members):
+            excluded_count += 1
+            print(f"Note: Excluding {pred.get('provider')} {pred.get('model_name')} (temp={pred.get('temperature')}) as recommended.")
+            continue
         if pred.get("extracted_forecast") is not None and pred.get("error_message") is None:
             try:
                 forecast_value = float(pred["extracted_forecast"])
                 valid_forecasts.append(forecast_value)
+                hedge = pred.get("hedge") or {}
+                if hedge.get("winner") == "hedge":
+                    hedged_count += 1
+                    substitute_count += hedge.get("model_name") != pred.get("model_name")
             except (ValueError, TypeError):
                 print(f"Warning: Could not convert forecast '{pred['extracted_forecast']}' to float for model {pred.get('model_name')}. Skipping.")
         elif pred.get("error_message"):
@@ -38,8 +47,8 @@ def main():
             "notes": "No valid individual forecasts were available to calculate an aggregate."
         }
     else:
-        mean_forecast = round(np.mean(valid_forecasts), 2) # Rounded to two decimal places
-        std_dev_forecast = round(np.std(valid_forecasts), 2) # Rounded to two decimal places
+        mean_forecast = round(statistics.fmean(valid_forecasts), 2) # Rounded to two decimal places
+        std_dev_forecast = round(statistics.pstdev(valid_forecasts), 2) # Rounded to two decimal places
         
         final_data = {
             "forecast_period": "June 2, 2025 - June 6, 2025",
@@ -54,12 +63,35 @@ def main():
         print(f"  Std Dev of Predictions: {std_dev_forecast}")
         print(f"  Based on {len(valid_forecasts)} individual forecasts: {valid_forecasts}")
 
+    if excluded_count:
+        final_data["notes"] += f" {excluded_count} member forecast(s) were excluded on critique recommendation."
+    if hedged_count:
+        final_data["hedged_forecasts"] = hedged_count
+        final_data["substitute_forecasts"] = substitute_count
+        final_data["notes"] += (f" {hedged_count} forecast(s) came from a hedge call sent after the first one was slow"
+                                f" ({substitute_count} from a substitute model).")
+    return final_data
+
+def main():
+    try:
+        with open(RAW_PREDICTIONS_FILE, 'r') as f:
+            raw_predictions = json.load(f)
+    except FileNotFoundError:
+        print(f"Error: Raw predictions file {RAW_PREDICTIONS_FILE} not found.")
+        return
+    except json.JSONDecodeError:
+        print(f"Error: Could not decode JSON from {RAW_PREDICTIONS_FILE}.")
+        return
+
+    final_data = aggregate_predictions(raw_predictions)
+
     try:
         with open(FINAL_FORECAST_FILE, 'w') as f:
             json.dump(final_data, f, indent=4)
         print(f"\nFinal aggregated hotel forecast saved to {FINAL_FORECAST_FILE}")
     except Exception as e:
         print(f"Error saving final aggregated forecast to {FINAL_FORECAST_FILE}: {e}")
+    run_registry.record_final("hotel", final_data)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
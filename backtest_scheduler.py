@@ -0,0 +1,401 @@
+import os
+import csv
+import io
+import json
+import time
+import sqlite3
+import importlib
+from datetime import datetime, timedelta, timezone
+
+# Runs prompt-selection backtests (prompts x models x temperatures x windows, per target) as a
+# work queue in a local SQLite file instead of the evaluate_*_prompts.py serial loops.
+#   - The planned tasks are inserted once per job; re-running the same job skips finished tasks,
+#     so a crashed or interrupted run resumes where it stopped.
+#   - A pool of worker processes claims tasks from the queue; each worker runs its own event loop
+#     and async SDK clients with `concurrency` calls in flight.
+#   - A trigger folds every finished task into a per (prompt, model, temperature) error rollup, so
+#     the MAE table is current while the backtest runs; the coordinator rewrites BACKTEST_MAE_FILE
+#     from it as results land.
+
+QUEUE_DB = "backtest_queue.sqlite"
+BACKTEST_MAE_FILE = "backtest_mae.csv"
+DEFAULT_JOB = "backtest"
+DEFAULT_WINDOWS = 20
+TRUMP_WINDOW_DAYS = 5
+DEFAULT_CONCURRENCY = 8
+MAX_ATTEMPTS = 3
+TASK_TIMEOUT_SECONDS = 120
+PROGRESS_INTERVAL_SECONDS = 2.0
+
+# evaluate module (prompt files, backtest rewriting), ensemble module (models, temperatures,
+# max tokens, forecast parser) and the default ground-truth source of each target.
+TARGETS = {
+    "hotel": {"evaluate_module": "evaluate_hotel_prompts", "ensemble_module": "generate_ensemble_forecasts_hotel",
+              "data_file": "hotel_reviews_raw.csv"},
+    "trump": {"evaluate_module": "evaluate_trump_prompts", "ensemble_module": "generate_ensemble_forecasts_trump",
+              "data_file": "trump_posts_daily.csv"},
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    config_json TEXT,
+    registry_run_ids TEXT
+);
+
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    job TEXT NOT NULL,
+    target TEXT NOT NULL,
+    prompt_file TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    model_name TEXT NOT NULL,
+    temperature REAL NOT NULL,
+    window_start TEXT NOT NULL,
+    window_end TEXT NOT NULL,
+    ground_truth REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',  -- pending, running, done, failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    claimed_at TEXT,
+    finished_at TEXT,
+    forecast REAL,
+    abs_error REAL,
+    latency_ms REAL,
+    raw_response TEXT,
+    error_message TEXT,
+    UNIQUE (job, target, prompt_file, provider, model_name, temperature, window_start, window_end)
+);
+CREATE INDEX IF NOT EXISTS tasks_claim ON tasks (job, status);
+
+CREATE TABLE IF NOT EXISTS task_mae (
+    job TEXT NOT NULL,
+    target TEXT NOT NULL,
+    prompt_file TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    model_name TEXT NOT NULL,
+    temperature REAL NOT NULL,
+    n INTEGER NOT NULL,
+    abs_error_sum REAL NOT NULL,
+    PRIMARY KEY (job, target, prompt_file, provider, model_name, temperature)
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS tasks_mae_rollup AFTER UPDATE OF status ON tasks
+WHEN NEW.status = 'done' AND OLD.status != 'done' AND NEW.abs_error IS NOT NULL
+BEGIN
+    INSERT INTO task_mae (job, target, prompt_file, provider, model_name, temperature, n, abs_error_sum)
+    VALUES (NEW.job, NEW.target, NEW.prompt_file, NEW.provider, NEW.model_name, NEW.temperature, 1, NEW.abs_error)
+    ON CONFLICT DO UPDATE SET n = n + 1, abs_error_sum = abs_error_sum + excluded.abs_error_sum;
+END;
+"""
+
+def connect(queue_db=QUEUE_DB):
+    # Autocommit: every claim / result is a single statement, atomic across worker processes.
+    conn = sqlite3.connect(queue_db, timeout=60, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def _now():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+def _module(target, kind):
+    return importlib.import_module(TARGETS[target][kind])
+
+# --- Planning ---
+
+def period_description(start, end):
+    """'May 18, 2025 to May 22, 2025', the form evaluate_trump_prompts uses."""
+    return f"{start:%B} {start.day}, {start.year} to {end:%B} {end.day}, {end.year}"
+
+def hotel_windows(n_windows=DEFAULT_WINDOWS, reviews_file=None):
+    """The n_windows most recent days with rated reviews, as (day, day, mean rating) tuples."""
+    import data_store
+    reviews_file = reviews_file or TARGETS["hotel"]["data_file"]
+    place_ids = data_store.ingest_file(reviews_file, "reviews")
+    daily = data_store.daily_review_metrics(reviews_file, place_ids).tail(n_windows)
+    return [(day.date(), day.date(), round(float(mean), 2)) for day, mean in zip(daily['date'], daily['mean_rating'])]
+
+def trump_windows(n_windows=DEFAULT_WINDOWS, daily_csv=None, window_days=TRUMP_WINDOW_DAYS):
+    """
+    The n_windows most recent window_days-day windows of trump_posts_daily.csv (days without posts
+    count as zero), as (start, end, average daily posts) tuples.
+    """
+    import pandas as pd
+    daily = pd.read_csv(daily_csv or TARGETS["trump"]["data_file"], parse_dates=['date'])
+    if daily.empty:
+        return []
+    counts = daily.groupby('date')['post_count'].sum()
+    counts = counts.reindex(pd.date_range(counts.index.min(), counts.index.max(), freq='D'), fill_value=0)
+    means = counts.rolling(window_days).mean().dropna().tail(n_windows)
+    return [((end - timedelta(days=window_days - 1)).date(), end.date(), round(float(mean), 2))
+            for end, mean in means.items()]
+
+WINDOW_BUILDERS = {"hotel": hotel_windows, "trump": trump_windows}
+
+def default_prompts(target):
+    prompt_files = _module(target, "evaluate_module").PROMPT_FILES
+    return list(prompt_files.values()) if isinstance(prompt_files, dict) else list(prompt_files)
+
+def default_models(target):
+    """The target's ensemble models plus the model its evaluate script backtests with."""
+    evaluate = _module(target, "evaluate_module")
+    models = [(c["provider"], c["model_name"]) for c in _module(target, "ensemble_module").MODEL_CONFIG]
+    backtest_model = ("openai", getattr(evaluate, "OPENAI_MODEL", None) or evaluate.MODEL_TO_USE)
+    return models + [backtest_model] if backtest_model not in models else models
+
+def plan_tasks(targets=None, prompts=None, models=None, temperatures=None, n_windows=DEFAULT_WINDOWS):
+    """
+    Every (target, prompt, model, temperature, window) task. prompts/models/temperatures default to
+    each target's evaluate prompts, ensemble models (plus its backtest model) and ensemble temperatures.
+    """
+    tasks = []
+    for target in targets or TARGETS:
+        windows = WINDOW_BUILDERS[target](n_windows)
+        if not windows:
+            print(f"Warning: No backtest windows with ground truth for {target}.")
+        for prompt_file in prompts or default_prompts(target):
+            for provider, model_name in models or default_models(target):
+                for temperature in temperatures or _module(target, "ensemble_module").TEMPERATURES:
+                    for start, end, truth in windows:
+                        tasks.append((target, prompt_file, provider, model_name, float(temperature),
+                                      start.isoformat(), end.isoformat(), truth))
+    return tasks
+
+def enqueue(conn, job, tasks, config=None):
+    """Adds tasks to job, ignoring ones already queued (finished or not). Returns how many were new."""
+    conn.execute("INSERT OR IGNORE INTO jobs (job, created_at, config_json) VALUES (?, ?, ?)",
+                 (job, _now(), json.dumps(config)))
+    before = conn.execute("SELECT COUNT(*) FROM tasks WHERE job = ?", (job,)).fetchone()[0]
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT OR IGNORE INTO tasks (job, target, prompt_file, provider, model_name, temperature, window_start, "
+        "window_end, ground_truth) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", ((job, *task) for task in tasks))
+    conn.execute("COMMIT")
+    return conn.execute("SELECT COUNT(*) FROM tasks WHERE job = ?", (job,)).fetchone()[0] - before
+
+def requeue_interrupted(conn, job):
+    """Tasks left 'running' by a run that crashed or was interrupted go back to the queue."""
+    return conn.execute("UPDATE tasks SET status = 'pending', worker = NULL WHERE job = ? AND status = 'running'",
+                        (job,)).rowcount
+
+# --- Workers ---
+
+def render_prompt(target, template, window_start, window_end):
+    """The backtest prompt for one window, rewritten the way the target's evaluate script does."""
+    evaluate = _module(target, "evaluate_module")
+    if target == "hotel":
+        return evaluate.modify_prompt_for_backtest(template, window_start)
+    start, end = datetime.strptime(window_start, "%Y-%m-%d"), datetime.strptime(window_end, "%Y-%m-%d")
+    return evaluate.modify_prompt_for_backtest(template, period_description(start, end))
+
+def _claim(conn, job, worker):
+    return conn.execute(
+        "UPDATE tasks SET status = 'running', worker = ?, claimed_at = ?, attempts = attempts + 1 "
+        "WHERE id = (SELECT id FROM tasks WHERE job = ? AND status = 'pending' ORDER BY id LIMIT 1) "
+        "RETURNING *", (worker, _now(), job)).fetchone()
+
+def _finish(conn, task, forecast=None, latency_ms=None, raw_response=None, error_message=None):
+    if error_message and task["attempts"] < MAX_ATTEMPTS:
+        status = "pending"  # Retried by whichever worker claims it next
+    else:
+        status = "failed" if error_message else "done"
+    abs_error = abs(forecast - task["ground_truth"]) if forecast is not None else None
+    conn.execute(
+        "UPDATE tasks SET status = ?, finished_at = ?, forecast = ?, abs_error = ?, latency_ms = ?, raw_response = ?, "
+        "error_message = ? WHERE id = ? AND status = 'running'",
+        (status, _now(), forecast, abs_error, latency_ms, raw_response, error_message, task["id"]))
+
+async def _run_task(task, api_keys, templates):
+    import asyncio
+    from llm_providers import get_completion_async
+    from prompt_caching import split_prompt
+    ensemble = _module(task["target"], "ensemble_module")
+    if task["prompt_file"] not in templates:
+        with open(task["prompt_file"], 'r') as f:
+            templates[task["prompt_file"]] = f.read()
+    prompt = render_prompt(task["target"], templates[task["prompt_file"]], task["window_start"], task["window_end"])
+    system_prompt, user_prompt = split_prompt(prompt, templates[task["prompt_file"]])
+    start = time.perf_counter()
+    text = await asyncio.wait_for(
+        get_completion_async(task["provider"], api_keys[task["provider"]], task["model_name"], user_prompt,
+                             task["temperature"], max_tokens=ensemble.MAX_TOKENS.get(task["provider"]),
+                             system_prompt=system_prompt or None),
+        TASK_TIMEOUT_SECONDS)
+    return ensemble.parse_forecast_from_response(text), (time.perf_counter() - start) * 1000, text
+
+async def _worker_loop(queue_db, job, worker, concurrency):
+    import asyncio
+    import contextlib
+    from dotenv import load_dotenv
+    from llm_providers import API_KEY_ENV
+    load_dotenv(dotenv_path=".env")
+    api_keys = {provider: os.getenv(env) for provider, env in API_KEY_ENV.items()}
+    conn = connect(queue_db)
+    templates = {}
+    completed = 0
+
+    async def drain():
+        nonlocal completed
+        while (task := _claim(conn, job, worker)) is not None:
+            try:
+                forecast, latency_ms, text = await _run_task(task, api_keys, templates)
+                _finish(conn, task, forecast, round(latency_ms, 1), text)
+            except Exception as e:
+                _finish(conn, task, error_message=f"{type(e).__name__}: {e}"[:500])
+            completed += 1
+
+    # The parsers print a warning for unparsable responses; keep worker output quiet. stdout is
+    # redirected once around all the coroutines, as nested redirects would unwind out of order.
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        await asyncio.gather(*(drain() for _ in range(concurrency)))
+    conn.close()
+    return completed
+
+def run_worker(queue_db, job, worker, concurrency=DEFAULT_CONCURRENCY):
+    """Worker process entry point: drains the job's queue with `concurrency` calls in flight."""
+    import asyncio
+    return asyncio.run(_worker_loop(queue_db, job, worker, concurrency))
+
+# --- Progress and results ---
+
+def status_counts(conn, job):
+    counts = dict(conn.execute("SELECT status, COUNT(*) FROM tasks WHERE job = ? GROUP BY status", (job,)).fetchall())
+    return {s: counts.get(s, 0) for s in ("pending", "running", "done", "failed")}
+
+def mae_table(conn, job):
+    """Current MAE per (target, prompt, model, temperature), best first within each target."""
+    return [dict(row) for row in conn.execute(
+        "SELECT target, prompt_file, provider, model_name, temperature, n, ROUND(abs_error_sum / n, 3) AS mae "
+        "FROM task_mae WHERE job = ? ORDER BY target, mae", (job,))]
+
+def write_mae_table(rows, output_csv_file):
+    from fetch_checkpoints import atomic_write_text
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=["target", "prompt_file", "provider", "model_name", "temperature", "n", "mae"])
+    writer.writeheader()
+    writer.writerows(rows)
+    atomic_write_text(output_csv_file, buffer.getvalue())
+
+def record_in_registry(conn, job):
+    """Records each target's finished tasks as one evaluation run in the run registry (once per job)."""
+    import run_registry
+    if conn.execute("SELECT registry_run_ids FROM jobs WHERE job = ?", (job,)).fetchone()[0]:
+        return
+    run_ids = {}
+    templates, rendered = {}, {}
+    for target in [r[0] for r in conn.execute("SELECT DISTINCT target FROM tasks WHERE job = ?", (job,))]:
+        evaluations = []
+        for task in conn.execute("SELECT * FROM tasks WHERE job = ? AND target = ? AND status = 'done' ORDER BY id",
+                                 (job, target)):
+            key = (target, task["prompt_file"], task["window_start"], task["window_end"])
+            if key not in rendered:
+                if task["prompt_file"] not in templates:
+                    with open(task["prompt_file"], 'r') as f:
+                        templates[task["prompt_file"]] = f.read()
+                rendered[key] = render_prompt(target, templates[task["prompt_file"]], task["window_start"], task["window_end"])
+            period = task["window_start"] if task["window_start"] == task["window_end"] else \
+                f"{task['window_start']} to {task['window_end']}"
+            evaluations.append({
+                "prompt_file": task["prompt_file"], "prompt_text": rendered[key], "period": period,
+                "ground_truth": task["ground_truth"], "forecast": task["forecast"],
+                "call": {"provider": task["provider"], "model_name": task["model_name"],
+                         "temperature": task["temperature"], "prompt_file": task["prompt_file"],
+                         "raw_response": task["raw_response"], "extracted_forecast": task["forecast"],
+                         "error_message": task["error_message"], "latency_ms": task["latency_ms"]}})
+        run_ids[target] = run_registry.record_evaluations(target, evaluations, {"backtest_job": job})
+    conn.execute("UPDATE jobs SET registry_run_ids = ? WHERE job = ?", (json.dumps(run_ids), job))
+
+def print_mae_table(rows, top=5):
+    for target in dict.fromkeys(r["target"] for r in rows):
+        print(f"\n{target}: best (prompt, model, temperature) by MAE")
+        for r in [r for r in rows if r["target"] == target][:top]:
+            print(f"  {r['prompt_file']:<32} {r['provider']}/{r['model_name']:<26} t={r['temperature']:<4} "
+                  f"MAE {r['mae']:.3f} over {r['n']} windows")
+
+def run_backtest(targets=None, prompts=None, models=None, temperatures=None, n_windows=DEFAULT_WINDOWS,
+                 workers=None, concurrency=DEFAULT_CONCURRENCY, job=DEFAULT_JOB, queue_db=QUEUE_DB,
+                 output_csv_file=BACKTEST_MAE_FILE, tasks=None):
+    """
+    Queues the backtest tasks for `job` (models as (provider, model_name) pairs or "provider:model"
+    strings) and runs them on `workers` processes with `concurrency` calls in flight each. Running
+    the same job again resumes it. The MAE table in output_csv_file is rewritten every few seconds
+    as results land. Returns the final MAE table.
+    tasks, if given, are already planned task tuples (see plan_tasks and sweep_planner.py) and
+    replace the targets/prompts/models/temperatures/n_windows grid.
+    """
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_EXCEPTION
+    import multiprocessing
+    from dotenv import load_dotenv
+    from llm_providers import API_KEY_ENV
+    load_dotenv(dotenv_path=".env")
+    models = [tuple(m.split(":", 1)) if isinstance(m, str) else tuple(m) for m in models] if models else None
+    workers = workers or os.cpu_count() or 1
+
+    conn = connect(queue_db)
+    if tasks is None:
+        tasks = plan_tasks(targets, prompts, models, temperatures, n_windows)
+    missing = sorted({t[2] for t in tasks if not os.getenv(API_KEY_ENV[t[2]])})
+    if missing:
+        print(f"Warning: No API key for {', '.join(missing)}; skipping their tasks.")
+        tasks = [t for t in tasks if t[2] not in missing]
+    added = enqueue(conn, job, tasks, {"targets": targets, "prompts": prompts, "models": models,
+                                        "temperatures": temperatures, "n_windows": n_windows})
+    requeued = requeue_interrupted(conn, job)
+    counts = status_counts(conn, job)
+    total = sum(counts.values())
+    print(f"Job '{job}': {total} tasks ({added} new, {counts['done']} already done, {requeued} requeued "
+          f"from an interrupted run). Running {workers} workers x {concurrency} concurrent calls.")
+    conn.close()  # Workers open their own connections
+
+    start, done_before = time.perf_counter(), counts["done"] + counts["failed"]
+    conn = connect(queue_db)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(run_worker, queue_db, job, f"worker-{i}", concurrency) for i in range(workers)]
+        pending = futures
+        while pending:
+            finished, pending = wait(pending, timeout=PROGRESS_INTERVAL_SECONDS, return_when=FIRST_EXCEPTION)
+            for future in finished:
+                future.result()  # Re-raises a worker crash; finished tasks stay done for the resume
+            counts = status_counts(conn, job)
+            rows = mae_table(conn, job)
+            write_mae_table(rows, output_csv_file)
+            processed = counts["done"] + counts["failed"] - done_before
+            leaders = {}
+            for r in rows:  # Sorted by target, then MAE
+                leaders.setdefault(r["target"], r)
+            print(f"  {counts['done']}/{total} done, {counts['failed']} failed, {counts['running']} running, "
+                  f"{processed / (time.perf_counter() - start):.1f} tasks/s"
+                  + "".join(f"; {t} best {r['prompt_file']} {r['model_name']} t={r['temperature']} MAE {r['mae']}"
+                            for t, r in leaders.items()), flush=True)
+
+    rows = mae_table(conn, job)
+    write_mae_table(rows, output_csv_file)
+    print_mae_table(rows)
+    print(f"\nMAE table saved to {output_csv_file}")
+    counts = status_counts(conn, job)
+    if counts["pending"] == 0 and counts["running"] == 0:
+        record_in_registry(conn, job)
+    if counts["failed"]:
+        errors = conn.execute("SELECT error_message, COUNT(*) FROM tasks WHERE job = ? AND status = 'failed' "
+                              "GROUP BY error_message ORDER BY 2 DESC LIMIT 3", (job,)).fetchall()
+        print(f"{counts['failed']} task(s) failed after {MAX_ATTEMPTS} attempts, e.g.: "
+              + "; ".join(f"{e} (x{n})" for e, n in errors))
+    conn.close()
+    return rows
+
+def backtest_status(job=DEFAULT_JOB, queue_db=QUEUE_DB):
+    """Prints the progress and current MAE table of a job."""
+    if not os.path.exists(queue_db):
+        print(f"Error: Queue {queue_db} not found.")
+        return
+    conn = connect(queue_db)
+    counts = status_counts(conn, job)
+    print(f"Job '{job}': " + ", ".join(f"{n} {s}" for s, n in counts.items()))
+    print_mae_table(mae_table(conn, job))
+    conn.close()
+
+if __name__ == "__main__":
+    run_backtest()
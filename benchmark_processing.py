@@ -0,0 +1,170 @@
+import io
+import os
+import sys
+import glob
+import json
+import time
+import tempfile
+import warnings
+import platform
+import subprocess
+import tracemalloc
+import contextlib
+from datetime import datetime
+
+# Times and memory-profiles each processing stage on synthetic inputs of increasing size
+# (see generate_synthetic_data.py), stores the results in BENCHMARK_DIR and compares them with
+# the previous run so regressions show up.
+
+BENCHMARK_DIR = "benchmark_results"
+SIZES = [10**4, 10**5, 10**6]   # 10**7 works too but needs ~20 GB of disk for the posts file
+# A stage is flagged when it is this much slower / uses this much more peak memory than the baseline.
+TIME_REGRESSION_TOLERANCE = 0.25
+MEMORY_REGRESSION_TOLERANCE = 0.10
+# Timing differences below this are treated as noise, whatever the ratio (small stages run in milliseconds).
+MIN_TIME_DIFFERENCE_SECONDS = 0.05
+
+def _ingest_store(paths):
+    from data_store import ingest_file
+    ingest_file(paths["posts"], "posts", paths["ingest_store"], force=True)
+    ingest_file(paths["reviews"], "reviews", paths["ingest_store"], force=True)
+
+def _process_posts(paths):
+    from process_trump_posts import parse_and_count_daily_posts
+    parse_and_count_daily_posts(paths["posts"], paths["posts_daily"], days_to_include=60, export_dashboard=False,
+                                db_path=paths["store"])
+
+def _process_accounts(paths):
+    from process_trump_posts import count_daily_posts_by_account
+    count_daily_posts_by_account(paths["posts"], paths["accounts_daily"], days_to_include=60, db_path=paths["store"])
+
+def _trump_stats(paths):
+    from calculate_trump_stats import calculate_and_save_trump_stats
+    calculate_and_save_trump_stats(paths["posts_daily"], paths["trump_baseline"])
+
+def _hotel_stats(paths):
+    from calculate_hotel_stats import calculate_and_save_stats
+    calculate_and_save_stats(paths["reviews"], paths["hotel_baseline"])
+
+def _hotel_daily_metrics(paths):
+    from calculate_daily_hotel_metrics import calculate_daily_metrics
+    calculate_daily_metrics(paths["reviews"], paths["hotel_daily"], export_dashboard=False, db_path=paths["store"])
+
+# Stages run in this order; trump_stats reads the daily table process_posts writes.
+# ingest_store times a full (re-)ingestion of both files into a scratch store; the processing
+# stages sync into their own store on their first (memory-traced) run, so their timings are the
+# steady state where the raw file is unchanged and only the date-window queries run.
+STAGES = {
+    "ingest_store": _ingest_store,
+    "process_posts": _process_posts,
+    "process_accounts": _process_accounts,
+    "trump_stats": _trump_stats,
+    "hotel_stats": _hotel_stats,
+    "hotel_daily_metrics": _hotel_daily_metrics,
+}
+
+def _run_quietly(stage, paths):
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        stage(paths)
+
+def measure_stage(stage, paths, repeats=3):
+    """Returns (best wall time in seconds over `repeats` runs, peak traced memory in MB of a separate run)."""
+    # Memory is measured on a separate, first run because tracing slows allocation-heavy code
+    # down; it also warms imports and the file cache so they don't land in the timings.
+    tracemalloc.start()
+    try:
+        _run_quietly(stage, paths)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        _run_quietly(stage, paths)
+        timings.append(time.perf_counter() - start)
+    return min(timings), peak / 2**20
+
+def _environment():
+    import numpy
+    import pandas
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=False).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"git_commit": commit, "python": platform.python_version(), "pandas": pandas.__version__,
+            "numpy": numpy.__version__, "machine": platform.machine(), "cpu_count": os.cpu_count()}
+
+def latest_results_file(output_dir=BENCHMARK_DIR, exclude=None):
+    files = sorted(f for f in glob.glob(os.path.join(output_dir, "processing_*.json")) if f != exclude)
+    return files[-1] if files else None
+
+def compare_results(results, baseline_results):
+    """Pairs each result with the baseline for the same stage and size; returns the list of regressions."""
+    baseline = {(r["stage"], r["size"]): r for r in baseline_results}
+    regressions = []
+    for result in results:
+        base = baseline.get((result["stage"], result["size"]))
+        if not base:
+            continue
+        result["baseline_seconds"] = base["seconds"]
+        result["baseline_peak_mb"] = base["peak_mb"]
+        result["time_ratio"] = round(result["seconds"] / base["seconds"], 3) if base["seconds"] else None
+        result["memory_ratio"] = round(result["peak_mb"] / base["peak_mb"], 3) if base["peak_mb"] else None
+        slower = result["seconds"] - base["seconds"] > MIN_TIME_DIFFERENCE_SECONDS
+        if (slower and (result["time_ratio"] or 0) > 1 + TIME_REGRESSION_TOLERANCE) or \
+                (result["memory_ratio"] or 0) > 1 + MEMORY_REGRESSION_TOLERANCE:
+            regressions.append(result)
+    return regressions
+
+def run_processing_benchmark(sizes=None, stages=None, repeats=3, output_dir=BENCHMARK_DIR, compare_to="latest",
+                             data_dir=None, seed=0):
+    """
+    Generates (or reuses) synthetic posts and reviews for each size, runs every stage on them and
+    records wall time and peak traced memory. Results are written to
+    output_dir/processing_<timestamp>.json and compared against compare_to ("latest" for the
+    previous results file, a path, or None to skip). Returns the list of results.
+    """
+    from generate_synthetic_data import SYNTHETIC_DIR, generate_synthetic_data
+    sizes = sizes or SIZES
+    stage_names = [s for s in STAGES if not stages or s in stages]
+    data = generate_synthetic_data(sizes, output_dir=data_dir or SYNTHETIC_DIR, seed=seed)
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in sizes:
+            posts_file, reviews_file = data[size]
+            paths = {"posts": posts_file, "reviews": reviews_file}
+            for name in ("posts_daily", "accounts_daily", "hotel_daily"):
+                paths[name] = os.path.join(work_dir, f"{name}.csv")
+            for name in ("trump_baseline", "hotel_baseline"):
+                paths[name] = os.path.join(work_dir, f"{name}.txt")
+            for name in ("store", "ingest_store"):
+                paths[name] = os.path.join(work_dir, f"{name}_{size}.sqlite")
+            for name in stage_names:
+                seconds, peak_mb = measure_stage(STAGES[name], paths, repeats)
+                results.append({"stage": name, "size": size, "seconds": round(seconds, 4), "peak_mb": round(peak_mb, 2)})
+                print(f"{name:>20} {size:>10,} rows: {seconds:8.3f} s, peak {peak_mb:9.1f} MB", flush=True)
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, f"processing_{datetime.now():%Y%m%d-%H%M%S}.json")
+    baseline_file = latest_results_file(output_dir) if compare_to == "latest" else compare_to
+    if baseline_file and os.path.exists(baseline_file):
+        with open(baseline_file, 'r') as f:
+            regressions = compare_results(results, json.load(f)["results"])
+        print(f"\nCompared with {baseline_file}:")
+        for r in results:
+            if "time_ratio" in r:
+                flag = "  <-- REGRESSION" if r in regressions else ""
+                print(f"{r['stage']:>20} {r['size']:>10,}: time x{r['time_ratio']}, memory x{r['memory_ratio']}{flag}")
+        if not regressions:
+            print("No regressions beyond the tolerances.")
+    with open(output_file, 'w') as f:
+        json.dump({"created_at": datetime.now().isoformat(timespec="seconds"), "environment": _environment(),
+                   "baseline_file": baseline_file, "repeats": repeats, "results": results}, f, indent=4)
+    print(f"\nBenchmark results saved to {output_file}")
+    return results
+
+if __name__ == "__main__":
+    run_processing_benchmark(sizes=[int(s) for s in sys.argv[1:]] or None)
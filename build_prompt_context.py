@@ -0,0 +1,214 @@
+import os
+import re
+from datetime import date, datetime, timedelta
+
+HOTEL_TEMPLATE_FILE = "hotel_prompt_cot_template.txt"
+TRUMP_TEMPLATE_FILE = "trump_prompt_context_template.txt"
+# Prompt files written by build_prompts, and the template each is rendered from.
+GENERATED_PROMPT_FILES = {
+    "hotel_prompt_cot_with_data.txt": HOTEL_TEMPLATE_FILE,
+    "trump_prompt_context.txt": TRUMP_TEMPLATE_FILE,
+}
+HOTEL_NAME = "Montreal Marriott Château Champlain"
+FORECAST_START = date(2025, 6, 2)
+FORECAST_END = date(2025, 6, 6)
+# A day whose mean rating is this many stars below the window's review-weighted mean is called out.
+DIP_NOTE_THRESHOLD = 2.0
+
+def format_day(d):
+    return f"{d:%B} {d.day}"
+
+def format_day_range(start, end):
+    """'April 19', 'April 10–18' or 'April 22–May 1'."""
+    if start == end:
+        return format_day(start)
+    if (start.year, start.month) == (end.year, end.month):
+        return f"{format_day(start)}–{end.day}"
+    return f"{format_day(start)}–{format_day(end)}"
+
+def format_period(start, end):
+    """Forecast period phrasing used by the prompts, e.g. 'June 2, 2025, to June 6, 2025'."""
+    return f"{format_day(start)}, {start.year}, to {format_day(end)}, {end.year}"
+
+def format_period_short(start, end):
+    """e.g. 'June 2-6, 2025'."""
+    if (start.year, start.month) == (end.year, end.month):
+        return f"{format_day(start)}-{end.day}, {end.year}"
+    return f"{format_day(start)} - {format_day(end)}, {end.year}"
+
+def run_boundaries(counts, means):
+    """
+    Vectorized run-length encoding of a daily series: returns (starts, ends) index arrays of the
+    maximal runs of consecutive days with the same review count and mean rating.
+    """
+    import numpy as np
+    n = len(counts)
+    if n == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    changed = np.empty(n, dtype=bool)
+    changed[0] = True
+    np.not_equal(counts[1:], counts[:-1], out=changed[1:])
+    changed[1:] |= means[1:] != means[:-1]
+    starts = np.flatnonzero(changed)
+    ends = np.append(starts[1:] - 1, n - 1)
+    return starts, ends
+
+def describe_review_runs(days, counts, means, starts, ends, reference_rating=None):
+    """Turns review runs into prompt bullet lines, e.g. '- April 22–May 1: No new reviews.'"""
+    lines = []
+    for s, e in zip(starts.tolist(), ends.tolist()):
+        label = format_day_range(days[s], days[e])
+        count = int(counts[s])
+        if count == 0:
+            lines.append(f"- {label}: No new reviews.")
+        else:
+            per_day = " per day" if e > s else ""
+            note = ""
+            if reference_rating is not None and means[s] <= reference_rating - DIP_NOTE_THRESHOLD:
+                note = " (Note: this is a significant dip)"
+            lines.append(f"- {label}: {count} new reviews{per_day}, mean rating {means[s]:.1f}{note}.")
+    return "\n".join(lines)
+
+def load_daily_review_series(daily_metrics_csv="hotel_daily_metrics.csv"):
+    """Reads hotel_daily_metrics.csv into (dates, counts, means) arrays, filling any missing days with zeros."""
+    import numpy as np
+    import pandas as pd
+    df = pd.read_csv(daily_metrics_csv, encoding='utf-8-sig')
+    df['date'] = pd.to_datetime(df['date'])
+    df = df.set_index('date').sort_index()
+    df = df.reindex(pd.date_range(df.index.min(), df.index.max(), freq='D'), fill_value=0)
+    days = [d.date() for d in df.index]
+    return days, df['new_review_count'].to_numpy(dtype=np.int64), df['mean_rating'].to_numpy(dtype=np.float64).round(1)
+
+def build_hotel_review_contexts(days, counts, means, window_end_indices, window_days=30):
+    """
+    Builds the data-bearing part of the hotel prompt for many windows at once. The series is
+    run-length encoded once; each window reuses the global run boundaries that fall inside it,
+    so the per-window work is a searchsorted plus formatting a handful of lines.
+    Returns a list of dicts with window_days, window_start, window_end and recent_daily_trends.
+    """
+    import numpy as np
+    global_starts, _ = run_boundaries(counts, means)
+    contexts = []
+    for hi in np.asarray(window_end_indices).tolist():
+        lo = max(0, hi - window_days + 1)
+        first = np.searchsorted(global_starts, lo, side='right')
+        last = np.searchsorted(global_starts, hi, side='right')
+        starts = np.concatenate(([lo], global_starts[first:last]))
+        ends = np.append(starts[1:] - 1, hi)
+        window_counts = counts[lo:hi + 1]
+        total = window_counts.sum()
+        reference = float(window_counts @ means[lo:hi + 1] / total) if total else None
+        contexts.append({
+            "window_days": hi - lo + 1,
+            "window_start": f"{format_day(days[lo])}, {days[lo].year}",
+            "window_end": f"{days[hi]:%B} {days[hi].day:02d}, {days[hi].year}",
+            "recent_daily_trends": describe_review_runs(days, counts, means, starts, ends, reference),
+        })
+    return contexts
+
+def read_hotel_baseline(baseline_file="hotel_baseline.txt"):
+    with open(baseline_file, 'r') as f:
+        text = f.read()
+    return {
+        "baseline_mean_rating": re.search(r"Mean Rating:\s*([0-9.]+)", text).group(1),
+        "baseline_review_count": re.search(r"Review Count:\s*([0-9]+)", text).group(1),
+    }
+
+def read_trump_baseline(baseline_file="trump_baseline.txt"):
+    """Parses the statistics written by calculate_trump_stats.py."""
+    with open(baseline_file, 'r') as f:
+        text = f.read()
+    period = re.search(r"Data Period Used for Stats:\s*(\d{4}-\d{2}-\d{2}) to (\d{4}-\d{2}-\d{2})", text)
+    start, end = (datetime.strptime(d, "%Y-%m-%d").date() for d in period.groups())
+    return {
+        "baseline_mean": re.search(r"Mean Daily Posts[^:]*:\s*([0-9.]+)", text).group(1),
+        "baseline_std": re.search(r"Std Dev Daily Posts[^:]*:\s*([0-9.]+)", text).group(1),
+        "baseline_start": f"{format_day(start)}, {start.year}",
+        "baseline_end": f"{format_day(end)}, {end.year}",
+        "baseline_days": re.search(r"Number of Days with Posts in Period:\s*([0-9]+)", text).group(1),
+    }
+
+def forecast_period_context(start=FORECAST_START, end=FORECAST_END):
+    return {
+        "forecast_period": format_period(start, end),
+        "forecast_period_short": format_period_short(start, end),
+        "forecast_days": (end - start).days + 1,
+    }
+
+def build_prompts(output_dir=".", forecast_start=None, forecast_end=None,
+                  daily_metrics_csv="hotel_daily_metrics.csv", hotel_baseline_file="hotel_baseline.txt",
+                  trump_baseline_file="trump_baseline.txt", window_days=30, budget_tokens=None):
+    """
+    Regenerates hotel_prompt_cot_with_data.txt and trump_prompt_context.txt from their templates,
+    the daily review metrics and the two baseline files.
+    The last window_days of review data are packed to fit the input token budget of every ensemble
+    model (see prompt_packing.py), or budget_tokens if given.
+    """
+    import prompt_packing
+    from llm_providers import ENSEMBLE_MODEL_CONFIG
+    start = datetime.strptime(forecast_start, "%Y-%m-%d").date() if forecast_start else FORECAST_START
+    end = datetime.strptime(forecast_end, "%Y-%m-%d").date() if forecast_end else FORECAST_END
+    period = forecast_period_context(start, end)
+
+    for required in (HOTEL_TEMPLATE_FILE, TRUMP_TEMPLATE_FILE, daily_metrics_csv, hotel_baseline_file, trump_baseline_file):
+        if not os.path.exists(required):
+            print(f"Error: Required file {required} not found.")
+            return
+
+    # The tightest budget among the models the prompts go to; token counts use that model's tokenizer.
+    budget, model = min((prompt_packing.input_budget(c["model_name"]), c["model_name"], c["provider"])
+                        for c in ENSEMBLE_MODEL_CONFIG)[:2]
+    provider = next(c["provider"] for c in ENSEMBLE_MODEL_CONFIG if c["model_name"] == model)
+    budget = budget_tokens or budget
+
+    days, counts, means = load_daily_review_series(daily_metrics_csv)
+    with open(HOTEL_TEMPLATE_FILE, 'r') as f:
+        hotel_template = f.read()
+    hotel_baseline = read_hotel_baseline(hotel_baseline_file)
+    render = lambda context: hotel_template.format(hotel_name=HOTEL_NAME, **period, **hotel_baseline, **context)
+    hotel_context, level, hotel_tokens = prompt_packing.pack_review_context(
+        days, counts, means, len(days) - 1, window_days, render, budget, model, provider)
+    hotel_prompt = render(hotel_context)
+    with open(TRUMP_TEMPLATE_FILE, 'r') as f:
+        trump_prompt = f.read().format(**period, **read_trump_baseline(trump_baseline_file))
+    trump_tokens = prompt_packing.count_tokens(trump_prompt, model, provider)
+
+    print(f"Hotel prompt: {hotel_context['window_days']} days of reviews packed as '{level}', {hotel_tokens} tokens "
+          f"(budget {budget} for {model}).")
+    for name, tokens in (("Hotel", hotel_tokens), ("Trump", trump_tokens)):
+        if tokens > budget:
+            print(f"Warning: {name} prompt is {tokens} tokens, over the {budget}-token budget even at the most compact packing.")
+
+    rendered = {HOTEL_TEMPLATE_FILE: hotel_prompt, TRUMP_TEMPLATE_FILE: trump_prompt}
+    for name, template_file in GENERATED_PROMPT_FILES.items():
+        content = rendered[template_file]
+        path = os.path.join(output_dir, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        print(f"Prompt written to {path}")
+
+def benchmark_prompt_generation(n_windows=5000, window_days=30, series_days=3650):
+    """Times build_hotel_review_contexts + template rendering over many windows of a synthetic series."""
+    import time
+    import numpy as np
+    rng = np.random.default_rng(0)
+    days = [date(2015, 1, 1) + timedelta(days=i) for i in range(series_days)]
+    active = rng.random(series_days) < 0.25
+    counts = np.where(active, rng.integers(1, 30, series_days), 0)
+    means = np.where(active, rng.integers(1, 6, series_days).astype(float), 0.0)
+    window_ends = rng.integers(window_days, series_days, n_windows)
+    with open(HOTEL_TEMPLATE_FILE, 'r') as f:
+        template = f.read()
+    baseline = {"baseline_mean_rating": "4.12", "baseline_review_count": "200"}
+    period = forecast_period_context()
+
+    t0 = time.perf_counter()
+    contexts = build_hotel_review_contexts(days, counts, means, window_ends, window_days)
+    prompts = [template.format(hotel_name=HOTEL_NAME, **period, **baseline, **c) for c in contexts]
+    elapsed = time.perf_counter() - t0
+    print(f"Built {len(prompts)} data-bearing prompts in {elapsed:.3f}s ({len(prompts) / elapsed:,.0f} prompts/s).")
+    return len(prompts) / elapsed
+
+if __name__ == "__main__":
+    build_prompts()
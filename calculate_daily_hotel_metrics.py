@@ -1,33 +1,46 @@
-import pandas as pd
-from datetime import datetime, timedelta
+import os
+from datetime import timedelta
+import data_store
+from data_store import STORE_DB
 
-def calculate_daily_metrics(input_csv_file="hotel_reviews_raw.csv", output_csv_file="hotel_daily_metrics.csv"):
+def calculate_daily_metrics(input_csv_file="hotel_reviews_raw.csv", output_csv_file="hotel_daily_metrics.csv", export_dashboard=False,
+                            db_path=STORE_DB):
     """
     Calculates daily new review counts and mean ratings for the last 30 days.
+    The reviews are synced into the local store (see data_store.py, which keeps one row per
+    review_id) and the window is read there with an index range scan; the CSV is only read
+    again when it has changed.
+    If export_dashboard is set, daily/weekly/monthly series over all reviews are also
+    written to the dashboard directory (see export_dashboard_series.py).
     """
-    try:
-        df = pd.read_csv(input_csv_file)
-    except FileNotFoundError:
+    if not os.path.exists(input_csv_file):
         print(f"Error: Input file {input_csv_file} not found.")
         return
-    except Exception as e:
-        print(f"Error reading {input_csv_file}: {e}")
-        return
+    import pandas as pd
 
-    if 'iso_date' not in df.columns:
-        print(f"Error: 'iso_date' column not found in {input_csv_file}.")
-        print("Please re-run the review fetching script to include 'iso_date'.")
-        return
-    
-    if 'rating' not in df.columns:
-        print(f"Error: 'rating' column not found in {input_csv_file}.")
-        return
+    place_ids = data_store.synced_keys(input_csv_file, "reviews", db_path)
+    if place_ids is None:
+        try:
+            df = pd.read_csv(input_csv_file)
+        except FileNotFoundError:
+            print(f"Error: Input file {input_csv_file} not found.")
+            return
+        except Exception as e:
+            print(f"Error reading {input_csv_file}: {e}")
+            return
 
-    # Convert iso_date to datetime objects, coercing errors to NaT
-    df['iso_date'] = pd.to_datetime(df['iso_date'], errors='coerce')
-    df.dropna(subset=['iso_date', 'rating'], inplace=True) # Remove rows where date or rating is invalid
-    
-    if df.empty:
+        if 'iso_date' not in df.columns:
+            print(f"Error: 'iso_date' column not found in {input_csv_file}.")
+            print("Please re-run the review fetching script to include 'iso_date'.")
+            return
+
+        if 'rating' not in df.columns:
+            print(f"Error: 'rating' column not found in {input_csv_file}.")
+            return
+        place_ids = data_store.ingest_reviews(df, input_csv_file, db_path)
+
+    most_recent = data_store.latest_review_time(input_csv_file, place_ids, db_path) if place_ids else None
+    if most_recent is None:
         print(f"No valid reviews with iso_date and rating found in {input_csv_file}.")
         # Create an empty df with correct columns for hotel_daily_metrics.csv
         empty_daily_df = pd.DataFrame(columns=['date', 'new_review_count', 'mean_rating'])
@@ -35,32 +48,29 @@ def calculate_daily_metrics(input_csv_file="hotel_reviews_raw.csv", output_csv_f
         print(f"Created empty {output_csv_file} with correct headers.")
         return
 
+    if export_dashboard:
+        from export_dashboard_series import export_dashboard_series
+        all_daily = data_store.daily_review_metrics(input_csv_file, place_ids, db_path=db_path)[['date', 'new_review_count', 'rating_sum']]
+        export_dashboard_series(all_daily, "hotel_reviews", sum_columns=['new_review_count', 'rating_sum'],
+                                ratio_columns={"mean_rating": ("rating_sum", "new_review_count")})
+
     # Determine the date range: last 30 days from the most recent review
-    most_recent_date = df['iso_date'].max().normalize() # Normalize to midnight
+    most_recent_date = pd.Timestamp(most_recent).normalize() # Normalize to midnight
     thirty_days_ago = most_recent_date - timedelta(days=29) # 30 days inclusive
 
     print(f"Most recent review date in data: {most_recent_date.strftime('%Y-%m-%d')}")
     print(f"Calculating metrics from {thirty_days_ago.strftime('%Y-%m-%d')} to {most_recent_date.strftime('%Y-%m-%d')}")
 
-    # Filter for the last 30 days
-    df_last_30_days = df[(df['iso_date'].dt.normalize() >= thirty_days_ago) & 
-                         (df['iso_date'].dt.normalize() <= most_recent_date)]
+    # Daily metrics for the last 30 days
+    daily_metrics = data_store.daily_review_metrics(input_csv_file, place_ids, start=thirty_days_ago,
+                                                    end=most_recent_date + timedelta(days=1), db_path=db_path)
 
-    if df_last_30_days.empty:
+    if daily_metrics.empty:
         print(f"No reviews found within the last 30 days ({thirty_days_ago.strftime('%Y-%m-%d')} to {most_recent_date.strftime('%Y-%m-%d')}).")
     else:
-        print(f"Found {len(df_last_30_days)} reviews within the last 30 days.")
-
-    # Extract date part for grouping
-    df_last_30_days['date_only'] = df_last_30_days['iso_date'].dt.normalize()
-
-    # Calculate daily metrics
-    daily_metrics = df_last_30_days.groupby('date_only').agg(
-        new_review_count=('rating', 'count'),
-        mean_rating=('rating', 'mean')
-    ).reset_index()
+        print(f"Found {daily_metrics['new_review_count'].sum()} reviews within the last 30 days.")
 
-    daily_metrics.rename(columns={'date_only': 'date'}, inplace=True)
+    daily_metrics = daily_metrics[['date', 'new_review_count', 'mean_rating']].copy()
     daily_metrics['mean_rating'] = daily_metrics['mean_rating'].round(2)
 
     # Create a full date range for the last 30 days to ensure all days are present
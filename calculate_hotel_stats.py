@@ -1,10 +1,15 @@
-import pandas as pd
+import os
 
 def calculate_and_save_stats(input_csv_file="hotel_reviews_raw.csv", output_txt_file="hotel_baseline.txt"):
     """
     Reads hotel reviews from a CSV, calculates the mean rating and total review count,
     and saves these statistics to a text file.
     """
+    if not os.path.exists(input_csv_file):
+        print(f"Error: Input file {input_csv_file} not found.")
+        return
+    import pandas as pd
+
     try:
         df = pd.read_csv(input_csv_file)
     except FileNotFoundError:
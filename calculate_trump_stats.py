@@ -1,12 +1,16 @@
-import pandas as pd
+import os
 from datetime import datetime, timedelta
-import numpy as np
 
 def calculate_and_save_trump_stats(input_csv_file="trump_posts_daily.csv", output_txt_file="trump_baseline.txt", days_for_stats=30):
     """
     Reads daily Trump post counts, calculates mean and standard deviation for the most recent 'days_for_stats' interval
     of activity, and saves these statistics to a text file.
     """
+    if not os.path.exists(input_csv_file):
+        print(f"Error: Input file {input_csv_file} not found.")
+        return
+    import pandas as pd
+
     try:
         df = pd.read_csv(input_csv_file)
     except FileNotFoundError:
@@ -1,7 +1,8 @@
 import os
 import json
 from dotenv import load_dotenv
-from openai import OpenAI
+from llm_providers import get_openai_completion
+from prompt_caching import split_prompt
 
 HOTEL_FINAL_JSON = "hotel_final.json"
 CRITIQUE_OUTPUT_FILE = "hotel_critique.txt"
@@ -29,6 +30,10 @@ Here is the hotel forecast data:
 End your critique with a summary of the top 2-3 most important concerns or limitations.
 """
 
+def build_critic_prompt(final_data_str):
+    """Fills CRITIC_PROMPT_TEMPLATE from the raw contents of the final forecast JSON."""
+    return CRITIC_PROMPT_TEMPLATE.format(forecast_json_content=final_data_str)
+
 def main():
     load_dotenv(dotenv_path=".env")
     openai_api_key = os.getenv("OPENAI_API_KEY")
@@ -49,19 +54,17 @@ def main():
         return
 
     # Prepare the full prompt
-    full_prompt = CRITIC_PROMPT_TEMPLATE.format(forecast_json_content=hotel_final_data_str)
+    full_prompt = build_critic_prompt(hotel_final_data_str)
 
-    client = OpenAI(api_key=openai_api_key)
     print(f"Sending critique request to {MODEL_TO_USE} for {HOTEL_FINAL_JSON}...")
 
     try:
-        completion = client.chat.completions.create(
-            model=MODEL_TO_USE,
-            messages=[{"role": "user", "content": full_prompt}],
+        system_prompt, user_prompt = split_prompt(full_prompt, CRITIC_PROMPT_TEMPLATE)
+        critique_text = get_openai_completion(
+            openai_api_key, MODEL_TO_USE, user_prompt, system_prompt=system_prompt or None,
             temperature=0.3, # Low temp for more focused critique
             max_tokens=1500 # Allow for a detailed critique
         )
-        critique_text = completion.choices[0].message.content.strip()
     except Exception as e:
         print(f"Error calling OpenAI API: {str(e)}")
         return
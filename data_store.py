@@ -0,0 +1,265 @@
+import os
+import json
+import sqlite3
+from datetime import datetime, timezone
+
+# Embedded SQLite store of the fetched posts and reviews, so date-window queries are index range
+# scans instead of a full read of trump_posts_raw.json / hotel_reviews_raw.csv per script.
+# Raw files stay the fetchers' output; each consumer syncs its input file into the store (a bulk
+# upsert keyed on post id / review_id, skipped while the file is unchanged) and then queries
+# only the rows it needs. Rows are scoped by dataset, the absolute path of the raw file they came
+# from, so e.g. synthetic benchmark files (which reuse the real account and place id) never mix
+# with the fetched data. Times are stored as UTC 'YYYY-MM-DD HH:MM:SS[.fff]' text, so a day or a
+# date window is a prefix / range comparison that the (dataset, account, created_at) and
+# (dataset, place_id, iso_date) indexes answer directly.
+
+STORE_DB = "forecast_store.sqlite"
+UPSERT_BATCH = 50_000
+# Same key order as the per-post date lookup the processing scripts have always used.
+POST_DATE_KEYS = ['createdAt', 'date', 'created_at', 'timestamp', 'created']
+POST_COLUMNS = ['id', 'account', 'created_at', 'content', 'url', 'replies_count', 'reblogs_count', 'favourites_count']
+REVIEW_COLUMNS = ['review_id', 'place_id', 'iso_date', 'rating', 'user_name', 'snippet', 'publish_date',
+                  'likes_count', 'user_link', 'review_link']
+UNKNOWN_ACCOUNT = 'unknown'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    dataset TEXT NOT NULL,
+    id TEXT NOT NULL,
+    account TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    content TEXT,
+    url TEXT,
+    replies_count INTEGER,
+    reblogs_count INTEGER,
+    favourites_count INTEGER,
+    PRIMARY KEY (dataset, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS posts_account_created ON posts (dataset, account, created_at);
+
+CREATE TABLE IF NOT EXISTS reviews (
+    dataset TEXT NOT NULL,
+    review_id TEXT NOT NULL,
+    place_id TEXT NOT NULL,
+    iso_date TEXT NOT NULL,
+    rating REAL,
+    user_name TEXT,
+    snippet TEXT,
+    publish_date TEXT,
+    likes_count INTEGER,
+    user_link TEXT,
+    review_link TEXT,
+    PRIMARY KEY (dataset, review_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS reviews_place_date ON reviews (dataset, place_id, iso_date, rating);
+
+-- Raw files (datasets) already in the store, with the accounts / place ids they hold.
+CREATE TABLE IF NOT EXISTS ingested_files (
+    dataset TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    keys_json TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    ingested_at TEXT NOT NULL
+);
+"""
+
+def connect(db_path=STORE_DB):
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def dataset_of(path):
+    return os.path.abspath(path)
+
+def _file_state(path):
+    stat = os.stat(path)
+    return dataset_of(path), stat.st_mtime_ns, stat.st_size
+
+def synced_keys(path, kind, db_path=STORE_DB):
+    """
+    The accounts (kind 'posts') or place ids (kind 'reviews') of `path` if the store already holds
+    this exact version of the file, else None (the caller then reads the file and ingests it).
+    """
+    if not os.path.exists(path) or not os.path.exists(db_path):
+        return None
+    abs_path, mtime_ns, size = _file_state(path)
+    with connect(db_path) as conn:
+        row = conn.execute("SELECT keys_json FROM ingested_files WHERE dataset = ? AND kind = ? AND mtime_ns = ? "
+                           "AND size = ?", (abs_path, kind, mtime_ns, size)).fetchone()
+    return json.loads(row[0]) if row else None
+
+def _mark_ingested(conn, path, kind, keys, rows):
+    abs_path, mtime_ns, size = _file_state(path)
+    conn.execute("INSERT OR REPLACE INTO ingested_files (dataset, kind, mtime_ns, size, keys_json, rows, ingested_at) "
+                 "VALUES (?, ?, ?, ?, ?, ?, ?)", (abs_path, kind, mtime_ns, size, json.dumps(keys), rows,
+                                                  datetime.now(timezone.utc).isoformat(timespec="seconds")))
+
+def _upsert(conn, table, columns, key, dataset, rows):
+    updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c != key)
+    sql = (f"INSERT INTO {table} (dataset, {', '.join(columns)}) VALUES (?, {', '.join('?' * len(columns))}) "
+           f"ON CONFLICT (dataset, {key}) DO UPDATE SET {updates}")
+    for start in range(0, len(rows), UPSERT_BATCH):
+        conn.executemany(sql, ((dataset, *row) for row in rows[start:start + UPSERT_BATCH]))
+
+def parse_post_times(values):
+    """
+    Vectorized post time parsing: numbers are Unix timestamps (milliseconds above 1e11, else
+    seconds), strings are ISO timestamps. Returns naive UTC timestamps (NaT where unparsable).
+    """
+    import pandas as pd
+    numeric = pd.to_numeric(values, errors='coerce')
+    is_number = values.map(lambda v: isinstance(v, (int, float)) and not isinstance(v, bool))
+    parsed = pd.to_datetime(values.where(~is_number), utc=True, format='ISO8601', errors='coerce')
+    millis = is_number & (numeric > 1e11)
+    parsed[millis] = pd.to_datetime(numeric[millis], unit='ms', utc=True)
+    parsed[is_number & ~millis] = pd.to_datetime(numeric[is_number & ~millis], unit='s', utc=True)
+    return parsed.dt.tz_localize(None)
+
+def _post_account(account):
+    """Username from a post's account object (a dict, or its string form in older fetches)."""
+    import re
+    if isinstance(account, dict):
+        return account.get('username') or account.get('acct')
+    if isinstance(account, str):
+        match = re.search(r"'username': '([^']+)'", account)
+        return match.group(1) if match else None
+    return None
+
+def ingest_posts(raw_posts, source_file, db_path=STORE_DB):
+    """
+    Bulk-upserts the raw posts read from source_file into its dataset, keyed on post id. The
+    account is the multi-account fetch tag, else the post's own account username. Returns the
+    sorted list of accounts ingested.
+    """
+    import pandas as pd
+    from fetch_trump_posts import SOURCE_ACCOUNT_KEY
+    posts = pd.DataFrame.from_records([p for p in raw_posts if isinstance(p, dict)],
+                                      columns=['id', SOURCE_ACCOUNT_KEY, 'account'] + POST_DATE_KEYS + POST_COLUMNS[3:])
+    # First non-empty date field of each post.
+    raw_dates = posts[POST_DATE_KEYS[0]].astype(object)
+    for key in POST_DATE_KEYS[1:]:
+        raw_dates = raw_dates.where(raw_dates.notna() & (raw_dates != ''), posts[key])
+    times = parse_post_times(raw_dates.astype(object))
+    account = posts[SOURCE_ACCOUNT_KEY].where(posts[SOURCE_ACCOUNT_KEY].notna(), posts['account'].map(_post_account))
+    table = pd.DataFrame({
+        'id': posts['id'].astype(str).where(posts['id'].notna()),
+        'account': account.fillna(UNKNOWN_ACCOUNT),
+        'created_at': times.dt.strftime('%Y-%m-%d %H:%M:%S.%f').str[:23],
+        **{c: posts[c] for c in POST_COLUMNS[3:]},
+    })
+    skipped = table['created_at'].isna() | table['id'].isna()
+    if skipped.any():
+        print(f"Warning: Skipping {int(skipped.sum())} posts without an id or a parsable date.")
+    table = table[~skipped].astype(object).where(table[~skipped].notna(), None)
+    accounts = sorted(table['account'].unique().tolist())
+    with connect(db_path) as conn:
+        _upsert(conn, "posts", POST_COLUMNS, "id", dataset_of(source_file),
+                list(table[POST_COLUMNS].itertuples(index=False, name=None)))
+        _mark_ingested(conn, source_file, "posts", accounts, len(table))
+    return accounts
+
+def ingest_reviews(df, source_file, db_path=STORE_DB):
+    """
+    Bulk-upserts a reviews DataFrame (the hotel_reviews_raw.csv columns) read from source_file
+    into its dataset, keyed on review_id. Reviews without a parsable iso_date are skipped. Returns the sorted list of place ids ingested.
+    """
+    import pandas as pd
+    table = df.reindex(columns=REVIEW_COLUMNS).copy()
+    table['iso_date'] = pd.to_datetime(table['iso_date'], utc=True, errors='coerce').dt.strftime('%Y-%m-%d %H:%M:%S')
+    table['rating'] = pd.to_numeric(table['rating'], errors='coerce')
+    skipped = table['iso_date'].isna() | table['review_id'].isna()
+    if skipped.any():
+        print(f"Warning: Skipping {int(skipped.sum())} reviews without a review_id or a parsable iso_date.")
+    table = table[~skipped]
+    table['place_id'] = table['place_id'].fillna('')
+    table = table.astype(object).where(table.notna(), None)
+    place_ids = sorted(table['place_id'].unique().tolist())
+    with connect(db_path) as conn:
+        _upsert(conn, "reviews", REVIEW_COLUMNS, "review_id", dataset_of(source_file),
+                list(table.itertuples(index=False, name=None)))
+        _mark_ingested(conn, source_file, "reviews", place_ids, len(table))
+    return place_ids
+
+def ingest_file(path, kind, db_path=STORE_DB, force=False):
+    """Syncs a raw posts JSON or reviews CSV into the store unless it is already there; returns its keys."""
+    keys = None if force else synced_keys(path, kind, db_path)
+    if keys is not None:
+        return keys
+    if kind == "posts":
+        with open(path, 'r') as f:
+            return ingest_posts(json.load(f), path, db_path)
+    import pandas as pd
+    return ingest_reviews(pd.read_csv(path), path, db_path)
+
+def _day_bound(value):
+    """Inclusive-start / exclusive-end comparison string for a date, datetime or 'YYYY-MM-DD' string."""
+    return value if isinstance(value, str) else value.strftime('%Y-%m-%d %H:%M:%S')
+
+def daily_post_counts(source_file, accounts, start=None, end=None, db_path=STORE_DB):
+    """
+    Posts per (account, UTC day) of source_file's dataset for the given accounts with start <= created_at < end (either
+    bound optional), as a DataFrame of account, date (datetime64), post_count.
+    """
+    import pandas as pd
+    with connect(db_path) as conn:
+        rows = conn.execute(
+            "SELECT account, substr(created_at, 1, 10) AS day, COUNT(*) FROM posts "
+            "WHERE dataset = ? AND account IN (SELECT value FROM json_each(?)) AND created_at >= ? AND created_at < ? "
+            "GROUP BY account, day",
+            (dataset_of(source_file), json.dumps(list(accounts)), _day_bound(start) if start else '', _day_bound(end) if end else '~')).fetchall()
+    df = pd.DataFrame(rows, columns=['account', 'date', 'post_count'])
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+def daily_review_metrics(source_file, place_ids, start=None, end=None, db_path=STORE_DB):
+    """
+    Reviews per UTC day of source_file's dataset for the given place ids with start <= iso_date < end, as a DataFrame of
+    date (datetime64), new_review_count, rating_sum, mean_rating. Reviews without a rating are not counted.
+    """
+    import pandas as pd
+    with connect(db_path) as conn:
+        rows = conn.execute(
+            "SELECT substr(iso_date, 1, 10) AS day, COUNT(rating), SUM(rating), AVG(rating) FROM reviews "
+            "WHERE dataset = ? AND place_id IN (SELECT value FROM json_each(?)) AND iso_date >= ? AND iso_date < ? "
+            "AND rating IS NOT NULL GROUP BY day ORDER BY day",
+            (dataset_of(source_file), json.dumps(list(place_ids)), _day_bound(start) if start else '', _day_bound(end) if end else '~')).fetchall()
+    df = pd.DataFrame(rows, columns=['date', 'new_review_count', 'rating_sum', 'mean_rating'])
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+def latest_review_time(source_file, place_ids, db_path=STORE_DB):
+    """Most recent iso_date (as a naive UTC datetime) among rated reviews of the given place ids, or None."""
+    dataset = dataset_of(source_file)
+    with connect(db_path) as conn:
+        latest = max((conn.execute("SELECT MAX(iso_date) FROM reviews WHERE dataset = ? AND place_id = ? "
+                                   "AND rating IS NOT NULL", (dataset, place_id)).fetchone()[0] or ''
+                      for place_id in place_ids), default='')
+    return datetime.strptime(latest, '%Y-%m-%d %H:%M:%S') if latest else None
+
+def review_ratings(source_file, place_ids, start, end, db_path=STORE_DB):
+    """Ratings of the reviews in source_file's dataset for the given place ids with start <= iso_date < end."""
+    with connect(db_path) as conn:
+        return [r[0] for r in conn.execute(
+            "SELECT rating FROM reviews WHERE dataset = ? AND place_id IN (SELECT value FROM json_each(?)) "
+            "AND iso_date >= ? AND iso_date < ? AND rating IS NOT NULL",
+            (dataset_of(source_file), json.dumps(list(place_ids)), _day_bound(start), _day_bound(end)))]
+
+def ingest_raw_files(posts_files=("trump_posts_raw.json", "truth_social_posts_raw.json"),
+                     reviews_files=("hotel_reviews_raw.csv",), db_path=STORE_DB, force=False):
+    """Syncs the fetched raw files that exist into the store."""
+    for kind, paths in (("posts", posts_files), ("reviews", reviews_files)):
+        for path in paths:
+            if os.path.exists(path):
+                keys = ingest_file(path, kind, db_path, force)
+                print(f"{path}: {kind} of {len(keys)} {'account' if kind == 'posts' else 'place'}(s) in {db_path}")
+    with connect(db_path) as conn:
+        n_posts = conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+        n_reviews = conn.execute("SELECT COUNT(*) FROM reviews").fetchone()[0]
+    print(f"Store holds {n_posts} posts and {n_reviews} reviews.")
+
+if __name__ == "__main__":
+    ingest_raw_files()
@@ -1,10 +1,13 @@
 import os
-import pandas as pd
 from datetime import datetime, timedelta
 import re
 import json
-from openai import OpenAI # Ensure openai library is available
 from dotenv import load_dotenv
+from llm_providers import get_openai_completion, get_structured_completion, parse_structured_forecast
+from prompt_caching import split_prompt
+import run_registry
+import data_store
+from data_store import STORE_DB
 
 # --- Configuration ---
 BACKTEST_DATE_STR = "2025-05-07"
@@ -19,26 +22,30 @@ OPENAI_MODEL = "gpt-3.5-turbo"
 
 # --- Helper Functions ---
 
-def calculate_ground_truth_rating(reviews_file, target_date_str):
-    """Calculates the actual mean rating from the reviews file for the given single date."""
+def calculate_ground_truth_rating(reviews_file, target_date_str, db_path=STORE_DB):
+    """
+    Calculates the actual mean rating for the given single (UTC) date, from the reviews file
+    synced into the local store (see data_store.py).
+    """
     try:
-        df = pd.read_csv(reviews_file)
-        if 'iso_date' not in df.columns or 'rating' not in df.columns:
-            print("Error: 'iso_date' or 'rating' column missing in reviews file.")
-            return None
-        
-        df['iso_date_dt'] = pd.to_datetime(df['iso_date']).dt.date # Convert to date objects
-        target_date = datetime.strptime(target_date_str, "%Y-%m-%d").date()
-        
-        mask = (df['iso_date_dt'] == target_date)
-        filtered_reviews = df.loc[mask]
-        
-        if filtered_reviews.empty:
+        place_ids = data_store.synced_keys(reviews_file, "reviews", db_path)
+        if place_ids is None:
+            import pandas as pd
+            df = pd.read_csv(reviews_file)
+            if 'iso_date' not in df.columns or 'rating' not in df.columns:
+                print("Error: 'iso_date' or 'rating' column missing in reviews file.")
+                return None
+            place_ids = data_store.ingest_reviews(df, reviews_file, db_path)
+
+        target_date = datetime.strptime(target_date_str, "%Y-%m-%d")
+        ratings = data_store.review_ratings(reviews_file, place_ids, target_date, target_date + timedelta(days=1), db_path)
+
+        if not ratings:
             print(f"No reviews found for the date {target_date_str}.")
             return None 
             
-        mean_rating = filtered_reviews['rating'].mean()
-        print(f"Ground truth for {target_date_str}: {mean_rating:.2f} from {len(filtered_reviews)} reviews.")
+        mean_rating = sum(ratings) / len(ratings)
+        print(f"Ground truth for {target_date_str}: {mean_rating:.2f} from {len(ratings)} reviews.")
         return round(mean_rating, 2)
     except FileNotFoundError:
         print(f"Error: Reviews file {reviews_file} not found.")
@@ -47,19 +54,68 @@ def calculate_ground_truth_rating(reviews_file, target_date_str):
         print(f"Error calculating ground truth: {e}")
         return None
 
-def get_llm_forecast(api_key, prompt_content, model_name):
-    """Gets a forecast from the LLM using the provided prompt."""
+def modify_prompt_for_backtest(prompt_content, backtest_date_str=BACKTEST_DATE_STR):
+    """Rewrites the forecast period of a prompt (June 2-6, 2025) to the single backtest date."""
+    # Original target phrase: "for the period of June 2, 2025, to June 6, 2025"
+    # New target phrase: "for May 07, 2025"
+    backtest_date_obj = datetime.strptime(backtest_date_str, '%Y-%m-%d')
+    backtest_period_str_long = f"for {backtest_date_obj.strftime('%B %d, %Y')}" # e.g., "for May 07, 2025"
+
+    modified_prompt = prompt_content.replace(
+        "for the period of June 2, 2025, to June 6, 2025", 
+        backtest_period_str_long
+    )
+    modified_prompt = modified_prompt.replace(
+        "for the period June 2-6, 2025", # A common variant from task list
+        backtest_period_str_long
+    )
+    # A more general replacement for any remaining June 2-6, 2025 phrasing
+    modified_prompt = re.sub(
+        r"(for (the period (of )?)?)?June\s+2(?:nd|th)?(?:\s*to(?:\s*and)?\s*|\s*-\s*)June\s+6(?:th)?,\s*2025",
+        backtest_period_str_long,
+        modified_prompt,
+        flags=re.IGNORECASE
+    )
+    # For the scenario prompt, the phrasing might be different for the final forecast part
+    modified_prompt = re.sub(
+        r"for the period June 2-6, 2025, assuming none",
+        f"{backtest_period_str_long}, assuming none",
+        modified_prompt,
+        flags=re.IGNORECASE
+    )
+    return modified_prompt
+
+def get_llm_forecast(api_key, prompt_content, model_name, structured=False, template=None):
+    """
+    Gets a forecast from the LLM using the provided prompt; template is the prompt file it was
+    rewritten from, so the unchanged leading instructions are split off for caching.
+    With structured=True the model returns a JSON object and no number-scraping fallback is used.
+    """
+    # Static instructions join the system message so they are cached across backtest windows.
+    static_prefix, variable_prompt = split_prompt(prompt_content, template)
+    system_prompt = "You are a helpful forecasting assistant."
+    if static_prefix:
+        system_prompt += "\n\n" + static_prefix
+    if structured:
+        try:
+            response_text = get_structured_completion("openai", api_key, model_name, variable_prompt, 0.7,
+                                                      system_prompt=system_prompt)
+            print(f"LLM Structured Response ({model_name}): {response_text}")
+            parsed = parse_structured_forecast(response_text, (1.0, 5.0))
+            if parsed is None:
+                print("Warning: Could not parse a valid forecast (1.0-5.0) from structured response.")
+                return None
+            return round(parsed["forecast"], 1)
+        except Exception as e:
+            print(f"Error calling OpenAI API: {e}")
+            return None
     try:
-        client = OpenAI(api_key=api_key)
-        completion = client.chat.completions.create(
-            model=model_name,
-            messages=[
-                {"role": "system", "content": "You are a helpful forecasting assistant."},
-                {"role": "user", "content": prompt_content}
-            ],
-            temperature=0.7 # As per T35, but we can make this configurable if needed for backtesting
+        response_text = get_openai_completion(
+            api_key, model_name, variable_prompt,
+            temperature=0.7, # As per T35, but we can make this configurable if needed for backtesting
+            max_tokens=None,
+            system_prompt=system_prompt
         )
-        response_text = completion.choices[0].message.content.strip()
         print(f"LLM Raw Response ({model_name}):\n{response_text}\n------------------")
         
         forecast_val = None
@@ -88,7 +144,7 @@ def get_llm_forecast(api_key, prompt_content, model_name):
         return None
 
 # --- Main Script Logic ---
-def main():
+def main(structured=False):
     load_dotenv(dotenv_path=".env")
     openai_api_key = os.getenv("OPENAI_API_KEY")
     if not openai_api_key:
@@ -103,6 +159,7 @@ def main():
         return
 
     results = []
+    evaluations = []
 
     for prompt_key, prompt_file_path in PROMPT_FILES.items():
         print(f"\n--- Evaluating prompt: {prompt_key} ({prompt_file_path}) ---")
@@ -110,39 +167,12 @@ def main():
             with open(prompt_file_path, 'r') as f:
                 original_prompt_content = f.read()
             
-            # Modify prompt for backtesting: change forecast period to the single backtest date
-            # Original target phrase: "for the period of June 2, 2025, to June 6, 2025"
-            # New target phrase: "for May 7, 2025"
-            backtest_date_obj = datetime.strptime(BACKTEST_DATE_STR, '%Y-%m-%d')
-            backtest_period_str_long = f"for {backtest_date_obj.strftime('%B %d, %Y')}" # e.g., "for May 07, 2025"
-            backtest_period_str_short = f"for {backtest_date_obj.strftime('%b %d, %Y')}" # e.g., "for May 07, 2025"
-            
-            modified_prompt = original_prompt_content.replace(
-                "for the period of June 2, 2025, to June 6, 2025", 
-                backtest_period_str_long
-            )
-            modified_prompt = modified_prompt.replace(
-                "for the period June 2-6, 2025", # A common variant from task list
-                backtest_period_str_long
-            )
-            # A more general replacement for any remaining June 2-6, 2025 phrasing
-            modified_prompt = re.sub(
-                r"(for (the period (of )?)?)?June\s+2(?:nd|th)?(?:\s*to(?:\s*and)?\s*|\s*-\s*)June\s+6(?:th)?,\s*2025",
-                backtest_period_str_long,
-                modified_prompt,
-                flags=re.IGNORECASE
-            )
-            # For the scenario prompt, the phrasing might be different for the final forecast part
-            modified_prompt = re.sub(
-                r"for the period June 2-6, 2025, assuming none",
-                f"{backtest_period_str_long}, assuming none",
-                modified_prompt,
-                flags=re.IGNORECASE
-            )
+            modified_prompt = modify_prompt_for_backtest(original_prompt_content, BACKTEST_DATE_STR)
+            backtest_period_str_long = f"for {datetime.strptime(BACKTEST_DATE_STR, '%Y-%m-%d').strftime('%B %d, %Y')}"
 
             print(f"Modified prompt for backtest (targeting {backtest_period_str_long}):\n{modified_prompt[:400]}...\n------------------")
             
-            llm_forecast = get_llm_forecast(openai_api_key, modified_prompt, OPENAI_MODEL)
+            llm_forecast = get_llm_forecast(openai_api_key, modified_prompt, OPENAI_MODEL, structured, original_prompt_content)
             
             mae = None
             if llm_forecast is not None:
@@ -150,6 +180,9 @@ def main():
                 print(f"LLM Forecast for {prompt_key}: {llm_forecast}, Ground Truth: {ground_truth_rating}, MAE: {mae:.2f}")
             else:
                 print(f"LLM forecast for {prompt_key} could not be determined.")
+            evaluations.append({"prompt_file": prompt_file_path, "prompt_text": modified_prompt,
+                                "period": BACKTEST_DATE_STR, "ground_truth": ground_truth_rating,
+                                "forecast": llm_forecast})
 
             results.append({
                 "prompt_name": prompt_key,
@@ -182,6 +215,7 @@ def main():
             })
 
     # Save results to CSV
+    import pandas as pd
     results_df = pd.DataFrame(results)
     try:
         results_df.to_csv(OUTPUT_CSV_FILE, index=False)
@@ -189,5 +223,7 @@ def main():
     except Exception as e_csv:
         print(f"Error saving results to CSV {OUTPUT_CSV_FILE}: {e_csv}")
 
+    run_registry.record_evaluations("hotel", evaluations, {"model_name": OPENAI_MODEL, "structured": structured})
+
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -1,9 +1,10 @@
 import os
 import json
 import re
-import pandas as pd
 from dotenv import load_dotenv
-from openai import OpenAI
+import llm_providers
+from prompt_caching import split_prompt
+import run_registry
 
 PROMPT_FILES = [
     "trump_prompt_base.txt",
@@ -27,6 +28,7 @@ BASELINE_STD = 7.84
 BASELINE_PERIOD = "May 4, 2025, to May 29, 2025"
 
 MODEL_TO_USE = "gpt-3.5-turbo"
+TEMPERATURE = 0.2
 
 def parse_forecast_from_response(response_text):
     if not response_text: return None
@@ -50,28 +52,28 @@ def parse_forecast_from_response(response_text):
     print(f"Warning: Could not extract a forecast from response: '{response_text[:100]}...'")
     return None
 
-def modify_prompt_for_backtest(prompt_content):
+def modify_prompt_for_backtest(prompt_content, period_description=BACKTEST_PERIOD_DESCRIPTION):
     # Replace the original forecast period (June 2-6) with the backtest period
-    modified_prompt = prompt_content.replace("June 2, 2025, to June 6, 2025", BACKTEST_PERIOD_DESCRIPTION)
+    modified_prompt = prompt_content.replace("June 2, 2025, to June 6, 2025", period_description)
     # Ensure baseline info is clearly stated as prior to the backtest period if not already clear
     # The current prompts already use baseline from end of May, which is fine for May 18-22 backtest.
     return modified_prompt
 
-def get_openai_completion(api_key, model_name, prompt, temperature=0.2):
-    client = OpenAI(api_key=api_key)
+def get_openai_completion(api_key, model_name, prompt, temperature=TEMPERATURE, structured=False, template=None):
+    # Static instructions are sent as a system prefix so they are cached across backtest windows;
+    # template is the prompt file the backtest prompt was rewritten from.
+    system_prompt, user_prompt = split_prompt(prompt, template)
     try:
-        completion = client.chat.completions.create(
-            model=model_name,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-            max_tokens=500 
-        )
-        return completion.choices[0].message.content.strip(), None
+        if structured:
+            return llm_providers.get_structured_completion("openai", api_key, model_name, user_prompt, temperature,
+                                                           system_prompt=system_prompt or None), None
+        return llm_providers.get_openai_completion(api_key, model_name, user_prompt, temperature, max_tokens=500,
+                                                   system_prompt=system_prompt or None), None
     except Exception as e:
         print(f"Error calling OpenAI API for {model_name}: {str(e)}")
         return None, str(e)
 
-def main():
+def main(structured=False):
     load_dotenv(dotenv_path=".env")
     openai_api_key = os.getenv("OPENAI_API_KEY")
     if not openai_api_key:
@@ -97,7 +99,8 @@ def main():
 
         modified_prompt = modify_prompt_for_backtest(original_prompt_content)
         
-        raw_response, api_error = get_openai_completion(openai_api_key, MODEL_TO_USE, modified_prompt)
+        raw_response, api_error = get_openai_completion(openai_api_key, MODEL_TO_USE, modified_prompt, structured=structured,
+                                                         template=original_prompt_content)
         
         forecast_value = None
         mae = None
@@ -106,7 +109,11 @@ def main():
             print(f"  API Error: {api_error}")
         elif raw_response:
             print(f"  Raw response (first 100 chars): {raw_response[:100]}...")
-            forecast_value = parse_forecast_from_response(raw_response)
+            if structured:
+                parsed = llm_providers.parse_structured_forecast(raw_response, (0.0, float("inf")))
+                forecast_value = round(parsed["forecast"], 1) if parsed else None
+            else:
+                forecast_value = parse_forecast_from_response(raw_response)
             print(f"  Extracted forecast: {forecast_value}")
             if forecast_value is not None:
                 mae = round(abs(forecast_value - GROUND_TRUTH_AVG_POSTS), 2)
@@ -135,6 +142,7 @@ def main():
         print("---\n")
 
     # Save to CSV
+    import pandas as pd
     df_results = pd.DataFrame(eval_results)
     try:
         df_results.to_csv(OUTPUT_CSV_FILE, index=False)
@@ -150,5 +158,8 @@ def main():
     except Exception as e:
         print(f"Error saving JSON details to {OUTPUT_JSON_DETAILS_FILE}: {e}")
 
+    run_registry.record_evaluations("trump", run_registry.evaluations_from_details(detailed_responses, MODEL_TO_USE, TEMPERATURE),
+                                    {"model_name": MODEL_TO_USE, "structured": structured})
+
 if __name__ == "__main__":
     main() 
\ No newline at end of file
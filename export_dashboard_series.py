@@ -0,0 +1,125 @@
+import os
+import json
+from datetime import datetime
+
+DASHBOARD_DIR = "dashboard"
+DASHBOARD_INDEX_FILE = "index.json"
+
+# Resolution name -> (pandas resample rule, rolling windows in periods of that resolution)
+RESOLUTIONS = {
+    "daily": ("D", [7, 28]),
+    "weekly": ("W-MON", [4]),   # weeks start on Monday and are labelled by that Monday
+    "monthly": ("MS", [3]),
+}
+
+def _resample(daily_df, rule, sum_columns, ratio_columns):
+    if rule == "D":
+        frame = daily_df[sum_columns].copy()
+        frame["days"] = 1
+    else:
+        resampler = daily_df[sum_columns].resample(rule, label="left", closed="left")
+        frame = resampler.sum()
+        frame["days"] = resampler.size() # Partial first/last periods cover fewer days
+    for ratio_name, (numerator, denominator) in ratio_columns.items():
+        frame[ratio_name] = frame[numerator] / frame[denominator].where(frame[denominator] > 0)
+    return frame
+
+def _add_rolling_stats(frame, windows, sum_columns, ratio_columns):
+    for window in windows:
+        for column in sum_columns:
+            rolling = frame[column].rolling(window, min_periods=1)
+            frame[f"{column}_rolling{window}_mean"] = rolling.mean()
+            frame[f"{column}_rolling{window}_std"] = rolling.std(ddof=0)
+        for ratio_name, (numerator, denominator) in ratio_columns.items():
+            # Ratios are rolled as ratio-of-sums so quiet periods don't get equal weight.
+            num = frame[numerator].rolling(window, min_periods=1).sum()
+            den = frame[denominator].rolling(window, min_periods=1).sum()
+            frame[f"{ratio_name}_rolling{window}"] = num / den.where(den > 0)
+    return frame
+
+def _write_series_json(frame, path, series_name, resolution):
+    data = {"date": frame.index.strftime("%Y-%m-%d").tolist()}
+    rounded = frame.round(4)
+    for column in rounded.columns:
+        data[column] = rounded[column].astype(object).where(rounded[column].notna(), None).tolist()
+    payload = {"series": series_name, "resolution": resolution, "columns": list(data.keys()), "data": data}
+    with open(path, "w") as f:
+        json.dump(payload, f, separators=(",", ":"))
+
+def export_dashboard_series(daily_df, series_name, sum_columns, ratio_columns=None, output_dir=DASHBOARD_DIR):
+    """
+    Writes daily, weekly and monthly versions of a daily series, with rolling means/stds, as compact
+    columnar JSON (and Parquet when pyarrow is installed) under output_dir, and records them in
+    output_dir/index.json. daily_df must have a 'date' column and one row per day.
+    ratio_columns maps an output name to a (numerator, denominator) pair of sum_columns, e.g.
+    {"mean_rating": ("rating_sum", "new_review_count")}, so averages stay correctly weighted
+    after downsampling.
+    """
+    import pandas as pd
+    ratio_columns = ratio_columns or {}
+
+    if daily_df.empty:
+        print(f"No data for dashboard series '{series_name}'. Skipping export.")
+        return []
+
+    daily = daily_df.copy()
+    daily["date"] = pd.to_datetime(daily["date"])
+    daily = daily.groupby("date")[sum_columns].sum().sort_index()
+    # Fill missing days with zeros so rolling windows count calendar days, not active days.
+    daily = daily.reindex(pd.date_range(daily.index.min(), daily.index.max(), freq="D"), fill_value=0)
+
+    try:
+        import pyarrow  # noqa: F401  (optional, only needed for Parquet output)
+        write_parquet = True
+    except ImportError:
+        write_parquet = False
+        print("Note: pyarrow not installed; writing JSON dashboard files only.")
+
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+    for resolution, (rule, windows) in RESOLUTIONS.items():
+        frame = _resample(daily, rule, sum_columns, ratio_columns)
+        frame = _add_rolling_stats(frame, windows, sum_columns, ratio_columns)
+        frame.index.name = "date"
+        json_path = os.path.join(output_dir, f"{series_name}_{resolution}.json")
+        _write_series_json(frame, json_path, series_name, resolution)
+        files = {"json": os.path.basename(json_path)}
+        if write_parquet:
+            parquet_path = os.path.join(output_dir, f"{series_name}_{resolution}.parquet")
+            frame.reset_index().to_parquet(parquet_path, index=False)
+            files["parquet"] = os.path.basename(parquet_path)
+        written.append({"resolution": resolution, "rows": len(frame), "files": files})
+
+    index_path = os.path.join(output_dir, DASHBOARD_INDEX_FILE)
+    try:
+        with open(index_path, "r") as f:
+            index = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        index = {}
+    index[series_name] = {
+        "start_date": daily.index.min().strftime("%Y-%m-%d"),
+        "end_date": daily.index.max().strftime("%Y-%m-%d"),
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "resolutions": written,
+    }
+    with open(index_path, "w") as f:
+        json.dump(index, f, indent=4, sort_keys=True)
+    print(f"Dashboard series '{series_name}' exported to {output_dir} ({', '.join(RESOLUTIONS)}).")
+    return written
+
+def serve_dashboard(output_dir=DASHBOARD_DIR, port=8050):
+    """Serves the exported dashboard files read-only over HTTP on localhost."""
+    import functools
+    from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+    if not os.path.exists(os.path.join(output_dir, DASHBOARD_INDEX_FILE)):
+        print(f"Error: No {DASHBOARD_INDEX_FILE} in {output_dir}. Run hotel-daily-metrics / process-posts with --export-dashboard first.")
+        return
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=output_dir)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    print(f"Serving {output_dir} at http://127.0.0.1:{port}/{DASHBOARD_INDEX_FILE} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
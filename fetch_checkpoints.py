@@ -0,0 +1,128 @@
+import os
+import json
+import contextlib
+
+# Fetch scripts persist every page as it arrives so a failed run can resume where it stopped,
+# and only swap their final output into place once the whole fetch has succeeded.
+# A checkpoint lives in CHECKPOINT_DIR/<output file name>/ and holds two files:
+#   items.jsonl  - the fetched items, one JSON object per line, appended page by page
+#   cursor.json  - {"key", "cursor", "item_count", "item_bytes"}, rewritten atomically after each page
+# The key identifies the fetch (e.g. the place_id or username), so a checkpoint left by a
+# different fetch is ignored. item_count/item_bytes keep the pair consistent: items appended
+# after the last cursor write (a crash mid-page) are ignored on resume and truncated away.
+
+CHECKPOINT_DIR = ".fetch_checkpoints"
+
+@contextlib.contextmanager
+def atomic_output(path):
+    """
+    Yields a temporary path next to path to write the output to; on success it is renamed over
+    path in one step, so readers never see a partial file. On error the temporary file is removed
+    and path is left as it was.
+    """
+    tmp_path = f"{path}.tmp"
+    try:
+        yield tmp_path
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+
+def _replace_from_temp(path, write):
+    with atomic_output(path) as tmp_path:
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+
+def atomic_write_json(path, data, **dump_kwargs):
+    """Writes data as JSON to a temporary file and renames it over path, so readers never see a partial file."""
+    _replace_from_temp(path, lambda f: json.dump(data, f, **dump_kwargs))
+
+def atomic_write_text(path, text):
+    _replace_from_temp(path, lambda f: f.write(text))
+
+def has_good_data(json_file):
+    """True if json_file holds a non-empty JSON list that isn't an [{"error"/"warning": ...}] placeholder."""
+    try:
+        with open(json_file, 'r') as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return False
+    if not isinstance(data, list) or not data:
+        return False
+    first = data[0]
+    return not (isinstance(first, dict) and ("error" in first or "warning" in first))
+
+def save_fetch_error(json_file, message, kind="error"):
+    """
+    Records a failed fetch in json_file as [{kind: message}], unless the file already holds
+    good data from an earlier fetch, which is left untouched.
+    """
+    if has_good_data(json_file):
+        print(f"Keeping the existing data in {json_file}; the {kind} was not written over it.")
+        return
+    try:
+        atomic_write_json(json_file, [{kind: message}], indent=4)
+        print(f"Error details saved to {json_file}")
+    except Exception as e_save:
+        print(f"Error saving error details to {json_file}: {e_save}")
+
+def checkpoint_dir(output_file):
+    return os.path.join(CHECKPOINT_DIR, os.path.basename(output_file))
+
+def load_checkpoint(output_file, key):
+    """Returns (cursor, items) from the checkpoint for output_file, or (None, []) if there is none for key."""
+    directory = checkpoint_dir(output_file)
+    try:
+        with open(os.path.join(directory, "cursor.json"), 'r') as f:
+            state = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None, []
+    if state.get("key") != key:
+        print(f"Ignoring checkpoint in {directory}: it belongs to a different fetch ({state.get('key')}).")
+        return None, []
+    items = []
+    with open(os.path.join(directory, "items.jsonl"), 'r', encoding='utf-8') as f:
+        for line in f:
+            if len(items) == state["item_count"]:
+                break
+            items.append(json.loads(line))
+    return state["cursor"], items
+
+def start_checkpoint(output_file, key, cursor):
+    """Starts a fresh checkpoint for output_file, discarding any previous one."""
+    directory = checkpoint_dir(output_file)
+    os.makedirs(directory, exist_ok=True)
+    open(os.path.join(directory, "items.jsonl"), 'w').close()
+    atomic_write_json(os.path.join(directory, "cursor.json"), {"key": key, "cursor": cursor, "item_count": 0, "item_bytes": 0})
+
+def save_checkpoint_page(output_file, key, cursor, items):
+    """Appends one page of items to the checkpoint, then records the cursor to resume from."""
+    directory = checkpoint_dir(output_file)
+    cursor_path = os.path.join(directory, "cursor.json")
+    with open(cursor_path, 'r') as f:
+        state = json.load(f)
+    with open(os.path.join(directory, "items.jsonl"), 'r+b') as f:
+        # Drop anything appended after the last cursor write, e.g. by a run that crashed mid-page.
+        f.truncate(state["item_bytes"])
+        f.seek(0, os.SEEK_END)
+        f.write("".join(json.dumps(item) + "\n" for item in items).encode('utf-8'))
+        f.flush()
+        os.fsync(f.fileno())
+        item_bytes = f.tell()
+    atomic_write_json(cursor_path, {"key": key, "cursor": cursor, "item_count": state["item_count"] + len(items),
+                                    "item_bytes": item_bytes})
+
+def clear_checkpoint(output_file):
+    directory = checkpoint_dir(output_file)
+    for name in ("items.jsonl", "cursor.json"):
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+    try:
+        os.rmdir(directory)
+    except OSError:
+        pass
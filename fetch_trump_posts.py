@@ -1,13 +1,74 @@
 import os
-import json
 import sys # Import sys module
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
-from apify_client import ApifyClient
+from fetch_checkpoints import (atomic_write_json, save_fetch_error, load_checkpoint, start_checkpoint,
+                               save_checkpoint_page, clear_checkpoint)
+
+DATASET_CHUNK_SIZE = 250 # Items per offset/limit range request
+DATASET_DOWNLOAD_WORKERS = 8
+DATASET_RANGE_RETRIES = 3
+APIFY_ACTOR_ID = "muhammetakkurtt/truth-social-scraper"
+# Key added to every post collected by the multi-account fetch. Posts already carry the
+# scraper's own 'account' object, so the tag uses a separate name.
+SOURCE_ACCOUNT_KEY = "source_account"
+MAX_CONCURRENT_RUNS = 4
+
+def build_actor_input(username, max_posts):
+    return {
+        "username": username,
+        "maxPosts": max_posts,
+        "useLastPostId": False, # Get fresh full scrape
+        "onlyReplies": False,
+        "onlyMedia": False,
+        "cleanContent": True
+    }
+
+def _fetch_dataset_range(dataset, offset, limit, retries=DATASET_RANGE_RETRIES):
+    """Fetches one offset/limit range of a dataset, retrying just this range on failure."""
+    for attempt in range(retries + 1):
+        try:
+            return dataset.list_items(offset=offset, limit=limit).items
+        except Exception as e:
+            if attempt == retries:
+                raise RuntimeError(f"range {offset}-{offset + limit - 1} failed after {retries + 1} attempts: {e}") from e
+            wait = 2 ** attempt
+            print(f"Range {offset}-{offset + limit - 1} failed ({e}). Retrying in {wait}s...")
+            time.sleep(wait)
+
+def iterate_dataset_chunks(dataset, chunk_size=DATASET_CHUNK_SIZE, max_workers=DATASET_DOWNLOAD_WORKERS, start_offset=0):
+    """
+    Yields the items of an Apify dataset in order, one chunk at a time, starting at start_offset.
+    The item count is read first and the offset/limit ranges are downloaded concurrently by a
+    bounded thread pool; chunks are still yielded in dataset order as soon as all earlier ones
+    have arrived. Falls back to the sequential iterate_items() stream if the item count isn't available.
+    """
+    item_count = (dataset.get() or {}).get("itemCount")
+    if item_count is None:
+        print("Dataset item count unavailable; downloading sequentially.")
+        yield list(dataset.iterate_items(offset=start_offset))
+        return
+    offsets = range(start_offset, item_count, chunk_size)
+    print(f"Downloading {item_count} items in {len(offsets)} ranges with up to {max_workers} workers.")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_fetch_dataset_range, dataset, offset, chunk_size) for offset in offsets]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
 
 def fetch_trump_truth_social_posts_apify(api_key_env_file=".env", output_json_file="trump_posts_raw.json", target_username="realDonaldTrump", max_posts_to_fetch=1000):
     """
     Fetches Donald Trump's Truth Social posts using the Apify Truth Social scraper Actor
     and saves them to a JSON file.
+
+    Downloaded chunks are checkpointed (see fetch_checkpoints.py) together with the run's dataset
+    ID, so a failed download resumes from the last saved chunk without re-running the Actor.
+    The output file is only replaced once the download completes, and a failure never
+    overwrites posts saved by an earlier successful fetch.
     """
     print(f"Attempting to fetch {max_posts_to_fetch} posts for user '{target_username}' via Apify.")
 
@@ -42,13 +103,7 @@ def fetch_trump_truth_social_posts_apify(api_key_env_file=".env", output_json_fi
     if not apify_api_key:
         print(f"Error: APIFY_API_KEY not found in environment after attempting to load from {env_file_path}.")
         print("Please ensure the Apify API key is correctly set with the variable name APIFY_API_KEY in that file.")
-        error_data = [{"error": "APIFY_API_KEY not found after load_dotenv."}]
-        try:
-            with open(output_json_file, 'w') as f:
-                json.dump(error_data, f, indent=4)
-            print(f"Error details saved to {output_json_file}")
-        except Exception as e_save:
-            print(f"Error saving error details to {output_json_file}: {e_save}")
+        save_fetch_error(output_json_file, "APIFY_API_KEY not found after load_dotenv.")
         # print("Exiting script after API key check due to missing key.")
         # sys.exit(1) # Exit if key not found - REMOVED FOR NORMAL OPERATION
         return # Return if key not found
@@ -61,59 +116,138 @@ def fetch_trump_truth_social_posts_apify(api_key_env_file=".env", output_json_fi
 
     # --- Initialize Apify Client ---
     try:
+        from apify_client import ApifyClient
         client = ApifyClient(apify_api_key)
     except Exception as e:
         print(f"Error initializing ApifyClient: {e}")
-        error_data = [{"error": f"Error initializing ApifyClient: {e}"}]
-        try:
-            with open(output_json_file, 'w') as f:
-                json.dump(error_data, f, indent=4)
-            print(f"Error details saved to {output_json_file}")
-        except Exception as e_save:
-            print(f"Error saving error details to {output_json_file}: {e_save}")
+        save_fetch_error(output_json_file, f"Error initializing ApifyClient: {e}")
         return
 
     # --- Prepare Actor Input ---
-    actor_input = {
-        "username": target_username,
-        "maxPosts": max_posts_to_fetch,
-        "useLastPostId": False, # Get fresh full scrape
-        "onlyReplies": False,
-        "onlyMedia": False,
-        "cleanContent": True
-    }
-    
-    actor_id = "muhammetakkurtt/truth-social-scraper"
+    actor_input = build_actor_input(target_username, max_posts_to_fetch)
+    actor_id = APIFY_ACTOR_ID
     print(f"Running Apify Actor: {actor_id} with input: {actor_input}")
 
-    all_posts = []
+    checkpoint_key = f"{actor_id}:{target_username}:{max_posts_to_fetch}"
+    cursor, all_posts = load_checkpoint(output_json_file, checkpoint_key)
     try:
-        # Run the Actor and wait for it to finish
-        run = client.actor(actor_id).call(run_input=actor_input)
-        
-        print(f"Actor run initiated. Run ID: {run.get('id')}, Dataset ID: {run.get('defaultDatasetId')}")
+        if cursor:
+            print(f"Resuming download of dataset {cursor['dataset_id']} at item {cursor['offset']} "
+                  f"({len(all_posts)} items already checkpointed).")
+        else:
+            # Run the Actor and wait for it to finish
+            run = client.actor(actor_id).call(run_input=actor_input)
+            print(f"Actor run initiated. Run ID: {run.get('id')}, Dataset ID: {run.get('defaultDatasetId')}")
+            cursor = {"dataset_id": run["defaultDatasetId"], "offset": 0}
+            start_checkpoint(output_json_file, checkpoint_key, cursor)
         print("Fetching results from dataset... This might take a few minutes.") # Added time warning
 
-        # Fetch Actor results from the run's dataset
-        # The .list_items() method handles pagination internally if the dataset is large.
-        dataset = client.dataset(run["defaultDatasetId"])
-        for item in dataset.iterate_items(): # Iterate through all items in the dataset
-            all_posts.append(item)
+        # Fetch Actor results from the run's dataset in parallel offset/limit ranges,
+        # checkpointing each chunk as it arrives
+        dataset = client.dataset(cursor["dataset_id"])
+        for chunk in iterate_dataset_chunks(dataset, start_offset=cursor["offset"]):
+            all_posts.extend(chunk)
+            cursor = {"dataset_id": cursor["dataset_id"], "offset": cursor["offset"] + len(chunk)}
+            save_checkpoint_page(output_json_file, checkpoint_key, cursor, chunk)
         
         print(f"Successfully fetched {len(all_posts)} items from the dataset.")
-        if not all_posts:
-            print("Warning: No items returned from the Apify Actor run.")
-            all_posts = [{"warning": "No items returned from Apify Actor for the given input."}]
-
     except Exception as e:
         print(f"An error occurred during Apify Actor run or data fetching: {e}")
-        all_posts = [{"error": f"Apify Actor interaction error: {e}"}]
+        if cursor:
+            print(f"Progress is checkpointed; re-run to resume from item {cursor['offset']}.")
+        save_fetch_error(output_json_file, f"Apify Actor interaction error: {e}")
+        return
+
+    if not all_posts:
+        print("Warning: No items returned from the Apify Actor run.")
+        save_fetch_error(output_json_file, "No items returned from Apify Actor for the given input.", kind="warning")
+        clear_checkpoint(output_json_file)
+        return
 
     # --- Save raw data to JSON ---
     try:
-        with open(output_json_file, 'w') as f:
-            json.dump(all_posts, f, indent=4)
-        print(f"Raw data (or error/warning) saved to {output_json_file}")
+        atomic_write_json(output_json_file, all_posts, indent=4)
+        clear_checkpoint(output_json_file)
+        print(f"Raw data saved to {output_json_file}")
+    except Exception as e:
+        print(f"Error saving data to {output_json_file}: {e}")
+
+def collect_account_posts(client, username, max_posts):
+    """Runs the scraper Actor for one account and returns its posts, each tagged with SOURCE_ACCOUNT_KEY."""
+    run = client.actor(APIFY_ACTOR_ID).call(run_input=build_actor_input(username, max_posts))
+    print(f"[{username}] Actor run finished. Run ID: {run.get('id')}, Dataset ID: {run.get('defaultDatasetId')}")
+    posts = []
+    for chunk in iterate_dataset_chunks(client.dataset(run["defaultDatasetId"])):
+        posts.extend(chunk)
+    for post in posts:
+        if isinstance(post, dict):
+            post[SOURCE_ACCOUNT_KEY] = username
+    return posts
+
+def fetch_truth_social_accounts_apify(usernames, api_key_env_file=".env", output_json_file="truth_social_posts_raw.json",
+                                      max_posts_to_fetch=1000, max_concurrent_runs=MAX_CONCURRENT_RUNS):
+    """
+    Fetches posts for several Truth Social accounts in one go, running up to max_concurrent_runs
+    Apify Actor runs at the same time, and saves all posts to one JSON file with every post
+    tagged with its account under SOURCE_ACCOUNT_KEY.
+    Each finished account is checkpointed, so re-running after a failure only repeats the
+    accounts that didn't finish. The output is only written once every account has succeeded.
+    """
+    usernames = list(dict.fromkeys(usernames))
+    load_dotenv(dotenv_path=os.path.abspath(api_key_env_file), override=True)
+    apify_api_key = os.getenv("APIFY_API_KEY")
+    if not apify_api_key:
+        print(f"Error: APIFY_API_KEY not found in environment after attempting to load from {api_key_env_file}.")
+        save_fetch_error(output_json_file, "APIFY_API_KEY not found after load_dotenv.")
+        return
+
+    from apify_client import ApifyClient
+    client = ApifyClient(apify_api_key)
+
+    checkpoint_key = f"{APIFY_ACTOR_ID}:{','.join(usernames)}:{max_posts_to_fetch}"
+    cursor, all_posts = load_checkpoint(output_json_file, checkpoint_key)
+    if cursor:
+        print(f"Resuming: {len(cursor['done'])} of {len(usernames)} accounts already fetched ({len(all_posts)} posts).")
+    else:
+        cursor = {"done": []}
+        start_checkpoint(output_json_file, checkpoint_key, cursor)
+    pending = [u for u in usernames if u not in cursor["done"]]
+
+    print(f"Running {len(pending)} Actor runs with up to {max_concurrent_runs} at a time: {', '.join(pending)}")
+    failed = {}
+    with ThreadPoolExecutor(max_workers=max_concurrent_runs) as executor:
+        futures = {executor.submit(collect_account_posts, client, u, max_posts_to_fetch): u for u in pending}
+        for future in as_completed(futures):
+            username = futures[future]
+            try:
+                posts = future.result()
+            except Exception as e:
+                print(f"[{username}] Error during Apify Actor run or data fetching: {e}")
+                failed[username] = str(e)
+                continue
+            print(f"[{username}] Fetched {len(posts)} posts.")
+            all_posts.extend(posts)
+            cursor = {"done": cursor["done"] + [username]}
+            save_checkpoint_page(output_json_file, checkpoint_key, cursor, posts)
+
+    if failed:
+        print(f"{len(failed)} account(s) failed: {', '.join(failed)}. Re-run to retry them; "
+              f"{output_json_file} is unchanged.")
+        return
+
+    if not all_posts:
+        print("Warning: No items returned from the Apify Actor runs.")
+        save_fetch_error(output_json_file, "No items returned from Apify Actor for the given accounts.", kind="warning")
+        clear_checkpoint(output_json_file)
+        return
+
+    # Keep the output grouped by account in the order the accounts were requested.
+    order = {u: i for i, u in enumerate(usernames)}
+    all_posts.sort(key=lambda post: order.get(post.get(SOURCE_ACCOUNT_KEY), len(order)))
+    try:
+        atomic_write_json(output_json_file, all_posts, indent=4)
+        clear_checkpoint(output_json_file)
+        print(f"Raw data for {len(usernames)} accounts ({len(all_posts)} posts) saved to {output_json_file}")
     except Exception as e:
         print(f"Error saving data to {output_json_file}: {e}")
 
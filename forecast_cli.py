@@ -0,0 +1,339 @@
+import argparse
+import importlib
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Single entry point for the pipeline scripts: `python forecast_cli.py <command>`.
+# Each command names the module and function that implement it; the module is only
+# imported when its command runs, and the modules themselves import pandas,
+# matplotlib and the provider SDKs inside the functions that need them.
+COMMANDS = {
+    "get-place-id": ("get_place_id", "get_place_id_and_save", "Look up the hotel's Google Maps Place ID (T10)."),
+    "fetch-reviews": ("get_hotel_reviews", "fetch_reviews_and_save", "Fetch Google reviews via SerpAPI (T11)."),
+    "hotel-stats": ("calculate_hotel_stats", "calculate_and_save_stats", "Compute the hotel baseline rating (T12)."),
+    "hotel-daily-metrics": ("calculate_daily_hotel_metrics", "calculate_daily_metrics", "Compute daily review metrics (T13)."),
+    "fetch-posts": ("fetch_trump_posts", "fetch_trump_truth_social_posts_apify", "Fetch Truth Social posts via Apify (T20)."),
+    "fetch-accounts": ("fetch_trump_posts", "fetch_truth_social_accounts_apify", "Fetch posts for several Truth Social accounts concurrently."),
+    "process-accounts": ("process_trump_posts", "count_daily_posts_by_account", "Count daily posts per (account, day) for a multi-account fetch."),
+    "process-posts": ("process_trump_posts", "parse_and_count_daily_posts", "Count posts per day (T21)."),
+    "trump-stats": ("calculate_trump_stats", "calculate_and_save_trump_stats", "Compute the Trump posting baseline (T22)."),
+    "plot-posts": ("plot_trump_daily_posts", "plot_daily_trump_posts", "Plot daily post counts (T23)."),
+    "evaluate-hotel-prompts": ("evaluate_hotel_prompts", "main", "Backtest the hotel prompt variants (T33)."),
+    "evaluate-trump-prompts": ("evaluate_trump_prompts", "main", "Backtest the Trump prompt variants (T43)."),
+    "ensemble-hotel": ("generate_ensemble_forecasts_hotel", "main", "Run the hotel LLM ensemble (T35)."),
+    "ensemble-trump": ("generate_ensemble_forecasts_trump", "main", "Run the Trump LLM ensemble (T45)."),
+    "aggregate-hotel": ("aggregate_hotel_forecasts", "main", "Aggregate hotel ensemble predictions (T36)."),
+    "aggregate-trump": ("aggregate_trump_forecasts", "main", "Aggregate Trump ensemble predictions (T46)."),
+    "critique-hotel": ("critique_hotel_forecast", "main", "Critique the hotel forecast with GPT-4o (T50)."),
+    "critique-trump": ("critique_trump_forecast", "main", "Critique the Trump forecast with GPT-4o (T51)."),
+    "revise-hotel": ("revise_hotel_forecast", "main", "Revise the hotel forecast after critique (T52)."),
+    "plot-batch": ("plot_trump_daily_posts", "plot_daily_series_batch", "Plot every series in a long-format daily CSV."),
+    "serve-dashboard": ("export_dashboard_series", "serve_dashboard", "Serve the exported dashboard series locally."),
+    "critique-stage": ("run_critique_stage", "main", "Critique and revise all targets concurrently."),
+    "mock-llm-server": ("mock_llm_server", "serve_mock_llm", "Serve a local mock of the OpenAI/Anthropic/Gemini APIs."),
+    "load-test-llm": ("load_test_llm", "run_load_test", "Load-test the ensemble and backtest calls against the mock server."),
+    "generate-synthetic": ("generate_synthetic_data", "generate_synthetic_data", "Generate synthetic posts and reviews at benchmark sizes."),
+    "benchmark-processing": ("benchmark_processing", "run_processing_benchmark", "Time and memory-profile the processing stages on synthetic data."),
+    "build-prompts": ("build_prompt_context", "build_prompts", "Regenerate the data-bearing prompts from their templates."),
+    "statistical-forecasts": ("statistical_forecasts", "run_statistical_forecasts", "Add the statistical baseline forecasters to *_preds_raw.json."),
+    "gated-ensemble": ("gate_llm_forecasts", "run_gated_ensemble", "Run the LLM ensembles only where the statistical forecast is uncertain."),
+    "plan-gating": ("gate_llm_forecasts", "plan_gating", "Gate every series of a daily table and report the LLM calls needed."),
+    "registry-import": ("run_registry", "import_existing_files", "Backfill the run registry from the current output files."),
+    "registry-export": ("run_registry", "export_run", "Write a recorded run back out as its JSON output file."),
+    "registry-mae": ("run_registry", "print_mae_by_prompt", "Show the MAE of each prompt over recent evaluations."),
+    "store-ingest": ("data_store", "ingest_raw_files", "Sync the fetched posts and reviews into the indexed local store."),
+    "benchmark-registry": ("run_registry", "benchmark_registry", "Time the MAE-by-prompt query on a synthetic registry."),
+    "backtest": ("backtest_scheduler", "run_backtest", "Backtest prompts x models x temperatures x windows from a resumable queue."),
+    "backtest-status": ("backtest_scheduler", "backtest_status", "Show the progress and MAE table of a backtest job."),
+    "route-models": ("model_router", "route_models", "Pick each target's ensemble models by accuracy within latency/cost budgets."),
+    "sweep": ("sweep_planner", "run_sweep", "Run a deduplicated prompt x model x temperature x window sweep."),
+    "sweep-slice": ("sweep_planner", "print_cube_slice", "Show the sweep results cube's MAE by any dimensions."),
+    "simulate-forecasts": ("simulate_forecasts", "simulate_forecasts", "Add Monte Carlo quantiles and intervals to *_final.json."),
+    "simulate-series": ("simulate_forecasts", "simulate_series_table", "Simulate quantiles for every series of a daily table."),
+    "benchmark-simulation": ("simulate_forecasts", "benchmark_simulation", "Time the Monte Carlo simulation on synthetic series."),
+}
+
+# Extra arguments for commands whose entry function takes parameters; each parsed
+# value is passed to the function as a keyword argument of the same name.
+COMMAND_OPTIONS = {
+    "hotel-daily-metrics": [
+        (["--export-dashboard"], {"action": "store_true", "help": "Also write the daily/weekly/monthly series to dashboard/."}),
+    ],
+    "process-posts": [
+        (["--export-dashboard"], {"action": "store_true", "help": "Also write the daily/weekly/monthly series to dashboard/."}),
+    ],
+    "fetch-reviews": [
+        (["--full-refresh"], {"action": "store_true"}),
+    ],
+    "fetch-accounts": [
+        (["usernames"], {"nargs": "+"}),
+        (["--output-json-file"], {"default": "truth_social_posts_raw.json"}),
+        (["--max-posts-to-fetch"], {"type": int, "default": 1000}),
+        (["--max-concurrent-runs"], {"type": int, "default": 4}),
+    ],
+    "process-accounts": [
+        (["--input-json-file"], {"default": "truth_social_posts_raw.json"}),
+        (["--output-csv-file"], {"default": "truth_social_posts_daily.csv"}),
+        (["--days-to-include"], {"type": int, "default": 60}),
+    ],
+    "plot-batch": [
+        (["input_csv_file"], {}),
+        (["output_dir"], {}),
+        (["--series-column"], {"default": "account"}),
+        (["--value-column"], {"default": "post_count"}),
+        (["--date-column"], {"default": "date"}),
+        (["--max-workers"], {"type": int, "default": None}),
+        (["--force"], {"action": "store_true", "help": "Re-render series even if their data is unchanged."}),
+    ],
+    "serve-dashboard": [
+        (["--output-dir"], {"default": "dashboard"}),
+        (["--port"], {"type": int, "default": 8050}),
+    ],
+    "critique-stage": [
+        (["--targets"], {"nargs": "+", "choices": ["hotel", "trump"], "default": None}),
+        (["--critics"], {"nargs": "+", "default": None, "metavar": "PROVIDER:MODEL"}),
+    ],
+    "mock-llm-server": [
+        (["--port"], {"type": int, "default": 8765}),
+        (["--latency-median-ms"], {"type": float, "default": 400}),
+        (["--latency-sigma"], {"type": float, "default": 0.5}),
+        (["--rate-limit-probability"], {"type": float, "default": 0.0}),
+        (["--seed"], {"type": int, "default": None}),
+    ],
+    "load-test-llm": [
+        (["--workloads"], {"nargs": "+", "choices": ["ensemble", "backtest"], "default": None}),
+        (["--concurrency-levels"], {"nargs": "+", "type": int, "default": None}),
+        (["--rounds"], {"type": int, "default": 1}),
+        (["--providers"], {"nargs": "+", "choices": ["openai", "anthropic", "google"], "default": None}),
+        (["--latency-median-ms"], {"type": float, "default": None}),
+        (["--latency-sigma"], {"type": float, "default": None}),
+        (["--rate-limit-probability"], {"type": float, "default": None}),
+        (["--base-url"], {"default": None, "help": "Use an already running mock server."}),
+        (["--output-json-file"], {"default": None}),
+        (["--stream"], {"action": "store_true", "help": "Stream and stop at the Final Forecast line."}),
+        (["--structured"], {"action": "store_true", "help": "Use the structured-output mode."}),
+    ],
+    "generate-synthetic": [
+        (["--sizes"], {"nargs": "+", "type": int, "default": [10**4]}),
+        (["--output-dir"], {"default": "synthetic_data"}),
+        (["--days"], {"type": int, "default": 365}),
+        (["--seed"], {"type": int, "default": 0}),
+        (["--kinds"], {"nargs": "+", "choices": ["posts", "reviews"], "default": ["posts", "reviews"]}),
+        (["--force"], {"action": "store_true"}),
+    ],
+    "benchmark-processing": [
+        (["--sizes"], {"nargs": "+", "type": int, "default": None}),
+        (["--stages"], {"nargs": "+", "default": None}),
+        (["--repeats"], {"type": int, "default": 3}),
+        (["--output-dir"], {"default": "benchmark_results"}),
+        (["--compare-to"], {"default": "latest", "help": "Results file to compare with, or 'latest'."}),
+        (["--data-dir"], {"default": None}),
+    ],
+    "build-prompts": [
+        (["--output-dir"], {"default": "."}),
+        (["--forecast-start"], {"default": None, "metavar": "YYYY-MM-DD"}),
+        (["--forecast-end"], {"default": None, "metavar": "YYYY-MM-DD"}),
+        (["--window-days"], {"type": int, "default": 30, "help": "Days of review data to pack into the hotel prompt."}),
+        (["--budget-tokens"], {"type": int, "default": None, "help": "Input token budget (default: the tightest ensemble model's)."}),
+    ],
+    "statistical-forecasts": [
+        (["--targets"], {"nargs": "+", "choices": ["trump", "hotel"], "default": ["trump", "hotel"]}),
+        (["--forecast-start"], {"default": None, "metavar": "YYYY-MM-DD"}),
+        (["--forecast-end"], {"default": None, "metavar": "YYYY-MM-DD"}),
+    ],
+    "ensemble-hotel": [
+        (["--structured"], {"action": "store_true", "help": "Ask for {forecast, low, high, rationale_short} JSON."}),
+        (["--routed"], {"action": "store_true", "help": "Pick the models with the latency/cost-aware router."}),
+        (["--hedged"], {"action": "store_true", "help": "Duplicate calls still running after their model's p90 latency."}),
+    ],
+    "ensemble-trump": [
+        (["--structured"], {"action": "store_true", "help": "Ask for {forecast, low, high, rationale_short} JSON."}),
+        (["--routed"], {"action": "store_true", "help": "Pick the models with the latency/cost-aware router."}),
+        (["--hedged"], {"action": "store_true", "help": "Duplicate calls still running after their model's p90 latency."}),
+    ],
+    "evaluate-hotel-prompts": [
+        (["--structured"], {"action": "store_true", "help": "Ask for {forecast, low, high, rationale_short} JSON."}),
+    ],
+    "evaluate-trump-prompts": [
+        (["--structured"], {"action": "store_true", "help": "Ask for {forecast, low, high, rationale_short} JSON."}),
+    ],
+    "gated-ensemble": [
+        (["--structured"], {"action": "store_true", "help": "Ask for {forecast, low, high, rationale_short} JSON."}),
+        (["--targets"], {"nargs": "+", "choices": ["trump", "hotel"], "default": None}),
+        (["--forecast-start"], {"default": None, "metavar": "YYYY-MM-DD"}),
+        (["--forecast-end"], {"default": None, "metavar": "YYYY-MM-DD"}),
+    ],
+    "plan-gating": [
+        (["--daily-csv"], {"default": "truth_social_posts_daily.csv"}),
+        (["--series-column"], {"default": "account"}),
+        (["--kind"], {"choices": ["posts", "ratings"], "default": "posts"}),
+        (["--forecast-start"], {"default": None, "metavar": "YYYY-MM-DD"}),
+        (["--forecast-end"], {"default": None, "metavar": "YYYY-MM-DD"}),
+        (["--output-csv-file"], {"default": "gating_plan.csv"}),
+    ],
+    "registry-export": [
+        (["--target"], {"choices": ["trump", "hotel"], "required": True}),
+        (["--kind"], {"choices": ["predictions", "statistical", "evaluation", "final"], "default": "predictions"}),
+        (["--run-id"], {"type": int, "default": None, "help": "Export this run instead of the latest."}),
+        (["--output-file"], {"default": None}),
+    ],
+    "registry-mae": [
+        (["--days"], {"type": int, "default": 90}),
+        (["--target"], {"choices": ["trump", "hotel"], "default": None}),
+    ],
+    "store-ingest": [
+        (["--force"], {"action": "store_true", "help": "Re-ingest files even if they are unchanged."}),
+    ],
+    "benchmark-registry": [
+        (["--n-evaluations"], {"type": int, "default": 200_000}),
+        (["--n-prompts"], {"type": int, "default": 50}),
+    ],
+    "backtest": [
+        (["--targets"], {"nargs": "+", "choices": ["hotel", "trump"], "default": None}),
+        (["--prompts"], {"nargs": "+", "default": None, "help": "Prompt files (default: each target's *_prompt_*.txt templates)."}),
+        (["--models"], {"nargs": "+", "default": None, "metavar": "PROVIDER:MODEL"}),
+        (["--temperatures"], {"nargs": "+", "type": float, "default": None}),
+        (["--n-windows"], {"type": int, "default": 20}),
+        (["--workers"], {"type": int, "default": None, "help": "Worker processes (default: CPU count)."}),
+        (["--concurrency"], {"type": int, "default": 8, "help": "Calls in flight per worker."}),
+        (["--job"], {"default": "backtest", "help": "Queue job name; rerunning a job resumes it."}),
+        (["--output-csv-file"], {"default": "backtest_mae.csv"}),
+    ],
+    "backtest-status": [
+        (["--job"], {"default": "backtest"}),
+    ],
+    "route-models": [
+        (["--targets"], {"nargs": "+", "choices": ["hotel", "trump"], "default": None}),
+        (["--latency-budget-ms"], {"type": float, "default": 120_000, "help": "Wall time of one ensemble run."}),
+        (["--cost-budget-usd"], {"type": float, "default": 0.25, "help": "Estimated cost of one ensemble run."}),
+    ],
+    "sweep": [
+        (["--sweep-file"], {"default": None, "help": "JSON grid of experiments (default: sweep_planner.DEFAULT_SWEEP)."}),
+        (["--max-in-flight"], {"type": int, "default": 32, "help": "Calls in flight across all experiments and targets."}),
+        (["--workers"], {"type": int, "default": None}),
+        (["--dry-run"], {"action": "store_true", "help": "Only report the planned and deduplicated calls."}),
+        (["--cube-file"], {"default": "sweep_cube.csv"}),
+    ],
+    "sweep-slice": [
+        (["--by"], {"nargs": "+", "default": ["target", "model_name"], "metavar": "DIMENSION"}),
+        (["--where"], {"nargs": "+", "default": None, "metavar": "DIMENSION=VALUE"}),
+        (["--cube-file"], {"default": "sweep_cube.csv"}),
+    ],
+    "simulate-forecasts": [
+        (["--targets"], {"nargs": "+", "choices": ["trump", "hotel"], "default": ["trump", "hotel"]}),
+        (["--n-draws"], {"type": int, "default": 100_000}),
+        (["--seed"], {"type": int, "default": 0}),
+        (["--forecast-start"], {"default": None, "metavar": "YYYY-MM-DD"}),
+        (["--forecast-end"], {"default": None, "metavar": "YYYY-MM-DD"}),
+    ],
+    "simulate-series": [
+        (["--daily-csv"], {"default": "truth_social_posts_daily.csv"}),
+        (["--series-column"], {"default": "account"}),
+        (["--kind"], {"choices": ["posts", "ratings"], "default": "posts"}),
+        (["--n-draws"], {"type": int, "default": 100_000}),
+        (["--seed"], {"type": int, "default": 0}),
+        (["--forecast-start"], {"default": None, "metavar": "YYYY-MM-DD"}),
+        (["--forecast-end"], {"default": None, "metavar": "YYYY-MM-DD"}),
+        (["--workers"], {"type": int, "default": None, "help": "Worker processes (default: CPU count)."}),
+        (["--output-csv-file"], {"default": "simulated_quantiles.csv"}),
+    ],
+    "benchmark-simulation": [
+        (["--n-series"], {"type": int, "default": 2000}),
+        (["--n-draws"], {"type": int, "default": 100_000}),
+        (["--workers"], {"type": int, "default": None, "help": "Worker processes (default: CPU count)."}),
+    ],
+}
+
+# Modules that must not be loaded just by importing the CLI or a command's module.
+HEAVY_MODULES = ["pandas", "numpy", "matplotlib", "openai", "anthropic", "google.generativeai",
+                 "apify_client", "serpapi", "googlemaps"]
+
+# Median wall-clock time allowed for `python forecast_cli.py --help`, measured on top of
+# a bare interpreter start so the budget doesn't depend on the machine's Python startup.
+STARTUP_BUDGET_SECONDS = 0.15
+
+def run_command(name, **kwargs):
+    """Imports the module behind a command and calls its entry function."""
+    module_name, function_name, _ = COMMANDS[name]
+    module = importlib.import_module(module_name)
+    return getattr(module, function_name)(**kwargs)
+
+def _time_process(args, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def check_startup(runs=7, budget_seconds=STARTUP_BUDGET_SECONDS):
+    """
+    Measures CLI startup time against STARTUP_BUDGET_SECONDS and verifies that importing
+    each command's module does not pull in any of HEAVY_MODULES. Returns True if both hold.
+    """
+    cli_path = os.path.abspath(__file__)
+    baseline = _time_process([sys.executable, "-c", "pass"], runs)
+    cli_time = _time_process([sys.executable, cli_path, "--help"], runs)
+    overhead = max(cli_time - baseline, 0.0)
+    within_budget = overhead <= budget_seconds
+    print(f"Interpreter startup: {baseline * 1000:.1f} ms (median of {runs})")
+    print(f"CLI startup (--help): {cli_time * 1000:.1f} ms, overhead {overhead * 1000:.1f} ms "
+          f"(budget {budget_seconds * 1000:.0f} ms) -> {'OK' if within_budget else 'OVER BUDGET'}")
+
+    all_lazy = True
+    for name, (module_name, _, _) in COMMANDS.items():
+        probe = (f"import sys, {module_name}; "
+                 f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+        result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True,
+                                cwd=os.path.dirname(cli_path), check=False)
+        loaded = result.stdout.strip()
+        if result.returncode != 0:
+            print(f"  {name}: could not import {module_name}: {result.stderr.strip().splitlines()[-1:]}")
+            all_lazy = False
+        elif loaded:
+            print(f"  {name}: importing {module_name} eagerly loads {loaded}")
+            all_lazy = False
+    if all_lazy:
+        print(f"All {len(COMMANDS)} command modules import without loading heavy dependencies.")
+    return within_budget and all_lazy
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="INSY 697 forecasting pipeline.")
+    parser.add_argument("--cassette", default=None, metavar="NAME",
+                        help="Replay the command's HTTP traffic from cassettes/NAME.json.gz (see http_cassettes.py).")
+    parser.add_argument("--record", action="store_true", help="With --cassette, record live traffic instead of replaying.")
+    parser.add_argument("--replay-latency-scale", type=float, default=0.0,
+                        help="With --cassette, sleep this multiple of each recorded request's duration.")
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+    for name, (_, _, help_text) in COMMANDS.items():
+        command_parser = subparsers.add_parser(name, help=help_text)
+        for flags, options in COMMAND_OPTIONS.get(name, []):
+            command_parser.add_argument(*flags, **options)
+    startup_parser = subparsers.add_parser("check-startup", help="Measure CLI startup time against its budget.")
+    startup_parser.add_argument("--runs", type=int, default=7)
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 1
+    if args.command == "check-startup":
+        return 0 if check_startup(runs=args.runs) else 1
+    kwargs = {k: v for k, v in vars(args).items()
+              if k not in ("command", "cassette", "record", "replay_latency_scale")}
+    if args.cassette:
+        from http_cassettes import use_cassette
+        with use_cassette(args.cassette, mode="record" if args.record else "replay",
+                          latency_scale=args.replay_latency_scale):
+            run_command(args.command, **kwargs)
+    else:
+        run_command(args.command, **kwargs)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
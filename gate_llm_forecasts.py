@@ -0,0 +1,237 @@
+import os
+import json
+import importlib
+from dotenv import load_dotenv
+import run_registry
+
+# Uncertainty-gated LLM invocation. Every target first gets the statistical forecast and its
+# predictive interval (statistical_forecasts.py). Targets whose interval is wide, whose
+# statistical models disagree, or whose recent data looks anomalous go to the full LLM ensemble;
+# the rest get a single light-check call, which escalates to the full ensemble only if its
+# forecast falls outside the statistical interval.
+
+GATING_FILE = "gating_decisions.json"
+GATING_PLAN_FILE = "gating_plan.csv"
+TARGETS = {
+    "trump": {"ensemble": "generate_ensemble_forecasts_trump", "kind": "posts", "daily_csv": "trump_posts_daily.csv"},
+    "hotel": {"ensemble": "generate_ensemble_forecasts_hotel", "kind": "ratings", "daily_csv": "hotel_daily_metrics.csv"},
+}
+# The light check runs this ensemble member, or the first member with an API key if it has none.
+LIGHT_CHECK_MEMBER = {"provider": "openai", "model_name": "gpt-4o", "temperature": 0.2}
+
+# A post-count target goes to the full ensemble when any of these is exceeded.
+POSTS_MAX_RELATIVE_WIDTH = 0.6   # Width of the 80% interval relative to the forecast
+POSTS_MAX_MODEL_SPREAD = 0.3     # (max - min) of the statistical forecasts relative to their mean
+ANOMALY_RECENT_DAYS = 7
+ANOMALY_Z = 3.0                  # Shift of the recent mean, in standard errors of the earlier days
+SPIKE_Z = 4.0                    # Any single recent day, in standard deviations of the earlier days
+# A rating target goes to the full ensemble when the 80% interval is wider than this many stars,
+# or a recent day dips by DIP_NOTE_THRESHOLD (see build_prompt_context.py) below the forecast.
+RATING_MAX_INTERVAL_WIDTH = 1.0
+
+def _reason_lists(flags):
+    """{reason: bool array} -> one list of reasons per series."""
+    names = list(flags)
+    return [[name for name in names if flags[name][i]] for i in range(len(flags[names[0]]))]
+
+def assess_post_counts(Y, last_day, start, end):
+    """
+    Statistical forecast, interval and gating reasons for every post-count series in Y.
+    Returns the fit from fit_post_count_models plus point, relative_width, spread, shift_z,
+    spike_z and reasons (a list per series; empty means the light check is enough).
+    """
+    import numpy as np
+    from statistical_forecasts import COUNT_WINDOW_DAYS, fit_post_count_models
+    fit = fit_post_count_models(Y, last_day, start, end)
+    point = fit["count_mean"]
+    forecasts = np.column_stack([fit["seasonal_naive"], fit["exponential_smoothing"], point])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scale = np.maximum(point, 1.0)
+        relative_width = (fit["high"] - fit["low"]) / scale
+        spread = (np.nanmax(forecasts, axis=1) - np.nanmin(forecasts, axis=1)) / scale
+
+    recent = Y[:, -ANOMALY_RECENT_DAYS:]
+    earlier = Y[:, -(ANOMALY_RECENT_DAYS + COUNT_WINDOW_DAYS):-ANOMALY_RECENT_DAYS]
+    if earlier.shape[1] >= ANOMALY_RECENT_DAYS:
+        earlier_mean = earlier.mean(axis=1)
+        # Poisson noise as a floor, so a flat earlier stretch doesn't make every change an anomaly.
+        earlier_sd = np.maximum(earlier.std(axis=1, ddof=1), np.sqrt(np.maximum(earlier_mean, 1.0)))
+        shift_z = (recent.mean(axis=1) - earlier_mean) / (earlier_sd / np.sqrt(recent.shape[1]))
+        spike_z = np.abs(recent - earlier_mean[:, None]).max(axis=1) / earlier_sd
+    else:
+        shift_z = spike_z = np.zeros(len(Y))
+
+    fit.update(point=point, relative_width=relative_width, spread=spread, shift_z=shift_z, spike_z=spike_z)
+    fit["reasons"] = _reason_lists({
+        "wide interval": relative_width > POSTS_MAX_RELATIVE_WIDTH,
+        "models disagree": spread > POSTS_MAX_MODEL_SPREAD,
+        "recent level shift": np.abs(shift_z) > ANOMALY_Z,
+        "recent spike": spike_z > SPIKE_Z,
+    })
+    return fit
+
+def assess_ratings(counts, rating_sums, start, end, prior_mean=None):
+    """Statistical forecast, interval and gating reasons for every rating series; see assess_post_counts."""
+    import numpy as np
+    from build_prompt_context import DIP_NOTE_THRESHOLD
+    from statistical_forecasts import fit_rating_models
+    fit = fit_rating_models(counts, rating_sums, start, end, prior_mean)
+    point = fit["shrinkage_mean"]
+    recent_counts = counts[:, -ANOMALY_RECENT_DAYS:]
+    recent_means = np.divide(rating_sums[:, -ANOMALY_RECENT_DAYS:], recent_counts,
+                             out=np.full(recent_counts.shape, np.inf), where=recent_counts > 0)
+    fit.update(point=point, width=fit["high"] - fit["low"])
+    fit["reasons"] = _reason_lists({
+        "wide interval": fit["width"] > RATING_MAX_INTERVAL_WIDTH,
+        "recent dip": (recent_means <= point[:, None] - DIP_NOTE_THRESHOLD).any(axis=1),
+    })
+    return fit
+
+def ensemble_size(ensemble_module):
+    return len(ensemble_module.MODEL_CONFIG) * len(ensemble_module.TEMPERATURES)
+
+def plan_gating(daily_csv, series_column=None, kind="posts", forecast_start=None, forecast_end=None,
+                output_csv_file=GATING_PLAN_FILE):
+    """
+    Gates every series of a (long-format) daily table without calling any LLM: writes one row per
+    series with the decision, reasons and statistical interval, and prints the number of LLM calls
+    the gated run needs before escalations compared with running the full ensemble everywhere.
+    """
+    import pandas as pd
+    import statistical_forecasts as sf
+    start, end = sf.forecast_dates(forecast_start, forecast_end)
+    if kind == "posts":
+        series_ids, last_day, Y = sf.load_post_count_matrix(daily_csv, series_column)
+        fit = assess_post_counts(Y, last_day, start, end)
+        size = ensemble_size(importlib.import_module(TARGETS["trump"]["ensemble"]))
+    else:
+        series_ids, last_day, counts, rating_sums = sf.load_rating_matrices(daily_csv, series_column)
+        fit = assess_ratings(counts, rating_sums, start, end, sf.read_prior_mean_rating())
+        size = ensemble_size(importlib.import_module(TARGETS["hotel"]["ensemble"]))
+
+    full = [bool(r) for r in fit["reasons"]]
+    plan = pd.DataFrame({
+        series_column or "series": series_ids,
+        "decision": ["full" if f else "light" for f in full],
+        "reasons": ["; ".join(r) for r in fit["reasons"]],
+        "statistical_forecast": fit["point"].round(2),
+        "low": fit["low"].round(2),
+        "high": fit["high"].round(2),
+    })
+    plan.to_csv(output_csv_file, index=False)
+    n_full = sum(full)
+    ungated = len(full) * size
+    gated = n_full * size + (len(full) - n_full)
+    print(f"{len(full)} targets: {n_full} to the full ensemble, {len(full) - n_full} to a light check.")
+    print(f"LLM calls: {gated} gated (before escalations) vs {ungated} ungated ({ungated / max(gated, 1):.1f}x fewer).")
+    print(f"Gating plan saved to {output_csv_file}")
+    return plan
+
+def _light_check_config(module, api_keys):
+    for config in module.MODEL_CONFIG:
+        if (config["provider"], config["model_name"]) == (LIGHT_CHECK_MEMBER["provider"], LIGHT_CHECK_MEMBER["model_name"]) \
+                and api_keys.get(config["provider"]):
+            return config, LIGHT_CHECK_MEMBER["temperature"]
+    for config in module.MODEL_CONFIG:
+        if api_keys.get(config["provider"]):
+            return config, min(module.TEMPERATURES)
+    return None, None
+
+def run_gated_target(target, forecast_start=None, forecast_end=None, structured=False):
+    """
+    Gates one target, runs the LLM calls its decision calls for and writes its raw predictions
+    file (LLM members plus the statistical members). Returns the gating record, or None on error.
+    structured is passed on to the ensemble's run_member.
+    """
+    import statistical_forecasts as sf
+    config = TARGETS[target]
+    module = importlib.import_module(config["ensemble"])
+    start, end = sf.forecast_dates(forecast_start, forecast_end)
+    if not os.path.exists(config["daily_csv"]):
+        print(f"Error: {config['daily_csv']} not found; cannot gate {target}.")
+        return None
+    if config["kind"] == "posts":
+        _, last_day, Y = sf.load_post_count_matrix(config["daily_csv"])
+        fit = assess_post_counts(Y, last_day, start, end)
+        statistical_members = sf.post_members(fit, 0, last_day, Y.shape[1], f"{start} to {end}", config["daily_csv"])
+    else:
+        _, last_day, counts, rating_sums = sf.load_rating_matrices(config["daily_csv"])
+        fit = assess_ratings(counts, rating_sums, start, end, sf.read_prior_mean_rating())
+        statistical_members = sf.rating_members(fit, 0, last_day, f"{start} to {end}", config["daily_csv"])
+    low, high, reasons = float(fit["low"][0]), float(fit["high"][0]), fit["reasons"][0]
+
+    prompts = {}
+    for provider in {c["provider"] for c in module.MODEL_CONFIG}:
+        prompt_file = module.prompt_file_for(provider)
+        try:
+            with open(prompt_file, 'r') as f:
+                prompts[provider] = f.read()
+        except FileNotFoundError:
+            print(f"Error: Chosen prompt file {prompt_file} not found.")
+            return None
+    api_keys = {c["provider"]: os.getenv(c["api_key_env"]) for c in module.MODEL_CONFIG}
+
+    def run(config, temp):
+        return module.run_member(config["provider"], config["model_name"], api_keys[config["provider"]], temp,
+                                 prompts[config["provider"]], structured)
+
+    entries = []
+    decision = "full" if reasons else "light"
+    if decision == "light":
+        light_config, light_temp = _light_check_config(module, api_keys)
+        if light_config:
+            print(f"\n{target}: statistical interval {low:.2f}-{high:.2f} is narrow; running a light check.")
+            entries.append(run(light_config, light_temp))
+            checked = entries[0]["extracted_forecast"]
+            if checked is None or not low <= checked <= high:
+                decision = "escalated"
+                reasons = [f"light check {checked} outside {low:.2f}-{high:.2f}" if checked is not None
+                           else "light check failed"]
+        else:
+            print(f"Warning: No API key for any {target} ensemble member; keeping only the statistical forecasts.")
+    if decision != "light":
+        print(f"\n{target}: running the full ensemble ({'; '.join(reasons)}).")
+        done = {(e["provider"], e["model_name"], e["temperature"]) for e in entries}
+        for config in module.MODEL_CONFIG:
+            if not api_keys.get(config["provider"]):
+                print(f"Warning: API key {config['api_key_env']} not found for {config['provider']}. Skipping this provider.")
+                continue
+            for temp in module.TEMPERATURES:
+                if (config["provider"], config["model_name"], temp) not in done:
+                    entries.append(run(config, temp))
+
+    with open(module.OUTPUT_JSON_FILE, 'w') as f:
+        json.dump(entries + statistical_members, f, indent=4)
+    print(f"{target}: {len(entries)} LLM call(s) and {len(statistical_members)} statistical member(s) "
+          f"saved to {module.OUTPUT_JSON_FILE}")
+    run_registry.record_predictions("gated", target, entries + statistical_members,
+                                    {"decision": decision, "reasons": reasons, "structured": structured})
+    return {
+        "target": target,
+        "decision": decision,
+        "reasons": reasons,
+        "statistical_forecast": round(float(fit["point"][0]), 2),
+        "interval": [round(low, 2), round(high, 2)],
+        "llm_calls": len(entries),
+        "ungated_llm_calls": ensemble_size(module),
+    }
+
+def run_gated_ensemble(targets=None, forecast_start=None, forecast_end=None, output_file=GATING_FILE, structured=False):
+    """
+    Replaces the ensemble-trump / ensemble-hotel runs: gates each target and runs only the LLM
+    calls it needs. Decisions and call counts are saved to output_file.
+    """
+    load_dotenv(dotenv_path=".env")
+    records = [r for r in (run_gated_target(t, forecast_start, forecast_end, structured) for t in (targets or TARGETS)) if r]
+    if not records:
+        return
+    made = sum(r["llm_calls"] for r in records)
+    ungated = sum(r["ungated_llm_calls"] for r in records)
+    print(f"\nGated run made {made} LLM calls; running every ensemble in full would have made {ungated}.")
+    with open(output_file, 'w') as f:
+        json.dump(records, f, indent=4)
+    print(f"Gating decisions saved to {output_file}")
+    return records
+
+if __name__ == "__main__":
+    run_gated_ensemble()
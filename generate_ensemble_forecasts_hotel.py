@@ -1,25 +1,29 @@
 import os
 import json
 import re
+import time
 from dotenv import load_dotenv
-from openai import OpenAI
-import anthropic
-import google.generativeai as genai
+from llm_providers import get_completion, hedged_completion, hedge_substitute, parse_structured_forecast
+from llm_providers import ENSEMBLE_MODEL_CONFIG, ENSEMBLE_TEMPERATURES
+from prompt_caching import split_prompt, prompt_template
+import run_registry
+import model_router
 
 CHOSEN_PROMPT_FILE = "hotel_prompt_cot.txt"
 CHOSEN_PROMPT_FILE_WITH_DATA = "hotel_prompt_cot_with_data.txt"
 OUTPUT_JSON_FILE = "hotel_preds_raw.json"
 
-# Define models and their configurations
-# For Claude, common models are claude-3-opus-20240229, claude-3-sonnet-20240229, claude-3-haiku-20240307
-# For Gemini, gemini-1.5-pro-latest or gemini-1.0-pro
-MODEL_CONFIG = [
-    {"provider": "openai", "model_name": "gpt-4o", "api_key_env": "OPENAI_API_KEY"},
-    # {"provider": "openai", "model_name": "gpt-3.5-turbo", "api_key_env": "OPENAI_API_KEY"}, # Already used in backtesting
-    {"provider": "anthropic", "model_name": "claude-3-opus-20240229", "api_key_env": "ANTHROPIC_API_KEY"},
-    {"provider": "google", "model_name": "gemini-1.5-pro-latest", "api_key_env": "GEMINI_API_KEY"}
-]
-TEMPERATURES = [0.2, 0.7]
+# Models and temperatures are shared with the Trump ensemble (see llm_providers.py); gpt-3.5-turbo
+# is left out because it is the backtesting model.
+MODEL_CONFIG = ENSEMBLE_MODEL_CONFIG
+TEMPERATURES = ENSEMBLE_TEMPERATURES
+# OpenAI gets a reasonably sized output for forecast + reasoning; Claude can be verbose with reasoning
+MAX_TOKENS = {"openai": 300, "anthropic": 1024}
+# Stream each response and stop reading once its "Final Forecast: X.X" line arrives; the
+# raw_response then ends there (see llm_providers.stream_completion).
+STREAM_RESPONSES = True
+# Structured mode (--structured) rejects forecasts outside this range.
+FORECAST_RANGE = (1.0, 5.0)
 
 def parse_forecast_from_response(response_text):
     """Extracts a numerical forecast (X.X) from the LLM's text response."""
@@ -46,36 +50,84 @@ def parse_forecast_from_response(response_text):
     print(f"Warning: Could not extract a valid forecast (1.0-5.0) from response: '{response_text[:100]}...'")
     return None
 
-def get_openai_completion(api_key, model_name, prompt, temperature):
-    client = OpenAI(api_key=api_key)
-    completion = client.chat.completions.create(
-        model=model_name,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=temperature,
-        max_tokens=300 # Reasonably sized output for forecast + reasoning
-    )
-    return completion.choices[0].message.content.strip()
-
-def get_anthropic_completion(api_key, model_name, prompt, temperature):
-    client = anthropic.Anthropic(api_key=api_key)
-    response = client.messages.create(
-        model=model_name,
-        max_tokens=1024, # Claude can be verbose with reasoning
-        temperature=temperature,
-        messages=[{"role": "user", "content": prompt}]
-    )
-    return response.content[0].text.strip()
-
-def get_google_completion(api_key, model_name, prompt, temperature):
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel(model_name)
-    response = model.generate_content(
-        prompt, 
-        generation_config=genai.types.GenerationConfig(temperature=temperature)
-    )
-    return response.text.strip()
+def prompt_file_for(provider):
+    """OpenAI gets the plain CoT prompt; Anthropic and Google get the version with the daily data."""
+    return CHOSEN_PROMPT_FILE if provider == "openai" else CHOSEN_PROMPT_FILE_WITH_DATA
+
+def run_member(provider, model_name, api_key, temp, prompt_content, structured=False, hedge_after_ms=None,
+               hedge_with=None):
+    """
+    Runs one ensemble member on prompt_content and returns its raw prediction entry.
+    With structured=True the member answers with a {forecast, low, high, rationale_short} object
+    (see llm_providers.get_structured_completion) and the entry also gets low and high.
+    With hedge_after_ms, a duplicate call goes out (to hedge_with, a (provider, api_key, model_name)
+    triple, or the same model) if the first hasn't returned by then, and the first response wins
+    (see llm_providers.hedged_completion); the entry then gets a "hedge" dict saying which won.
+    """
+    print(f"\n--- Running: {provider.capitalize()} {model_name} with temp={temp} ---")
+    full_response = None
+    error_message = None
+    extracted_forecast = None
+    interval = {}
+    hedge = None
+
+    # A leading static prefix of the prompt goes out as a cacheable system prompt.
+    system_prompt, user_prompt = split_prompt(prompt_content, prompt_template(prompt_file_for(provider)))
+
+    start = time.perf_counter()
+    try:
+        request = {"max_tokens": None if structured else MAX_TOKENS.get(provider), "system_prompt": system_prompt,
+                   "stream": STREAM_RESPONSES, "structured": structured}
+        if hedge_after_ms:
+            full_response, hedge = hedged_completion(provider, api_key, model_name, user_prompt, temp, hedge_after_ms,
+                                                     substitute=hedge_with, **request)
+            if hedge:
+                print(f"Hedged after {hedge['sent_after_ms']:.0f} ms with {hedge['model_name']}; the {hedge['winner']} call won.")
+        else:
+            full_response = get_completion(provider, api_key, model_name, user_prompt, temp, **request)
+        
+        if full_response and structured:
+            print(f"Structured Response: {full_response}")
+            parsed = parse_structured_forecast(full_response, FORECAST_RANGE)
+            if parsed:
+                extracted_forecast = parsed["forecast"]
+                interval = {"low": parsed["low"], "high": parsed["high"]}
+            else:
+                error_message = "Could not parse structured response."
+            print(f"Extracted Forecast: {extracted_forecast}")
+        elif full_response:
+            print(f"Raw Response (first 300 chars):\n{full_response[:300]}...")
+            extracted_forecast = parse_forecast_from_response(full_response)
+            print(f"Extracted Forecast: {extracted_forecast}")
+        else:
+            error_message = "No response from API."
+            print(error_message)
 
-def main():
+    except Exception as e:
+        error_message = f"API Call Error: {str(e)}"
+        print(error_message)
+    
+    return {
+        "provider": provider,
+        "model_name": model_name,
+        "temperature": temp,
+        "prompt_file": prompt_file_for(provider),
+        "raw_response": full_response,
+        "extracted_forecast": extracted_forecast,
+        "error_message": error_message,
+        "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+        **interval,
+        **({"hedge": hedge} if hedge else {})
+    }
+
+def main(structured=False, routed=False, hedged=False):
+    """
+    Runs every MODEL_CONFIG model at every temperature. With routed=True the models come from
+    model_router.route() instead (the most accurate composition within its latency and cost
+    budgets), and a model whose calls all fail is replaced by the router's fallback.
+    With hedged=True a call still running after its model's recent p90 latency is duplicated
+    (see run_member and model_router.hedge_delays).
+    """
     load_dotenv(dotenv_path=".env")
     
     try:
@@ -99,54 +151,29 @@ def main():
         if not api_keys[cfg["provider"]]:
             print(f"Warning: API key {cfg['api_key_env']} not found for {cfg['provider']}. Skipping this provider.")
 
-    for config in MODEL_CONFIG:
+    hedge_delays = model_router.hedge_delays() if hedged else {}
+    def run_model(config):
         provider = config["provider"]
-        model_name = config["model_name"]
-        api_key = api_keys.get(provider)
-
-        if not api_key:
-            continue # Skip if API key wasn't loaded
-
-        for temp in TEMPERATURES:
-            print(f"\n--- Running: {provider.capitalize()} {model_name} with temp={temp} ---")
-            full_response = None
-            error_message = None
-            extracted_forecast = None
-
-            # Determine which prompt content to use
-            current_prompt_content = prompt_content_openai
-            if provider == "anthropic" or provider == "google":
-                current_prompt_content = prompt_content_anthropic_google
-
-            try:
-                if provider == "openai":
-                    full_response = get_openai_completion(api_key, model_name, current_prompt_content, temp)
-                elif provider == "anthropic":
-                    full_response = get_anthropic_completion(api_key, model_name, current_prompt_content, temp)
-                elif provider == "google":
-                    full_response = get_google_completion(api_key, model_name, current_prompt_content, temp)
-                
-                if full_response:
-                    print(f"Raw Response (first 300 chars):\n{full_response[:300]}...")
-                    extracted_forecast = parse_forecast_from_response(full_response)
-                    print(f"Extracted Forecast: {extracted_forecast}")
-                else:
-                    error_message = "No response from API."
-                    print(error_message)
-
-            except Exception as e:
-                error_message = f"API Call Error: {str(e)}"
-                print(error_message)
-            
-            all_predictions_data.append({
-                "provider": provider,
-                "model_name": model_name,
-                "temperature": temp,
-                "prompt_file": CHOSEN_PROMPT_FILE if provider == "openai" else CHOSEN_PROMPT_FILE_WITH_DATA,
-                "raw_response": full_response,
-                "extracted_forecast": extracted_forecast,
-                "error_message": error_message
-            })
+        # Determine which prompt content to use
+        current_prompt_content = prompt_content_openai
+        if provider == "anthropic" or provider == "google":
+            current_prompt_content = prompt_content_anthropic_google
+        api_key = api_keys.get(provider) or os.getenv(config["api_key_env"])
+        key = (provider, config["model_name"])
+        return [run_member(provider, config["model_name"], api_key, temp, current_prompt_content, structured,
+                           hedge_delays.get(key), hedge_substitute(*key))
+                for temp in TEMPERATURES]
+
+    routing = None
+    if routed:
+        routing = model_router.route("hotel", temperatures=TEMPERATURES)
+        print(f"Routed ensemble: {', '.join(m['model_name'] for m in routing['models']) or 'no models'} ({routing['reason']})")
+        all_predictions_data = model_router.run_with_fallback(routing, run_model)
+    else:
+        for config in MODEL_CONFIG:
+            if not api_keys.get(config["provider"]):
+                continue # Skip if API key wasn't loaded
+            all_predictions_data.extend(run_model(config))
 
     try:
         with open(OUTPUT_JSON_FILE, 'w') as f:
@@ -154,6 +181,8 @@ def main():
         print(f"\nEnsemble predictions saved to {OUTPUT_JSON_FILE}")
     except Exception as e:
         print(f"Error saving predictions to {OUTPUT_JSON_FILE}: {e}")
+    routing_summary = routing and {k: routing[k] for k in ("models", "expected_mae", "reason")}
+    run_registry.record_predictions("ensemble", "hotel", all_predictions_data, {"structured": structured, "routing": routing_summary, "hedged": hedged})
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,199 @@
+import os
+import json
+from datetime import datetime, timedelta, timezone
+
+# Generates synthetic Truth Social posts and hotel reviews in the same schemas as
+# trump_posts_raw.json and hotel_reviews_raw.csv, at sizes from 10^4 up to 10^7 rows, for
+# benchmarking the processing scripts (see benchmark_processing.py).
+# Posts are built from the real posts as templates; their hour-of-day profile follows the real
+# data, and a share of them use the other date fields and formats the processing code accepts.
+
+POSTS_TEMPLATE_FILE = "trump_posts_raw.json"
+REVIEWS_TEMPLATE_FILE = "hotel_reviews_raw.csv"
+PLACE_ID_FILE = "hotel_place_id.txt"
+SYNTHETIC_DIR = "synthetic_data"
+DEFAULT_DAYS = 365
+
+# Date representation -> share of posts. Apify returns ISO 'created_at' strings; the others
+# exercise the fallbacks in parse_and_count_daily_posts.
+POST_DATE_FORMATS = {
+    "created_at": 0.85,       # "2025-05-29T02:47:00.358Z"
+    "createdAt": 0.05,        # same format, camelCase key
+    "date_offset": 0.03,      # "2025-05-28T22:47:00.358-04:00"
+    "timestamp_ms": 0.04,     # 1748486820358
+    "timestamp_s": 0.03,      # 1748486820
+}
+# Share of each star rating, roughly that of a well-reviewed city hotel on Google Maps.
+REVIEW_RATING_WEIGHTS = {5: 0.58, 4: 0.20, 3: 0.09, 2: 0.05, 1: 0.08}
+# Google reports reviews without a time of day as 23:59:59 on their date.
+DATE_ONLY_REVIEW_SHARE = 0.3
+POST_WRITE_BATCH = 10000
+
+def _day_weights(rng, days):
+    """Bursty per-day activity: gamma-distributed day levels with a weekday dip at weekends."""
+    import numpy as np
+    levels = rng.gamma(shape=4.0, scale=1.0, size=days)
+    weekday = (np.arange(days) + rng.integers(7)) % 7
+    levels *= np.where(weekday >= 5, 0.8, 1.0)
+    return levels / levels.sum()
+
+def _event_times_ms(rng, n, days, end_date, hour_weights=None):
+    """n event timestamps (Unix ms, newest first like the fetched data) spread over the `days` days ending on end_date."""
+    import numpy as np
+    per_day = rng.multinomial(n, _day_weights(rng, days))
+    day_index = np.repeat(np.arange(days), per_day)
+    first_day = datetime.combine(end_date - timedelta(days=days - 1), datetime.min.time(), tzinfo=timezone.utc)
+    hours = rng.choice(24, size=n, p=hour_weights) if hour_weights is not None else rng.integers(24, size=n)
+    ms_in_hour = rng.integers(3_600_000, size=n)
+    times = int(first_day.timestamp() * 1000) + day_index * 86_400_000 + hours * 3_600_000 + ms_in_hour
+    return np.sort(times)[::-1]
+
+def _hour_weights(posts):
+    import numpy as np
+    counts = np.ones(24) # +1 smoothing so no hour is impossible
+    for post in posts:
+        created = post.get("created_at") if isinstance(post, dict) else None
+        if isinstance(created, str) and len(created) >= 13:
+            counts[int(created[11:13])] += 1
+    return counts / counts.sum()
+
+def _load_post_templates(template_file, compact):
+    with open(template_file, 'r') as f:
+        posts = [p for p in json.load(f) if isinstance(p, dict) and "created_at" in p]
+    if not posts:
+        raise ValueError(f"No usable template posts in {template_file}")
+    if compact:
+        # The nested account object is the same for every post and dominates file size;
+        # compact templates keep only its identifying fields.
+        for post in posts:
+            account = post.get("account") or {}
+            post["account"] = {k: account.get(k) for k in ("id", "username", "acct", "display_name")}
+    return posts
+
+def generate_posts(n_posts, output_json_file, days=DEFAULT_DAYS, end_date=None, seed=0, accounts=None,
+                   template_file=POSTS_TEMPLATE_FILE, compact=True):
+    """
+    Writes n_posts synthetic posts to output_json_file as one JSON list, streamed in batches
+    (about 2 KB per post with compact templates, so 10^7 posts is roughly 20 GB).
+    Posts end on end_date (default today, so day-window filters keep them). If accounts is given,
+    posts are spread over those usernames and tagged like fetch_truth_social_accounts_apify does.
+    """
+    import numpy as np
+    from fetch_trump_posts import SOURCE_ACCOUNT_KEY
+    rng = np.random.default_rng(seed)
+    end_date = end_date or datetime.now(timezone.utc).date()
+    templates = _load_post_templates(template_file, compact)
+    times_ms = _event_times_ms(rng, n_posts, days, end_date, _hour_weights(templates))
+    formats = rng.choice(list(POST_DATE_FORMATS), size=n_posts, p=list(POST_DATE_FORMATS.values()))
+    template_index = rng.integers(len(templates), size=n_posts)
+    account_index = rng.integers(len(accounts), size=n_posts) if accounts else None
+    iso = np.datetime_as_string(times_ms.astype("datetime64[ms]"), unit="ms")
+    offset_iso = np.datetime_as_string((times_ms - 4 * 3_600_000).astype("datetime64[ms]"), unit="ms")
+    base_id = 114_000_000_000_000_000
+
+    os.makedirs(os.path.dirname(output_json_file) or ".", exist_ok=True)
+    with open(output_json_file, 'w') as f:
+        f.write("[\n")
+        for batch_start in range(0, n_posts, POST_WRITE_BATCH):
+            lines = []
+            for i in range(batch_start, min(batch_start + POST_WRITE_BATCH, n_posts)):
+                post = dict(templates[template_index[i]])
+                post_id = str(base_id + i)
+                post["id"] = post_id
+                post["uri"] = post["url"] = f"https://truthsocial.com/@realDonaldTrump/{post_id}"
+                date_format = formats[i]
+                del post["created_at"]
+                if date_format == "created_at" or date_format == "createdAt":
+                    post[date_format] = f"{iso[i]}Z"
+                elif date_format == "date_offset":
+                    post["date"] = f"{offset_iso[i]}-04:00"
+                elif date_format == "timestamp_ms":
+                    post["timestamp"] = int(times_ms[i])
+                else:
+                    post["timestamp"] = int(times_ms[i] // 1000)
+                if accounts:
+                    post[SOURCE_ACCOUNT_KEY] = accounts[account_index[i]]
+                lines.append(json.dumps(post))
+            f.write((",\n" if batch_start else "") + ",\n".join(lines))
+        f.write("\n]\n")
+    print(f"Wrote {n_posts} synthetic posts over {days} days to {output_json_file}")
+    return output_json_file
+
+def _relative_age(days_ago):
+    """Google's relative review age, e.g. 'a day ago', '3 weeks ago', 'a year ago'."""
+    for unit, length in (("year", 365), ("month", 30), ("week", 7), ("day", 1)):
+        if days_ago >= length:
+            count = days_ago // length
+            return f"a {unit} ago" if count == 1 else f"{count} {unit}s ago"
+    return "today"
+
+def generate_reviews(n_reviews, output_csv_file, days=DEFAULT_DAYS, end_date=None, seed=0,
+                     template_file=REVIEWS_TEMPLATE_FILE, place_id_file=PLACE_ID_FILE):
+    """Writes n_reviews synthetic reviews to output_csv_file with the columns of hotel_reviews_raw.csv."""
+    import numpy as np
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    end_date = end_date or datetime.now(timezone.utc).date()
+    templates = pd.read_csv(template_file, encoding='utf-8-sig')
+    snippets = templates["snippet"].dropna().unique()
+    try:
+        with open(place_id_file, 'r') as f:
+            place_id = f.read().strip()
+    except FileNotFoundError:
+        place_id = templates["place_id"].iloc[0]
+
+    times_ms = _event_times_ms(rng, n_reviews, days, end_date)
+    date_only = rng.random(n_reviews) < DATE_ONLY_REVIEW_SHARE
+    day_ms = times_ms - times_ms % 86_400_000
+    times_ms = np.where(date_only, day_ms + 86_399_000, times_ms)
+    timestamps = times_ms.astype("datetime64[ms]")
+    days_ago = (np.datetime64(end_date) - timestamps.astype("datetime64[D]")).astype(int)
+    age_labels = {d: _relative_age(d) for d in np.unique(days_ago).tolist()}
+
+    ratings = rng.choice(list(REVIEW_RATING_WEIGHTS), size=n_reviews, p=list(REVIEW_RATING_WEIGHTS.values()))
+    review_ids = [f"ChZDSUhNMG9nS0VJ{token}" for token in
+                  np.char.mod("%016x", rng.integers(2**62, size=n_reviews, dtype=np.int64))]
+    review_links = [f"https://www.google.com/maps/reviews/data=!4m8!14m7!1m6!2m5!1s{rid}" for rid in review_ids]
+    likes = np.where(rng.random(n_reviews) < 0.15, rng.integers(1, 20, size=n_reviews), -1)
+
+    df = pd.DataFrame({
+        "user_name": np.char.add("user", np.arange(n_reviews).astype(str)),
+        "rating": ratings.astype(float),
+        "snippet": np.where(rng.random(n_reviews) < 0.1, "", snippets[rng.integers(len(snippets), size=n_reviews)]),
+        "publish_date": pd.Series(days_ago).map(age_labels),
+        "iso_date": np.char.add(np.datetime_as_string(timestamps, unit="s"), "Z"),
+        "likes_count": pd.Series(likes).where(likes >= 0),
+        "user_link": np.char.add("https://www.google.com/maps/contrib/1", np.char.zfill(np.arange(n_reviews).astype(str), 20)),
+        "review_link": review_links,
+        "review_id": review_ids,
+        "place_id": place_id,
+    })
+    os.makedirs(os.path.dirname(output_csv_file) or ".", exist_ok=True)
+    df.to_csv(output_csv_file, index=False, encoding='utf-8-sig')
+    print(f"Wrote {n_reviews} synthetic reviews over {days} days to {output_csv_file}")
+    return output_csv_file
+
+def synthetic_paths(size, output_dir=SYNTHETIC_DIR, end_date=None):
+    """(posts file, reviews file) for a size; the end date is part of the name since the data is relative to it."""
+    end_date = end_date or datetime.now(timezone.utc).date()
+    return (os.path.join(output_dir, f"posts_{size}_{end_date}.json"),
+            os.path.join(output_dir, f"reviews_{size}_{end_date}.csv"))
+
+def generate_synthetic_data(sizes=(10**4,), output_dir=SYNTHETIC_DIR, days=DEFAULT_DAYS, seed=0,
+                            kinds=("posts", "reviews"), end_date=None, force=False):
+    """
+    Generates one posts file and/or one reviews file per size in output_dir, ending on end_date
+    (default today). Files that already exist are reused unless force is set. Returns {size: (posts, reviews)}.
+    """
+    paths = {}
+    for size in sizes:
+        posts_file, reviews_file = synthetic_paths(size, output_dir, end_date)
+        if "posts" in kinds and (force or not os.path.exists(posts_file)):
+            generate_posts(size, posts_file, days=days, end_date=end_date, seed=seed)
+        if "reviews" in kinds and (force or not os.path.exists(reviews_file)):
+            generate_reviews(size, reviews_file, days=days, end_date=end_date, seed=seed)
+        paths[size] = (posts_file, reviews_file)
+    return paths
+
+if __name__ == "__main__":
+    generate_synthetic_data()
@@ -1,17 +1,63 @@
 import os
-import pandas as pd
-# import serpapi # Keep this for the new client style
+import csv
+import shutil
 from dotenv import load_dotenv
+from fetch_checkpoints import (atomic_output, atomic_write_text, load_checkpoint, start_checkpoint,
+                               save_checkpoint_page, clear_checkpoint)
 
-# For the serpapi.Client() style, we will import the main module
-import serpapi # This is the primary change for the client
+REVIEW_INDEX_DIR = "review_index"
+
+def review_index_path(place_id, index_dir=REVIEW_INDEX_DIR):
+    return os.path.join(index_dir, f"{place_id}.txt")
+
+def load_known_review_ids(place_id, output_csv_file, index_dir=REVIEW_INDEX_DIR):
+    """
+    Returns the set of review_ids already saved for place_id. The index is a plain text file with one
+    review_id per line. If it doesn't exist yet it is rebuilt from the rows already in output_csv_file.
+    """
+    path = review_index_path(place_id, index_dir)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return {line.strip() for line in f if line.strip()}
+
+    known_ids = set()
+    if os.path.exists(output_csv_file):
+        with open(output_csv_file, 'r', newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                if row.get("review_id") and row.get("place_id") in (place_id, None):
+                    known_ids.add(row["review_id"])
+        if known_ids:
+            save_review_ids(place_id, known_ids, index_dir, append=False)
+            print(f"Built review index for {place_id} from {output_csv_file} ({len(known_ids)} known reviews).")
+    return known_ids
+
+def save_review_ids(place_id, review_ids, index_dir=REVIEW_INDEX_DIR, append=True):
+    os.makedirs(index_dir, exist_ok=True)
+    path = review_index_path(place_id, index_dir)
+    if not append:
+        atomic_write_text(path, "".join(f"{review_id}\n" for review_id in review_ids))
+        return
+    with open(path, 'a') as f:
+        for review_id in review_ids:
+            f.write(f"{review_id}\n")
 
 def fetch_reviews_and_save(place_id_file="hotel_place_id.txt", 
                            api_key_env_file=".env", 
                            output_csv_file="hotel_reviews_raw.csv",
-                           min_reviews=200):
+                           min_reviews=200,
+                           full_refresh=False):
     """
     Fetches Google Maps reviews for a given Place ID using SerpAPI and saves them to a CSV file.
+
+    Reviews are requested newest-first and checked against the review_id index for the place
+    (see load_known_review_ids). Once reviews are on disk, a refresh stops at the first page made
+    up entirely of known reviews and appends only the new rows to output_csv_file; min_reviews
+    only applies to the first fetch. full_refresh=True re-fetches from scratch and overwrites the
+    CSV and the index.
+
+    Each page of new reviews is checkpointed with the pagination cursor (see fetch_checkpoints.py),
+    so a failed fetch resumes from the last saved page. The CSV is only replaced, atomically,
+    once the fetch completes.
     """
     try:
         with open(place_id_file, 'r') as f:
@@ -52,30 +98,51 @@ def fetch_reviews_and_save(place_id_file="hotel_place_id.txt",
         print("Please ensure the API key is correctly set.")
         return
 
+    known_ids = set() if full_refresh else load_known_review_ids(place_id, output_csv_file)
+    incremental = bool(known_ids) and os.path.exists(output_csv_file)
+    if not incremental:
+        known_ids = set()
+
     all_reviews_data = []
-    # next_page_token = None # Removed, as client uses 'start'
+    next_page_token = None
     reviews_fetched_count = 0
     current_start_index = 0 
     reviews_per_page_assumption = 1 # Changed from 10 to 1
+    page_num = 1
+
+    checkpoint_key = f"{place_id}:{'incremental' if incremental else 'full'}"
+    cursor, all_reviews_data = load_checkpoint(output_csv_file, checkpoint_key)
+    if cursor:
+        current_start_index, next_page_token, page_num = cursor["start"], cursor["next_page_token"], cursor["page_num"]
+        reviews_fetched_count = len(all_reviews_data)
+        known_ids.update(r["review_id"] for r in all_reviews_data if r["review_id"] is not None)
+        print(f"Resuming from checkpoint at page {page_num} ({reviews_fetched_count} reviews already fetched).")
+    else:
+        start_checkpoint(output_csv_file, checkpoint_key, {"start": 0, "next_page_token": None, "page_num": 1})
 
-    print(f"Starting to fetch reviews. Aiming for at least {min_reviews} reviews.")
+    if incremental:
+        print(f"{len(known_ids)} reviews already saved for this place. Fetching newest reviews until a page of known reviews.")
+    else:
+        print(f"Starting to fetch reviews. Aiming for at least {min_reviews} reviews.")
     
-    # Initialize the SerpAPI client
+    # Initialize the SerpAPI client (imported here so the CLI doesn't load it for other commands)
+    import serpapi
+    import pandas as pd
     client = serpapi.Client(api_key=serpapi_api_key) # CHANGED api_key_string to api_key
 
     try:
-        page_num = 1
-        while reviews_fetched_count < min_reviews:
+        while incremental or reviews_fetched_count < min_reviews:
             print(f"Fetching page {page_num} of reviews (start index: {current_start_index})...")
             params = {
                 "engine": "google_maps_reviews",
                 "place_id": place_id,
                 "hl": "en", # Language
+                "sort_by": "newestFirst", # So a refresh can stop at the first page of known reviews
                 # "api_key": serpapi_api_key, # Key is now passed to client constructor
                 "start": current_start_index 
             }
-            # if next_page_token: # Removed next_page_token logic
-            #     params["next_page_token"] = next_page_token
+            if next_page_token:
+                params["next_page_token"] = next_page_token
 
             results = client.search(params) 
             
@@ -85,6 +152,12 @@ def fetch_reviews_and_save(place_id_file="hotel_place_id.txt",
 
             if "error" in actual_results_dict:
                 print(f"SerpAPI Error: {actual_results_dict['error']}")
+                # SerpAPI reports running past the last page as an error too; that is just the end of the data.
+                # Any other error (bad key, exhausted quota, outage), on the first page too, is a failed fetch.
+                if "hasn't returned any results" not in str(actual_results_dict['error']):
+                    # Keep the checkpoint and the existing CSV; the next run resumes from this page.
+                    print(f"Fetch interrupted. Re-run to resume from page {page_num}; {output_csv_file} is unchanged.")
+                    return
                 break 
             
             reviews_on_page = actual_results_dict.get("reviews", [])
@@ -95,7 +168,18 @@ def fetch_reviews_and_save(place_id_file="hotel_place_id.txt",
                 print("No reviews found on the first page.")
                 break
 
+            page_ids = [review.get("review_id") for review in reviews_on_page]
+            if known_ids and all(review_id in known_ids for review_id in page_ids):
+                print(f"Page {page_num} contains only known reviews. Stopping.")
+                break
+
+            page_start_count = len(all_reviews_data)
             for review in reviews_on_page:
+                review_id = review.get("review_id")
+                if review_id is not None:
+                    if review_id in known_ids:
+                        continue # Already saved, or repeated across pages
+                    known_ids.add(review_id)
                 all_reviews_data.append({
                     "user_name": review.get("user", {}).get("name"),
                     "rating": review.get("rating"),
@@ -123,13 +207,17 @@ def fetch_reviews_and_save(place_id_file="hotel_place_id.txt",
                  # If first page is empty, the existing check 'if not reviews_on_page and current_start_index == 0:' handles it.
 
             current_start_index += len(reviews_on_page) 
+            next_page_token = actual_results_dict.get("serpapi_pagination", {}).get("next_page_token")
             # if len(reviews_on_page) == 0 and page_num > 1: # This condition is now covered by the simplified check above
             #     print("No reviews on current page, assuming end of data.")
             #     break
             
             page_num += 1
+            save_checkpoint_page(output_csv_file, checkpoint_key,
+                                 {"start": current_start_index, "next_page_token": next_page_token, "page_num": page_num},
+                                 all_reviews_data[page_start_count:])
             
-            if reviews_fetched_count >= min_reviews:
+            if not incremental and reviews_fetched_count >= min_reviews:
                 print(f"Reached target of {min_reviews} reviews.")
                 break
             
@@ -137,17 +225,32 @@ def fetch_reviews_and_save(place_id_file="hotel_place_id.txt",
                 print("Safety break: Fetched 25 pages/attempts of reviews. Stopping.")
                 break
 
-        if all_reviews_data:
+        if all_reviews_data and incremental:
+            df = pd.DataFrame(all_reviews_data)
+            existing_columns = pd.read_csv(output_csv_file, nrows=0, encoding='utf-8-sig').columns
+            with atomic_output(output_csv_file) as tmp_csv_file:
+                shutil.copyfile(output_csv_file, tmp_csv_file)
+                # The CSV already starts with a BOM, so appended rows are plain utf-8.
+                df.reindex(columns=existing_columns).to_csv(tmp_csv_file, mode='a', header=False, index=False, encoding='utf-8')
+            save_review_ids(place_id, [r["review_id"] for r in all_reviews_data if r["review_id"] is not None])
+            print(f"Appended {len(df)} new reviews to {output_csv_file}")
+        elif all_reviews_data:
             df = pd.DataFrame(all_reviews_data)
-            df.to_csv(output_csv_file, index=False, encoding='utf-8-sig')
+            with atomic_output(output_csv_file) as tmp_csv_file:
+                df.to_csv(tmp_csv_file, index=False, encoding='utf-8-sig')
+            save_review_ids(place_id, [r["review_id"] for r in all_reviews_data if r["review_id"] is not None], append=False)
             print(f"Successfully saved {len(df)} reviews to {output_csv_file}")
             if len(df) < min_reviews:
                 print(f"Warning: Fetched {len(df)} reviews, which is less than the target of {min_reviews}.")
+        elif incremental:
+            print(f"No new reviews since the last fetch. {output_csv_file} is unchanged.")
         else:
             print("No reviews were fetched or extracted.")
+        clear_checkpoint(output_csv_file)
 
     except Exception as e:
         print(f"An error occurred during SerpAPI request or data processing: {e}")
+        print(f"Pages fetched so far are checkpointed; re-run to resume. {output_csv_file} is unchanged.")
         import traceback
         traceback.print_exc()
 
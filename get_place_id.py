@@ -1,4 +1,3 @@
-import googlemaps
 import os
 from dotenv import load_dotenv
 
@@ -29,6 +28,7 @@ def get_place_id_and_save(api_key_file=".env", hotel_name="Montreal Marriott Ch
         print("Please ensure the API key is correctly set in the file with the variable name GOOGLE_MAPS_API_KEY.")
         return
 
+    import googlemaps
     gmaps = googlemaps.Client(key=api_key)
 
     try:
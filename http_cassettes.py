@@ -0,0 +1,189 @@
+import os
+import json
+import gzip
+import time
+import base64
+import hashlib
+import threading
+import contextlib
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Record/replay of the HTTP exchanges made by the fetch scripts, so ingestion can be run and
+# benchmarked offline. SerpAPI and Google Maps go through `requests`; the Apify client uses
+# `httpx`. Both are patched at the transport level while a cassette is in use:
+#   record - requests go to the live service and every exchange is saved to the cassette
+#   replay - nothing leaves the machine; each request is answered from the cassette
+# A cassette is a gzipped JSON file in CASSETTE_DIR. Requests are matched on method, URL (with
+# credentials removed and query parameters sorted) and a hash of the body; identical requests
+# (e.g. polling an Actor run) are replayed in the order they were recorded.
+
+CASSETTE_DIR = "cassettes"
+# Query parameters and headers that carry credentials; they are never written to a cassette.
+SECRET_PARAMS = {"api_key", "key", "token", "access_token", "client_secret", "signature"}
+SECRET_HEADERS = {"authorization", "x-api-key", "x-goog-api-key", "cookie", "set-cookie"}
+# The stored body is already decoded, so encoding/length headers would no longer be accurate.
+DROPPED_RESPONSE_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+# Dummy credentials so the fetch scripts get past their key checks when replaying without a .env.
+REPLAY_API_KEY_ENV = ["APIFY_API_KEY", "SERPAPI_API_KEY", "GOOGLE_MAPS_API_KEY"]
+
+class CassetteMiss(Exception):
+    """Raised in replay mode when a request has no recorded exchange left."""
+
+def cassette_path(name, cassette_dir=CASSETTE_DIR):
+    return os.path.join(cassette_dir, f"{name}.json.gz")
+
+def normalize_url(url):
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in SECRET_PARAMS)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+def request_key(method, url, body):
+    body_hash = hashlib.sha256(body or b"").hexdigest()[:16]
+    return f"{method.upper()} {normalize_url(url)} {body_hash}"
+
+def _encode_body(content):
+    try:
+        return {"text": content.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"base64": base64.b64encode(content).decode("ascii")}
+
+def _decode_body(body):
+    return body["text"].encode("utf-8") if "text" in body else base64.b64decode(body["base64"])
+
+class Cassette:
+    def __init__(self, path, mode, latency_scale=0.0):
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.interactions = []
+        self.played = 0
+        self._queues = {}
+        self._lock = threading.Lock()
+        if mode == "replay":
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                self.interactions = json.load(f)["interactions"]
+            for interaction in self.interactions:
+                self._queues.setdefault(interaction["key"], []).append(interaction)
+
+    def record(self, method, url, body, status, headers, content, elapsed):
+        interaction = {
+            "key": request_key(method, url, body),
+            "request": {"method": method.upper(), "url": normalize_url(url)},
+            "response": {
+                "status": status,
+                "headers": {k: v for k, v in headers.items()
+                            if k.lower() not in SECRET_HEADERS | DROPPED_RESPONSE_HEADERS},
+                "body": _encode_body(content),
+            },
+            "elapsed": round(elapsed, 4),
+        }
+        with self._lock:
+            self.interactions.append(interaction)
+
+    def play(self, method, url, body):
+        """Returns (status, headers, content) for the next recorded exchange matching this request."""
+        key = request_key(method, url, body)
+        with self._lock:
+            queue = self._queues.get(key)
+            if not queue:
+                raise CassetteMiss(f"No recorded response left for {key} in {self.path}")
+            interaction = queue.pop(0)
+            self.played += 1
+        if self.latency_scale:
+            time.sleep(interaction["elapsed"] * self.latency_scale)
+        response = interaction["response"]
+        return response["status"], response["headers"], _decode_body(response["body"])
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with gzip.open(self.path, "wt", encoding="utf-8") as f:
+            json.dump({"recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "interactions": self.interactions}, f)
+
+def _patch_requests(cassette):
+    """Patches requests' HTTPAdapter.send; returns an undo function, or None if requests isn't installed."""
+    try:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from requests.structures import CaseInsensitiveDict
+        from requests.utils import get_encoding_from_headers
+    except ImportError:
+        return None
+    original_send = HTTPAdapter.send
+
+    def send(adapter, request, **kwargs):
+        body = request.body.encode("utf-8") if isinstance(request.body, str) else (request.body or b"")
+        if cassette.mode == "replay":
+            status, headers, content = cassette.play(request.method, request.url, body)
+            response = requests.Response()
+            response.status_code = status
+            response.headers = CaseInsensitiveDict(headers)
+            response._content = content
+            response.encoding = get_encoding_from_headers(response.headers)
+            response.url = request.url
+            response.request = request
+            response.connection = adapter
+            return response
+        start = time.perf_counter()
+        response = original_send(adapter, request, **kwargs)
+        cassette.record(request.method, request.url, body, response.status_code, response.headers,
+                        response.content, time.perf_counter() - start)
+        return response
+
+    HTTPAdapter.send = send
+    return lambda: setattr(HTTPAdapter, "send", original_send)
+
+def _patch_httpx(cassette):
+    """Patches httpx's sync HTTPTransport; returns an undo function, or None if httpx isn't installed."""
+    try:
+        import httpx
+    except ImportError:
+        return None
+    original_handle = httpx.HTTPTransport.handle_request
+
+    def handle_request(transport, request):
+        body = request.read()
+        if cassette.mode == "replay":
+            status, headers, content = cassette.play(request.method, str(request.url), body)
+            return httpx.Response(status, headers=headers, content=content, request=request)
+        start = time.perf_counter()
+        response = original_handle(transport, request)
+        content = response.read()
+        cassette.record(request.method, str(request.url), body, response.status_code, response.headers,
+                        content, time.perf_counter() - start)
+        # Hand the client an equivalent, already-decoded response.
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in DROPPED_RESPONSE_HEADERS}
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    httpx.HTTPTransport.handle_request = handle_request
+    return lambda: setattr(httpx.HTTPTransport, "handle_request", original_handle)
+
+@contextlib.contextmanager
+def use_cassette(name, mode="replay", latency_scale=0.0, cassette_dir=CASSETTE_DIR):
+    """
+    Records or replays all requests/httpx traffic inside the block.
+    In replay mode latency_scale multiplies each exchange's recorded duration (0 = no delay,
+    1 = as recorded), so benchmarks can run with or without realistic network time.
+    """
+    if mode not in ("record", "replay"):
+        raise ValueError(f"Unknown cassette mode: {mode}")
+    path = cassette_path(name, cassette_dir)
+    cassette = Cassette(path, mode, latency_scale)
+    undo = [u for u in (_patch_requests(cassette), _patch_httpx(cassette)) if u]
+    added_env = [env for env in REPLAY_API_KEY_ENV if not os.getenv(env)] if mode == "replay" else []
+    for env in added_env:
+        os.environ[env] = "replay"
+    start = time.perf_counter()
+    try:
+        yield cassette
+    finally:
+        for restore in undo:
+            restore()
+        for env in added_env:
+            os.environ.pop(env, None)
+        elapsed = time.perf_counter() - start
+        if mode == "record":
+            cassette.save()
+            print(f"Recorded {len(cassette.interactions)} HTTP exchanges to {path} in {elapsed:.2f}s.")
+        else:
+            print(f"Replayed {cassette.played} of {len(cassette.interactions)} recorded HTTP exchanges "
+                  f"from {path} in {elapsed:.2f}s (latency scale {latency_scale}).")
@@ -0,0 +1,453 @@
+import os
+import re
+import json
+import functools
+
+# Provider SDKs (openai, anthropic, google.generativeai) are imported inside the
+# functions below rather than at module level, so a script only pays the import
+# cost of the providers it actually calls.
+
+API_KEY_ENV = {
+    "openai": "OPENAI_API_KEY",
+    "anthropic": "ANTHROPIC_API_KEY",
+    "google": "GEMINI_API_KEY"
+}
+
+DEFAULT_MAX_TOKENS = {
+    "openai": 700,
+    "anthropic": 1024,
+    "google": None  # Gemini calls have always used the model's default output limit
+}
+
+# Ensemble composition and temperatures shared by both ensemble scripts (and, through their
+# MODEL_CONFIG / TEMPERATURES, the gating, load-test, backtest and sweep tools).
+# For Claude, common models are claude-3-opus-20240229, claude-3-sonnet-20240229, claude-3-haiku-20240307
+# For Gemini, gemini-1.5-pro-latest or gemini-1.0-pro
+ENSEMBLE_MODEL_CONFIG = [
+    {"provider": "openai", "model_name": "gpt-4o", "api_key_env": API_KEY_ENV["openai"]},
+    {"provider": "anthropic", "model_name": "claude-3-opus-20240229", "api_key_env": API_KEY_ENV["anthropic"]},
+    {"provider": "google", "model_name": "gemini-1.5-pro-latest", "api_key_env": API_KEY_ENV["google"]}
+]
+ENSEMBLE_TEMPERATURES = [0.2, 0.7]
+# Where a hedged ensemble call (see hedged_completion) sends its duplicate; models not listed are
+# hedged with themselves.
+HEDGE_SUBSTITUTES = {
+    ("anthropic", "claude-3-opus-20240229"): ("anthropic", "claude-3-5-sonnet-20240620"),
+}
+
+def is_same_member(pred, member):
+    """True if a raw prediction entry matches a {provider, model_name, temperature} member spec."""
+    return (pred.get("provider") == member.get("provider") and
+            pred.get("model_name") == member.get("model_name") and
+            pred.get("temperature") == member.get("temperature"))
+
+# A complete "Final Forecast: X.X" line: the number must be followed by something other than
+# a digit or a decimal part, so "Final Forecast: 14." isn't mistaken for a finished "14.7".
+FINAL_FORECAST_PATTERN = re.compile(r"Final Forecast:\s*\**\s*[0-9]+(?:\.[0-9]+)?(?:[^0-9.]|\.[^0-9])", re.IGNORECASE)
+
+# Structured-output mode: instead of free-form reasoning ending in "Final Forecast:", the model
+# returns this object through the provider's JSON / tool-call output, capped at
+# STRUCTURED_MAX_TOKENS, and parsing is a single json.loads (see parse_structured_forecast).
+FORECAST_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "forecast": {"type": "number", "description": "The final forecast."},
+        "low": {"type": "number", "description": "Lower end of an 80% interval for the outcome."},
+        "high": {"type": "number", "description": "Upper end of an 80% interval for the outcome."},
+        "rationale_short": {"type": "string", "description": "The main reason for the forecast, at most 25 words."},
+    },
+    "required": ["forecast", "low", "high", "rationale_short"],
+    "additionalProperties": False,
+}
+FORECAST_TOOL_NAME = "submit_forecast"
+# OpenAI models (names or dated-version prefixes) without json_schema support get plain JSON mode;
+# the instruction carries the keys. Older chat models support neither, and structured requests to
+# them fail before the call. Any other model is assumed to support json_schema.
+OPENAI_JSON_OBJECT_ONLY_MODELS = ("gpt-3.5-turbo-1106", "gpt-3.5-turbo-0125", "gpt-4-turbo", "gpt-4-1106-preview",
+                                  "gpt-4-0125-preview", "gpt-4o-2024-05-13")
+OPENAI_NO_JSON_MODE_MODELS = ("gpt-4", "gpt-4-0314", "gpt-4-0613", "gpt-4-32k", "gpt-4-32k-0314", "gpt-4-32k-0613",
+                              "gpt-3.5-turbo-0301", "gpt-3.5-turbo-0613", "gpt-3.5-turbo-16k", "gpt-3.5-turbo-16k-0613")
+STRUCTURED_MAX_TOKENS = 150
+STRUCTURED_INSTRUCTION = (
+    "Do not write out your reasoning. Respond only with the JSON object {forecast, low, high, rationale_short}: "
+    "forecast is your final forecast, low and high bound an 80% interval for the outcome, and rationale_short "
+    "gives the main reason in at most 25 words."
+)
+
+# --- Request builders ---
+# `system_prompt` carries the static part of a prompt (see prompt_caching.py). Each builder
+# places it where the provider can reuse it across calls: first in the message list for
+# OpenAI's automatic prefix caching, as a cache_control block for Anthropic, and as the
+# model's system_instruction for Gemini.
+
+def _openai_request(model_name, prompt, temperature, max_tokens, system_prompt=None):
+    messages = [{"role": "user", "content": prompt}]
+    if system_prompt:
+        messages.insert(0, {"role": "system", "content": system_prompt})
+    request = {"model": model_name, "messages": messages, "temperature": temperature}
+    if max_tokens:
+        request["max_tokens"] = max_tokens
+    return request
+
+def _anthropic_request(model_name, prompt, temperature, max_tokens, system_prompt=None):
+    request = {
+        "model": model_name,
+        "max_tokens": max_tokens or DEFAULT_MAX_TOKENS["anthropic"],
+        "temperature": temperature,
+        "messages": [{"role": "user", "content": prompt}]
+    }
+    if system_prompt:
+        request["system"] = [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}]
+    return request
+
+def _google_generation_config(temperature, max_tokens, structured=False):
+    import google.generativeai as genai
+    config_kwargs = {"max_output_tokens": max_tokens} if max_tokens else {}
+    if structured:
+        # Gemini's schema dialect has no additionalProperties.
+        schema = {k: v for k, v in FORECAST_SCHEMA.items() if k != "additionalProperties"}
+        config_kwargs.update(response_mime_type="application/json", response_schema=schema)
+    return genai.types.GenerationConfig(temperature=temperature, **config_kwargs)
+
+def _structured_prompt(prompt):
+    return f"{prompt}\n\n{STRUCTURED_INSTRUCTION}"
+
+def _openai_structured_request(model_name, prompt, temperature, max_tokens, system_prompt=None):
+    request = _openai_request(model_name, _structured_prompt(prompt), temperature, max_tokens, system_prompt)
+    if model_name in OPENAI_NO_JSON_MODE_MODELS:
+        raise ValueError(f"{model_name} supports neither json_schema nor JSON mode; run it without structured output.")
+    # The undated gpt-3.5-turbo alias points at a JSON-mode version.
+    if model_name == "gpt-3.5-turbo" or model_name.startswith(OPENAI_JSON_OBJECT_ONLY_MODELS):
+        request["response_format"] = {"type": "json_object"}
+    else:
+        request["response_format"] = {"type": "json_schema",
+                                      "json_schema": {"name": "forecast", "strict": True, "schema": FORECAST_SCHEMA}}
+    return request
+
+def _anthropic_structured_request(model_name, prompt, temperature, max_tokens, system_prompt=None):
+    request = _anthropic_request(model_name, _structured_prompt(prompt), temperature, max_tokens, system_prompt)
+    request["tools"] = [{"name": FORECAST_TOOL_NAME, "description": "Submit the forecast.", "input_schema": FORECAST_SCHEMA}]
+    request["tool_choice"] = {"type": "tool", "name": FORECAST_TOOL_NAME}
+    return request
+
+# --- Clients ---
+
+@functools.lru_cache(maxsize=None)
+def get_openai_client(api_key):
+    from openai import OpenAI
+    return OpenAI(api_key=api_key)
+
+@functools.lru_cache(maxsize=None)
+def get_anthropic_client(api_key):
+    import anthropic
+    return anthropic.Anthropic(api_key=api_key)
+
+@functools.lru_cache(maxsize=None)
+def get_google_model(api_key, model_name, system_instruction=None):
+    import google.generativeai as genai
+    # The OpenAI and Anthropic SDKs read OPENAI_BASE_URL / ANTHROPIC_BASE_URL themselves;
+    # Gemini needs the endpoint passed explicitly (e.g. to use mock_llm_server.py).
+    base_url = os.getenv("GEMINI_BASE_URL")
+    if base_url:
+        genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": base_url})
+    else:
+        genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name, system_instruction=system_instruction)
+
+# Async clients hold connection pools tied to the event loop they were first used on,
+# so they are cached per (provider, key, running loop) rather than per key.
+_async_clients = {}
+
+def _get_async_client(provider, api_key):
+    import asyncio
+    cache_key = (provider, api_key, id(asyncio.get_running_loop()))
+    client = _async_clients.get(cache_key)
+    if client is None:
+        if provider == "openai":
+            from openai import AsyncOpenAI
+            client = AsyncOpenAI(api_key=api_key)
+        else:
+            import anthropic
+            client = anthropic.AsyncAnthropic(api_key=api_key)
+        _async_clients[cache_key] = client
+    return client
+
+# --- Synchronous calls ---
+
+def get_openai_completion(api_key, model_name, prompt, temperature, max_tokens=700, system_prompt=None):
+    client = get_openai_client(api_key)
+    completion = client.chat.completions.create(
+        **_openai_request(model_name, prompt, temperature, max_tokens, system_prompt)
+    )
+    return completion.choices[0].message.content.strip()
+
+def get_anthropic_completion(api_key, model_name, prompt, temperature, max_tokens=1024, system_prompt=None):
+    client = get_anthropic_client(api_key)
+    response = client.messages.create(
+        **_anthropic_request(model_name, prompt, temperature, max_tokens, system_prompt)
+    )
+    return response.content[0].text.strip()
+
+def get_google_completion(api_key, model_name, prompt, temperature, max_tokens=None, system_prompt=None):
+    model = get_google_model(api_key, model_name, system_prompt or None)
+    response = model.generate_content(
+        prompt,
+        generation_config=_google_generation_config(temperature, max_tokens)
+    )
+    return response.text.strip()
+
+# --- Streaming calls ---
+# Each generator yields the response text piece by piece; closing it (or breaking out of the
+# loop consuming it) closes the underlying HTTP stream, so the provider stops generating.
+
+def _stream_openai(api_key, model_name, prompt, temperature, max_tokens, system_prompt):
+    stream = get_openai_client(api_key).chat.completions.create(
+        **_openai_request(model_name, prompt, temperature, max_tokens, system_prompt), stream=True
+    )
+    try:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        stream.close()
+
+def _stream_anthropic(api_key, model_name, prompt, temperature, max_tokens, system_prompt):
+    with get_anthropic_client(api_key).messages.stream(
+        **_anthropic_request(model_name, prompt, temperature, max_tokens, system_prompt)
+    ) as stream:
+        yield from stream.text_stream
+
+def _stream_google(api_key, model_name, prompt, temperature, max_tokens, system_prompt):
+    model = get_google_model(api_key, model_name, system_prompt or None)
+    response = model.generate_content(
+        prompt,
+        generation_config=_google_generation_config(temperature, max_tokens),
+        stream=True
+    )
+    for chunk in response:
+        # Chunks without text (e.g. only a finish reason or safety ratings) raise on .text.
+        if chunk.candidates and chunk.candidates[0].content.parts:
+            yield chunk.text
+
+_STREAMERS = {"openai": _stream_openai, "anthropic": _stream_anthropic, "google": _stream_google}
+
+def stream_completion(provider, api_key, model_name, prompt, temperature, max_tokens=None, system_prompt=None,
+                      stop_pattern=FINAL_FORECAST_PATTERN, cancel_event=None):
+    """
+    Streams a completion and stops reading as soon as the text so far matches stop_pattern (by
+    default a complete "Final Forecast: X.X" line). Returns the text received up to that point,
+    which still ends with the forecast, so the usual parsers work on it unchanged.
+    Setting cancel_event (a threading.Event) closes the stream at the next chunk and returns None.
+    """
+    if provider not in _STREAMERS:
+        raise ValueError(f"Unknown provider: {provider}")
+    if max_tokens is None:
+        max_tokens = DEFAULT_MAX_TOKENS.get(provider)
+    text = ""
+    stream = _STREAMERS[provider](api_key, model_name, prompt, temperature, max_tokens, system_prompt)
+    try:
+        for piece in stream:
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            # Only the tail can complete a match, so the search window stays small.
+            text += piece
+            if stop_pattern and stop_pattern.search(text[-(len(piece) + 64):]):
+                break
+    finally:
+        stream.close()
+    return text.strip()
+
+# --- Structured calls ---
+
+def get_structured_completion(provider, api_key, model_name, prompt, temperature, max_tokens=None, system_prompt=None):
+    """
+    Requests the forecast as a FORECAST_SCHEMA object (OpenAI json_schema response format,
+    a forced Anthropic tool call, Gemini JSON mode) and returns it as JSON text.
+    max_tokens defaults to STRUCTURED_MAX_TOKENS.
+    """
+    max_tokens = max_tokens or STRUCTURED_MAX_TOKENS
+    if provider == "openai":
+        completion = get_openai_client(api_key).chat.completions.create(
+            **_openai_structured_request(model_name, prompt, temperature, max_tokens, system_prompt)
+        )
+        return completion.choices[0].message.content.strip()
+    elif provider == "anthropic":
+        response = get_anthropic_client(api_key).messages.create(
+            **_anthropic_structured_request(model_name, prompt, temperature, max_tokens, system_prompt)
+        )
+        tool_input = next((b.input for b in response.content if b.type == "tool_use"), None)
+        return json.dumps(tool_input) if tool_input is not None else None
+    elif provider == "google":
+        model = get_google_model(api_key, model_name, system_prompt or None)
+        response = model.generate_content(
+            _structured_prompt(prompt),
+            generation_config=_google_generation_config(temperature, max_tokens, structured=True)
+        )
+        return response.text.strip()
+    raise ValueError(f"Unknown provider: {provider}")
+
+def parse_structured_forecast(response_text, valid_range=None):
+    """
+    Parses a structured response into {forecast, low, high, rationale_short}, or None if it isn't
+    valid JSON with a numeric forecast (inside valid_range, a (min, max) pair, if given).
+    low/high are reordered if swapped and dropped if they don't bracket the forecast.
+    """
+    try:
+        data = json.loads(response_text)
+        forecast = float(data["forecast"])
+    except (TypeError, ValueError, KeyError):
+        return None
+    if valid_range and not valid_range[0] <= forecast <= valid_range[1]:
+        return None
+    try:
+        low, high = sorted((float(data["low"]), float(data["high"])))
+    except (TypeError, ValueError, KeyError):
+        low = high = None
+    if low is not None and not low <= forecast <= high:
+        low = high = None
+    return {"forecast": round(forecast, 2), "low": low, "high": high,
+            "rationale_short": str(data.get("rationale_short") or "")}
+
+def get_completion(provider, api_key, model_name, prompt, temperature, max_tokens=None, system_prompt=None,
+                   stream=False, structured=False, cancel_event=None):
+    """
+    Dispatches a single completion request to the given provider and returns the response text.
+    With stream=True the response is streamed and cut off after the "Final Forecast:" line (see stream_completion);
+    with structured=True it is a FORECAST_SCHEMA JSON object (see get_structured_completion).
+    cancel_event only takes effect on streamed calls (see stream_completion).
+    """
+    if structured:
+        return get_structured_completion(provider, api_key, model_name, prompt, temperature, max_tokens, system_prompt)
+    if stream:
+        return stream_completion(provider, api_key, model_name, prompt, temperature, max_tokens, system_prompt,
+                                 cancel_event=cancel_event)
+    if max_tokens is None:
+        max_tokens = DEFAULT_MAX_TOKENS.get(provider)
+    if provider == "openai":
+        return get_openai_completion(api_key, model_name, prompt, temperature, max_tokens=max_tokens, system_prompt=system_prompt)
+    elif provider == "anthropic":
+        return get_anthropic_completion(api_key, model_name, prompt, temperature, max_tokens=max_tokens, system_prompt=system_prompt)
+    elif provider == "google":
+        return get_google_completion(api_key, model_name, prompt, temperature, max_tokens=max_tokens, system_prompt=system_prompt)
+    raise ValueError(f"Unknown provider: {provider}")
+
+# --- Hedged calls ---
+
+def hedge_substitute(provider, model_name):
+    """
+    The (provider, api_key, model_name) a hedged call to this model sends its duplicate to, from
+    HEDGE_SUBSTITUTES, or None to hedge with the same model (also when the substitute has no API key).
+    """
+    substitute = HEDGE_SUBSTITUTES.get((provider, model_name))
+    if substitute and os.getenv(API_KEY_ENV[substitute[0]]):
+        return substitute[0], os.getenv(API_KEY_ENV[substitute[0]]), substitute[1]
+    return None
+
+def hedged_completion(provider, api_key, model_name, prompt, temperature, hedge_after_ms, max_tokens=None,
+                      system_prompt=None, stream=False, structured=False, substitute=None):
+    """
+    get_completion with a hedge against slow calls. If the call hasn't returned after hedge_after_ms
+    (e.g. the model's p90 latency), a duplicate goes out to the same model, or to substitute, a
+    (provider, api_key, model_name) triple, and the first successful response wins.
+    Returns (text, hedge), where hedge is None if no duplicate was sent, else a dict with
+    sent_after_ms, winner ("primary" or "hedge"), loser_aborted (whether the losing call was still
+    running and was cancelled) and the hedge's provider and model_name.
+    Non-streamed calls run as tasks on get_completion_async, and cancelling the loser's task aborts
+    its HTTP request; a streamed call runs in a thread and closes its stream at the next chunk.
+    An empty response doesn't win while the other call is still running; if both calls fail, the
+    primary's error is raised.
+    """
+    import asyncio
+    return asyncio.run(_hedged_race(provider, api_key, model_name, prompt, temperature, hedge_after_ms, max_tokens,
+                                    system_prompt, stream and not structured, structured,
+                                    substitute or (provider, api_key, model_name)))
+
+async def _hedged_race(provider, api_key, model_name, prompt, temperature, hedge_after_ms, max_tokens, system_prompt,
+                       threaded, structured, substitute):
+    import asyncio
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    loop = asyncio.get_running_loop()
+    cancel = {"primary": threading.Event(), "hedge": threading.Event()}
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hedged-call") if threaded else None
+
+    def start(name, call_provider, call_api_key, call_model_name, call_max_tokens):
+        if threaded:
+            return loop.run_in_executor(pool, functools.partial(
+                stream_completion, call_provider, call_api_key, call_model_name, prompt, temperature,
+                call_max_tokens, system_prompt, cancel_event=cancel[name]))
+        return asyncio.ensure_future(get_completion_async(call_provider, call_api_key, call_model_name, prompt,
+                                                          temperature, call_max_tokens, system_prompt, structured))
+
+    calls = {start("primary", provider, api_key, model_name, max_tokens): "primary"}
+    try:
+        done, _ = await asyncio.wait(calls, timeout=hedge_after_ms / 1000)
+        if done:
+            return next(iter(done)).result(), None
+        hedge_provider, hedge_api_key, hedge_model_name = substitute
+        calls[start("hedge", hedge_provider, hedge_api_key, hedge_model_name,
+                    max_tokens if hedge_provider == provider else None)] = "hedge"
+        hedge = {"sent_after_ms": round(hedge_after_ms, 1), "provider": hedge_provider, "model_name": hedge_model_name}
+        pending, errors = set(calls), {}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for call in done:
+                if call.exception() is None and call.result():
+                    return call.result(), {**hedge, "winner": calls[call], "loser_aborted": bool(pending)}
+                errors[calls[call]] = call.exception()
+        if errors["primary"] is not None:
+            raise errors["primary"]
+        return None, {**hedge, "winner": "primary", "loser_aborted": False}
+    finally:
+        for call, name in calls.items():
+            cancel[name].set()
+            call.cancel()
+        await asyncio.gather(*calls, return_exceptions=True)
+        await close_async_clients()
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+# --- Async calls ---
+
+async def get_completion_async(provider, api_key, model_name, prompt, temperature, max_tokens=None, system_prompt=None,
+                               structured=False):
+    """
+    Async counterpart of get_completion (without streaming), for running many calls concurrently
+    on one event loop. Cancelling the awaiting task aborts the request.
+    """
+    if structured:
+        max_tokens = max_tokens or STRUCTURED_MAX_TOKENS
+    elif max_tokens is None:
+        max_tokens = DEFAULT_MAX_TOKENS.get(provider)
+    if provider == "openai":
+        client = _get_async_client("openai", api_key)
+        build_request = _openai_structured_request if structured else _openai_request
+        completion = await client.chat.completions.create(
+            **build_request(model_name, prompt, temperature, max_tokens, system_prompt)
+        )
+        return completion.choices[0].message.content.strip()
+    elif provider == "anthropic":
+        client = _get_async_client("anthropic", api_key)
+        build_request = _anthropic_structured_request if structured else _anthropic_request
+        response = await client.messages.create(
+            **build_request(model_name, prompt, temperature, max_tokens, system_prompt)
+        )
+        if structured:
+            tool_input = next((b.input for b in response.content if b.type == "tool_use"), None)
+            return json.dumps(tool_input) if tool_input is not None else None
+        return response.content[0].text.strip()
+    elif provider == "google":
+        model = get_google_model(api_key, model_name, system_prompt or None)
+        response = await model.generate_content_async(
+            _structured_prompt(prompt) if structured else prompt,
+            generation_config=_google_generation_config(temperature, max_tokens, structured=structured)
+        )
+        return response.text.strip()
+    raise ValueError(f"Unknown provider: {provider}")
+
+async def close_async_clients():
+    """Closes the async clients created on the running loop, e.g. before an asyncio.run loop ends."""
+    import asyncio
+    loop_id = id(asyncio.get_running_loop())
+    for cache_key in [k for k in list(_async_clients) if k[2] == loop_id]:
+        await _async_clients.pop(cache_key).close()
@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+from prompt_caching import split_prompt
+
+# Replays the LLM calls made by the ensemble and backtest runners against mock_llm_server.py at
+# several concurrency levels and reports throughput and latency percentiles per level.
+# Each call is one get_completion request, exactly as the runners issue it (same prompts,
+# providers, models, temperatures and max_tokens); the runners themselves run these one at a time,
+# which is the concurrency=1 row.
+
+CONCURRENCY_LEVELS = [1, 4, 16]
+WORKLOADS = ["ensemble", "backtest"]
+MOCK_API_KEY = "mock-key"
+BACKTEST_WINDOW_DAYS = 30
+
+def _read(path):
+    with open(path, 'r') as f:
+        return f.read()
+
+def ensemble_calls():
+    """The calls generate_ensemble_forecasts_hotel.py and _trump.py make, as (provider, model, prompt, temperature, max_tokens, parser, template)."""
+    import generate_ensemble_forecasts_hotel as hotel
+    import generate_ensemble_forecasts_trump as trump
+    from prompt_caching import prompt_template
+    calls = []
+    for module in (hotel, trump):
+        for config in module.MODEL_CONFIG:
+            provider = config["provider"]
+            prompt_file = module.prompt_file_for(provider)
+            for temp in module.TEMPERATURES:
+                calls.append((provider, config["model_name"], _read(prompt_file), temp,
+                              module.MAX_TOKENS.get(provider), module.parse_forecast_from_response,
+                              prompt_template(prompt_file)))
+    return calls
+
+def backtest_calls(window_days=BACKTEST_WINDOW_DAYS):
+    """
+    The calls a backtest makes: the Trump evaluation prompts for the backtest period, plus the hotel
+    prompt rendered for every window of hotel_daily_metrics.csv (see build_prompt_context.py).
+    """
+    import evaluate_trump_prompts
+    import evaluate_hotel_prompts
+    import generate_ensemble_forecasts_hotel
+    import build_prompt_context as bpc
+    calls = [("openai", evaluate_trump_prompts.MODEL_TO_USE,
+              evaluate_trump_prompts.modify_prompt_for_backtest(_read(f)), evaluate_trump_prompts.TEMPERATURE, 500,
+              evaluate_trump_prompts.parse_forecast_from_response, _read(f))
+             for f in evaluate_trump_prompts.PROMPT_FILES]
+
+    days, counts, means = bpc.load_daily_review_series()
+    template = _read(bpc.HOTEL_TEMPLATE_FILE)
+    baseline = bpc.read_hotel_baseline()
+    period = bpc.forecast_period_context()
+    contexts = bpc.build_hotel_review_contexts(days, counts, means, range(min(window_days, len(days)) - 1, len(days)), window_days)
+    for context in contexts:
+        prompt = template.format(hotel_name=bpc.HOTEL_NAME, **period, **baseline, **context)
+        calls.append(("openai", evaluate_hotel_prompts.OPENAI_MODEL, prompt, 0.7, None,
+                      generate_ensemble_forecasts_hotel.parse_forecast_from_response, template))
+    return calls
+
+WORKLOAD_BUILDERS = {"ensemble": ensemble_calls, "backtest": backtest_calls}
+
+def _timed_call(call, stream=False, structured=False):
+    from llm_providers import get_completion, parse_structured_forecast
+    provider, model_name, prompt, temperature, max_tokens, parser, template = call
+    system_prompt, user_prompt = split_prompt(prompt, template)
+    if structured:
+        max_tokens, parser = None, parse_structured_forecast
+    start = time.perf_counter()
+    try:
+        text = get_completion(provider, MOCK_API_KEY, model_name, user_prompt, temperature, max_tokens=max_tokens,
+                              system_prompt=system_prompt or None, stream=stream, structured=structured)
+        return time.perf_counter() - start, None, parser(text) is not None
+    except Exception as e:
+        status = getattr(e, "status_code", None) or getattr(e, "code", None)
+        return time.perf_counter() - start, f"{type(e).__name__} ({status})" if status else type(e).__name__, False
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list (q in 0-100)."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+def run_load_level(calls, concurrency, stream=False, structured=False):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda call: _timed_call(call, stream, structured), calls))
+    wall = time.perf_counter() - start
+    latencies = sorted(latency for latency, error, _ in results if error is None)
+    errors = [error for _, error, _ in results if error is not None]
+    return {
+        "concurrency": concurrency,
+        "calls": len(results),
+        "ok": len(latencies),
+        "parsed": sum(1 for _, _, parsed in results if parsed),
+        "errors": len(errors),
+        "error_types": {e: errors.count(e) for e in sorted(set(errors))},
+        "wall_seconds": round(wall, 3),
+        "calls_per_second": round(len(results) / wall, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else None,
+    }
+
+def run_load_test(workloads=None, concurrency_levels=None, rounds=1, providers=None,
+                  latency_median_ms=None, latency_sigma=None, rate_limit_probability=None,
+                  base_url=None, output_json_file=None, seed=0, stream=False, structured=False):
+    """
+    Starts mock_llm_server.py in-process (unless base_url points at a running one), directs all
+    three SDKs to it, and runs each workload's calls `rounds` times at each concurrency level.
+    Prints calls/sec and p50/p99 latency per level and returns the results.
+    Note that the OpenAI and Anthropic SDKs retry 429s themselves, so retried calls show up as
+    higher latency and only calls that still fail count as errors. With stream=True every call
+    streams and stops at its "Final Forecast:" line, as the ensemble runners do; with
+    structured=True every call uses the structured-output mode.
+    """
+    import mock_llm_server
+    workloads = workloads or WORKLOADS
+    concurrency_levels = concurrency_levels or CONCURRENCY_LEVELS
+    server = None
+    if not base_url:
+        options = {"latency_median_ms": latency_median_ms, "latency_sigma": latency_sigma,
+                   "rate_limit_probability": rate_limit_probability}
+        server, base_url = mock_llm_server.start_mock_llm_server(
+            seed=seed, **{k: v for k, v in options.items() if v is not None})
+    os.environ["OPENAI_BASE_URL"] = f"{base_url}/v1"
+    os.environ["ANTHROPIC_BASE_URL"] = base_url
+    os.environ["GEMINI_BASE_URL"] = base_url
+    print(f"Load testing against {base_url}")
+
+    results = []
+    try:
+        for workload in workloads:
+            calls = [c for c in WORKLOAD_BUILDERS[workload]() if not providers or c[0] in providers] * rounds
+            # One untimed call per provider first, so SDK imports and client setup aren't measured.
+            for call in {c[0]: c for c in calls}.values():
+                _timed_call(call, stream, structured)
+            print(f"\n=== {workload}: {len(calls)} calls per level ===")
+            print(f"{'conc':>5} {'calls':>6} {'ok':>6} {'err':>5} {'calls/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+            for concurrency in concurrency_levels:
+                level = run_load_level(calls, concurrency, stream, structured)
+                level["workload"] = workload
+                level["stream"] = stream
+                level["structured"] = structured
+                results.append(level)
+                print(f"{concurrency:>5} {level['calls']:>6} {level['ok']:>6} {level['errors']:>5} "
+                      f"{level['calls_per_second']:>9} {level['p50_ms'] or '-':>8} {level['p99_ms'] or '-':>8}")
+                if level["error_types"]:
+                    print(f"      errors: {level['error_types']}")
+    finally:
+        if server:
+            server.shutdown()
+
+    if output_json_file:
+        with open(output_json_file, 'w') as f:
+            json.dump(results, f, indent=4)
+        print(f"\nLoad test results saved to {output_json_file}")
+    return results
+
+if __name__ == "__main__":
+    run_load_test()
@@ -0,0 +1,289 @@
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+
+# A local stand-in for the OpenAI, Anthropic and Gemini HTTP APIs, so the ensemble and
+# evaluation code can be exercised (and load-tested) without live keys. Point the SDKs at it with
+#   OPENAI_BASE_URL=http://127.0.0.1:<port>/v1
+#   ANTHROPIC_BASE_URL=http://127.0.0.1:<port>
+#   GEMINI_BASE_URL=http://127.0.0.1:<port>      (see llm_providers.get_google_model)
+# Responses are canned chain-of-thought text with a "Final Forecast: X.X" line followed by a
+# closing note, returned after a log-normally distributed delay; a configurable fraction of
+# requests gets a 429 instead. Streaming requests ("stream": true, or Gemini's
+# :streamGenerateContent) get the same text word by word, the delay spread over the words after
+# a time to first token, like a model generating it. Structured requests (OpenAI response_format,
+# an Anthropic tool, Gemini JSON mode) get a {forecast, low, high, rationale_short} object instead,
+# sooner in proportion to its shorter length.
+
+MOCK_LLM_PORT = 8765
+LATENCY_MEDIAN_MS = 400
+LATENCY_SIGMA = 0.5       # Log-normal shape; 0.5 puts p99 at roughly 3.2x the median
+RATE_LIMIT_PROBABILITY = 0.0
+RETRY_AFTER_SECONDS = 0.1
+FIRST_TOKEN_SHARE = 0.2   # Share of a streamed response's delay spent before the first word
+# Canned forecasts are drawn uniformly from the range matching the prompt's target.
+FORECAST_RANGES = {
+    "rating": (3.6, 4.8),  # Hotel prompts ask for an average star rating
+    "posts": (8.0, 25.0),  # Truth Social prompts ask for average daily posts
+}
+
+_GEMINI_PATH = re.compile(r"^/v1(?:beta)?/models/(?P<model>[^/:]+):(?P<method>generateContent|streamGenerateContent)$")
+
+def _canned_response(prompt_text, rng):
+    target = "rating" if "rating" in prompt_text.lower() else "posts"
+    low, high = FORECAST_RANGES[target]
+    value = rng.uniform(low, high)
+    return (
+        "1. Baseline: the recent average is the starting point for this forecast.\n"
+        "2. Recent trend: the latest data suggests a small adjustment from the baseline.\n"
+        "3. Context: no unusual events are expected in the forecast period (mock response).\n"
+        f"Final Forecast: {value:.1f}\n\n"
+        "Note: this forecast assumes the recent pattern continues; an unexpected event in the period "
+        "would move the outcome well outside the usual range, so treat it with moderate confidence."
+    )
+
+def _canned_structured(text):
+    """The structured equivalent of a canned response: the same forecast with an interval around it."""
+    value = float(re.search(r"Final Forecast: ([0-9.]+)", text).group(1))
+    spread = 0.3 if value <= 5 else 3.0
+    return json.dumps({"forecast": value, "low": round(value - spread, 1), "high": round(value + spread, 1),
+                       "rationale_short": "Recent average adjusted slightly for the latest trend (mock response)."})
+
+def _wants_structured(provider, request):
+    if provider == "openai":
+        return bool(request.get("response_format"))
+    if provider == "anthropic":
+        return bool(request.get("tools"))
+    config = request.get("generationConfig") or request.get("generation_config") or {}
+    return (config.get("responseMimeType") or config.get("response_mime_type")) == "application/json"
+
+def _openai_body(request, text, prompt_tokens):
+    completion_tokens = len(text.split())
+    return {
+        "id": f"chatcmpl-mock-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "mock"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+def _anthropic_body(request, text, prompt_tokens):
+    if request.get("tools"):
+        return {
+            "id": f"msg_mock_{uuid.uuid4().hex[:12]}",
+            "type": "message",
+            "role": "assistant",
+            "model": request.get("model", "mock"),
+            "content": [{"type": "tool_use", "id": f"toolu_mock_{uuid.uuid4().hex[:12]}",
+                         "name": request["tools"][0]["name"], "input": json.loads(text)}],
+            "stop_reason": "tool_use",
+            "stop_sequence": None,
+            "usage": {"input_tokens": prompt_tokens, "output_tokens": len(text.split())},
+        }
+    return {
+        "id": f"msg_mock_{uuid.uuid4().hex[:12]}",
+        "type": "message",
+        "role": "assistant",
+        "model": request.get("model", "mock"),
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": prompt_tokens, "output_tokens": len(text.split())},
+    }
+
+def _gemini_body(request, text, prompt_tokens):
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}],
+        "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": len(text.split()),
+                          "totalTokenCount": prompt_tokens + len(text.split())},
+    }
+
+def _stream_events(provider, request, words, prompt_tokens):
+    """The streamed equivalent of a response as a list of (event name or None, JSON payload) pairs."""
+    model = request.get("model", "mock")
+    if provider == "openai":
+        chunk_id, created = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}", int(time.time())
+        def chunk(delta, finish_reason=None):
+            return {"id": chunk_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+        return ([(None, chunk({"role": "assistant", "content": ""}))]
+                + [(None, chunk({"content": word})) for word in words]
+                + [(None, chunk({}, "stop"))])
+    if provider == "anthropic":
+        message = _anthropic_body(request, "", prompt_tokens)
+        message.update(content=[], stop_reason=None)
+        return ([("message_start", {"type": "message_start", "message": message}),
+                 ("content_block_start", {"type": "content_block_start", "index": 0,
+                                          "content_block": {"type": "text", "text": ""}})]
+                + [("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                            "delta": {"type": "text_delta", "text": word}}) for word in words]
+                + [("content_block_stop", {"type": "content_block_stop", "index": 0}),
+                   ("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                      "usage": {"output_tokens": len(words)}}),
+                   ("message_stop", {"type": "message_stop"})])
+    events = [(None, {"candidates": [{"content": {"role": "model", "parts": [{"text": word}]}, "index": 0}]})
+              for word in words]
+    events[-1][1].update(_gemini_body(request, words[-1], prompt_tokens))
+    return events
+
+RATE_LIMIT_BODIES = {
+    "openai": {"error": {"message": "Rate limit reached (mock).", "type": "requests", "param": None,
+                         "code": "rate_limit_exceeded"}},
+    "anthropic": {"type": "error", "error": {"type": "rate_limit_error", "message": "Rate limit reached (mock)."}},
+    "google": {"error": {"code": 429, "message": "Resource has been exhausted (mock).", "status": "RESOURCE_EXHAUSTED"}},
+}
+
+def _prompt_text(provider, request):
+    """All prompt text in a request, system prefix included, regardless of provider shape."""
+    parts = []
+    if provider == "openai":
+        parts = [m.get("content") for m in request.get("messages", [])]
+    elif provider == "anthropic":
+        system = request.get("system")
+        parts = [b.get("text") for b in system] if isinstance(system, list) else [system]
+        parts += [m.get("content") for m in request.get("messages", [])]
+    elif provider == "google":
+        instruction = request.get("systemInstruction") or request.get("system_instruction") or {}
+        parts = [p.get("text") for p in instruction.get("parts", [])]
+        parts += [p.get("text") for c in request.get("contents", []) for p in c.get("parts", [])]
+    return "\n".join(p if isinstance(p, str) else json.dumps(p) for p in parts if p)
+
+def make_handler(latency_median_ms=LATENCY_MEDIAN_MS, latency_sigma=LATENCY_SIGMA,
+                 rate_limit_probability=RATE_LIMIT_PROBABILITY, seed=None):
+    from http.server import BaseHTTPRequestHandler
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+
+    class MockLLMHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like the real APIs
+
+        def log_message(self, format, *args):
+            pass
+
+        def handle(self):
+            # Clients that stop reading a stream early drop their keep-alive connection.
+            try:
+                super().handle()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def _send_json(self, status, body, headers=None):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _write_chunk(self, data):
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def _send_stream(self, provider, request, text, delay, prompt_tokens, sse):
+            """Streams text word by word with chunked encoding, stopping quietly if the client hangs up."""
+            words = re.findall(r"\S+\s*", text)
+            events = _stream_events(provider, request, words, prompt_tokens)
+            word_delay = delay * (1 - FIRST_TOKEN_SHARE) / max(len(words), 1)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream" if sse else "application/json")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                time.sleep(delay * FIRST_TOKEN_SHARE)
+                for i, (name, payload) in enumerate(events):
+                    if sse:
+                        data = (f"event: {name}\n" if name else "") + f"data: {json.dumps(payload)}\n\n"
+                    else:  # Gemini's default alt=json streams one JSON array
+                        data = ("[" if i == 0 else ",\r\n") + json.dumps(payload) + ("]" if i == len(events) - 1 else "")
+                    self._write_chunk(data.encode("utf-8"))
+                    time.sleep(word_delay)
+                if sse and provider == "openai":
+                    self._write_chunk(b"data: [DONE]\n\n")
+                self._write_chunk(b"")
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True
+
+        def do_POST(self):
+            path = self.path.split("?", 1)[0]
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                request = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                self._send_json(400, {"error": {"message": "Invalid JSON body (mock)."}})
+                return
+
+            gemini_match = _GEMINI_PATH.match(path)
+            if path.endswith("/chat/completions"):
+                provider, build_body = "openai", _openai_body
+            elif path.endswith("/messages"):
+                provider, build_body = "anthropic", _anthropic_body
+            elif gemini_match:
+                provider, build_body = "google", _gemini_body
+                request.setdefault("model", gemini_match.group("model"))
+            else:
+                self._send_json(404, {"error": {"message": f"Unknown endpoint {path} (mock)."}})
+                return
+
+            with rng_lock:
+                delay = latency_median_ms / 1000 * math.exp(latency_sigma * rng.gauss(0, 1))
+                rate_limited = rng.random() < rate_limit_probability
+                text = None if rate_limited else _canned_response(_prompt_text(provider, request), rng)
+            stream = request.get("stream") or (gemini_match and gemini_match.group("method") == "streamGenerateContent")
+            if text and _wants_structured(provider, request):
+                structured = _canned_structured(text)
+                delay *= FIRST_TOKEN_SHARE + (1 - FIRST_TOKEN_SHARE) * len(structured.split()) / len(text.split())
+                text = structured
+            if stream and not rate_limited:
+                sse = provider != "google" or "alt=sse" in self.path
+                self._send_stream(provider, request, text, delay, len(_prompt_text(provider, request).split()), sse)
+                return
+            time.sleep(delay)
+            if rate_limited:
+                self._send_json(429, RATE_LIMIT_BODIES[provider], headers={
+                    "retry-after": str(RETRY_AFTER_SECONDS),
+                    "retry-after-ms": str(int(RETRY_AFTER_SECONDS * 1000)),
+                })
+                return
+            prompt_tokens = len(_prompt_text(provider, request).split())
+            self._send_json(200, build_body(request, text, prompt_tokens))
+
+    return MockLLMHandler
+
+def start_mock_llm_server(port=0, **handler_options):
+    """
+    Starts the mock server on a background thread and returns (server, base_url). port=0 picks a
+    free port. Call server.shutdown() to stop it.
+    """
+    from http.server import ThreadingHTTPServer
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(**handler_options))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def serve_mock_llm(port=MOCK_LLM_PORT, latency_median_ms=LATENCY_MEDIAN_MS, latency_sigma=LATENCY_SIGMA,
+                   rate_limit_probability=RATE_LIMIT_PROBABILITY, seed=None):
+    """Runs the mock server in the foreground until interrupted."""
+    from http.server import ThreadingHTTPServer
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency_median_ms, latency_sigma,
+                                                                    rate_limit_probability, seed))
+    base_url = f"http://127.0.0.1:{port}"
+    print(f"Mock LLM server at {base_url} (median latency {latency_median_ms} ms, sigma {latency_sigma}, "
+          f"429 rate {rate_limit_probability:.0%}). Point the SDKs at it with:")
+    print(f"  OPENAI_BASE_URL={base_url}/v1  ANTHROPIC_BASE_URL={base_url}  GEMINI_BASE_URL={base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    serve_mock_llm()
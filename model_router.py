@@ -0,0 +1,293 @@
+import os
+import json
+import itertools
+from datetime import datetime, timedelta, timezone
+import run_registry
+from run_registry import REGISTRY_DB
+from llm_providers import API_KEY_ENV, ENSEMBLE_MODEL_CONFIG, ENSEMBLE_TEMPERATURES
+
+# Chooses each target's ensemble composition from recorded history instead of always running
+# ENSEMBLE_MODEL_CONFIG.
+#   - Rolling per-model stats from the run registry: p50/p90 latency, error rate and estimated
+#     token cost over each model's last ROLLING_CALLS calls (ROLLING_DAYS at most), and backtest
+#     forecasts per window from the recorded evaluations (backtests, sweeps, evaluate scripts).
+#   - A composition's expected accuracy is the MAE of its members' mean forecast on the windows
+#     they were all backtested on. Its latency and cost are per ensemble run: the members run one
+#     after another at every temperature.
+#   - route() picks the most accurate composition within the latency and cost budgets, leaving
+#     out degraded models (recent error rate at or above DEGRADED_ERROR_RATE, or a p90 latency
+#     alone over the budget). Compositions have at least MIN_MEMBERS models; if none with backtest
+#     data fits, it keeps the default ensemble minus the degraded models, filled up to MIN_MEMBERS.
+#   - During a routed ensemble run, fallback_model() replaces a member whose calls all failed.
+
+ROUTING_FILE = "model_routing.json"
+ROLLING_DAYS = 30
+ROLLING_CALLS = 200
+RECENT_CALLS = 20
+DEGRADED_ERROR_RATE = 0.5
+MIN_OVERLAP_WINDOWS = 3
+MIN_MEMBERS = 2
+MAX_MEMBERS = 4
+DEFAULT_LATENCY_BUDGET_MS = 120_000
+DEFAULT_COST_BUDGET_USD = 0.25
+# Used for models without recorded calls
+DEFAULT_LATENCY_MS = 10_000
+DEFAULT_PROMPT_TOKENS = 1500
+DEFAULT_RESPONSE_TOKENS = 400
+CHARS_PER_TOKEN = 4
+# A model's p90 latency is only used as its hedging delay once it has this many successful calls.
+MIN_HEDGE_CALLS = 20
+
+# USD per million (input, output) tokens; models not listed are priced at DEFAULT_PRICE.
+PRICE_PER_MILLION_TOKENS = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "claude-3-opus-20240229": (15.00, 75.00),
+    "claude-3-5-sonnet-20240620": (3.00, 15.00),
+    "claude-3-haiku-20240307": (0.25, 1.25),
+    "gemini-1.5-pro-latest": (1.25, 5.00),
+    "gemini-1.5-flash-latest": (0.075, 0.30),
+}
+DEFAULT_PRICE = (5.00, 15.00)
+
+# Models considered besides the default ensemble and anything found in the registry.
+CANDIDATE_MODELS = [(c["provider"], c["model_name"]) for c in ENSEMBLE_MODEL_CONFIG] + [
+    ("openai", "gpt-4o-mini"), ("openai", "gpt-3.5-turbo"),
+    ("anthropic", "claude-3-5-sonnet-20240620"), ("anthropic", "claude-3-haiku-20240307"),
+    ("google", "gemini-1.5-flash-latest"),
+]
+
+# Backtest prompt of each target's ensemble prompt; its windows are preferred when it has enough.
+ENSEMBLE_PROMPTS = {"hotel": "hotel_prompt_cot.txt", "trump": "trump_prompt_context.txt"}
+
+def _since(days):
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+def model_stats(days=ROLLING_DAYS, db_path=REGISTRY_DB):
+    """
+    {(provider, model_name): stats} over each model's last ROLLING_CALLS recorded calls, with
+    calls, error_rate, recent_error_rate (last RECENT_CALLS), p50/p90 latency_ms and mean
+    prompt/response tokens (estimated from text length).
+    """
+    if not os.path.exists(db_path):
+        return {}
+    with run_registry.connect(db_path) as conn:
+        rows = conn.execute(
+            "SELECT c.provider, c.model_name, c.latency_ms, "
+            "       c.error_message IS NOT NULL OR c.extracted_forecast IS NULL AS failed, "
+            "       LENGTH(decompress(p.text)) AS prompt_chars, LENGTH(decompress(r.body)) AS response_chars "
+            "FROM calls c LEFT JOIN prompts p ON p.id = c.prompt_id LEFT JOIN responses r ON r.call_id = c.id "
+            "WHERE c.created_at >= ? AND c.model_name IS NOT NULL AND c.provider IN (%s) ORDER BY c.provider, c.model_name, c.id DESC"
+            % ",".join("?" * len(API_KEY_ENV)), (_since(days), *API_KEY_ENV)).fetchall()
+    by_model = {}
+    for row in rows:
+        calls = by_model.setdefault((row["provider"], row["model_name"]), [])
+        if len(calls) < ROLLING_CALLS:
+            calls.append(row)
+    stats = {}
+    for key, calls in by_model.items():
+        latencies = [c["latency_ms"] for c in calls if c["latency_ms"] is not None and not c["failed"]]
+        prompt_chars = [c["prompt_chars"] for c in calls if c["prompt_chars"]]
+        response_chars = [c["response_chars"] for c in calls if c["response_chars"]]
+        stats[key] = {
+            "calls": len(calls),
+            "error_rate": round(sum(c["failed"] for c in calls) / len(calls), 3),
+            "recent_error_rate": round(sum(c["failed"] for c in calls[:RECENT_CALLS]) / len(calls[:RECENT_CALLS]), 3),
+            "latency_p50_ms": _percentile(latencies, 0.5),
+            "latency_p90_ms": _percentile(latencies, 0.9),
+            "prompt_tokens": round(sum(prompt_chars) / len(prompt_chars) / CHARS_PER_TOKEN) if prompt_chars else None,
+            "response_tokens": round(sum(response_chars) / len(response_chars) / CHARS_PER_TOKEN) if response_chars else None,
+        }
+    return stats
+
+def hedge_delays(min_calls=MIN_HEDGE_CALLS, days=ROLLING_DAYS, db_path=REGISTRY_DB):
+    """{(provider, model_name): p90 latency in ms} for models with at least min_calls recent successful calls."""
+    return {key: s["latency_p90_ms"] for key, s in model_stats(days, db_path).items()
+            if s["latency_p90_ms"] is not None and s["calls"] * (1 - s["error_rate"]) >= min_calls}
+
+def call_cost(model_name, prompt_tokens=None, response_tokens=None):
+    """Estimated USD cost of one call."""
+    input_price, output_price = PRICE_PER_MILLION_TOKENS.get(model_name, DEFAULT_PRICE)
+    return ((prompt_tokens or DEFAULT_PROMPT_TOKENS) * input_price
+            + (response_tokens or DEFAULT_RESPONSE_TOKENS) * output_price) / 1_000_000
+
+def backtest_forecasts(target, days=ROLLING_DAYS, db_path=REGISTRY_DB):
+    """
+    {(provider, model_name): {period: mean forecast}} and {period: ground truth} from the target's
+    recorded evaluations, restricted to its ensemble prompt when that covers MIN_OVERLAP_WINDOWS.
+    """
+    if not os.path.exists(db_path):
+        return {}, {}
+    query = ("SELECT c.provider, c.model_name, e.period, AVG(e.forecast) AS forecast, AVG(e.ground_truth) AS truth "
+             "FROM evaluations e JOIN calls c ON c.id = e.call_id "
+             "WHERE e.target = ? AND e.created_at >= ? AND e.forecast IS NOT NULL AND c.model_name IS NOT NULL "
+             "AND (? IS NULL OR e.prompt_file = ?) "
+             "GROUP BY c.provider, c.model_name, e.period")
+    with run_registry.connect(db_path) as conn:
+        prompt_file = ENSEMBLE_PROMPTS.get(target)
+        rows = conn.execute(query, (target, _since(days), prompt_file, prompt_file)).fetchall()
+        if len({row["period"] for row in rows}) < MIN_OVERLAP_WINDOWS:
+            rows = conn.execute(query, (target, _since(days), None, None)).fetchall()
+    forecasts, truths = {}, {}
+    for row in rows:
+        forecasts.setdefault((row["provider"], row["model_name"]), {})[row["period"]] = row["forecast"]
+        truths[row["period"]] = row["truth"]
+    return forecasts, truths
+
+def expected_mae(members, forecasts, truths):
+    """MAE of the members' mean forecast over the windows all of them were backtested on (None if too few)."""
+    periods = set(truths)
+    for member in members:
+        periods &= set(forecasts.get(member, {}))
+    if len(periods) < MIN_OVERLAP_WINDOWS:
+        return None
+    return sum(abs(sum(forecasts[m][p] for m in members) / len(members) - truths[p]) for p in periods) / len(periods)
+
+def _member_config(provider, model_name):
+    return {"provider": provider, "model_name": model_name, "api_key_env": API_KEY_ENV[provider]}
+
+def route(target, latency_budget_ms=DEFAULT_LATENCY_BUDGET_MS, cost_budget_usd=DEFAULT_COST_BUDGET_USD,
+          temperatures=None, min_members=MIN_MEMBERS, max_members=MAX_MEMBERS, available_providers=None,
+          db_path=REGISTRY_DB):
+    """
+    The target's routing decision: a dict with the chosen MODEL_CONFIG-style "models", their
+    expected_mae, latency_ms and cost_usd per ensemble run, the reason, the excluded models and
+    the per-model stats it was based on. available_providers (default: those with an API key set)
+    limits the candidates.
+    """
+    n_temperatures = len(temperatures or ENSEMBLE_TEMPERATURES)
+    if available_providers is None:
+        available_providers = [p for p, env in API_KEY_ENV.items() if os.getenv(env)]
+    stats = model_stats(db_path=db_path)
+    forecasts, truths = backtest_forecasts(target, db_path=db_path)
+
+    candidates, excluded, table = [], {}, {}
+    for provider, model_name in dict.fromkeys(CANDIDATE_MODELS + list(stats) + list(forecasts)):
+        s = stats.get((provider, model_name), {})
+        latency = s.get("latency_p90_ms") or DEFAULT_LATENCY_MS
+        entry = {**s, "latency_ms": latency, "cost_usd": round(call_cost(model_name, s.get("prompt_tokens"),
+                                                                          s.get("response_tokens")), 5),
+                 "mae": expected_mae([(provider, model_name)], forecasts, truths)}
+        table[f"{provider}:{model_name}"] = entry
+        if provider not in available_providers:
+            excluded[f"{provider}:{model_name}"] = "no API key"
+        elif s.get("recent_error_rate", 0) >= DEGRADED_ERROR_RATE:
+            excluded[f"{provider}:{model_name}"] = f"degraded: {s['recent_error_rate']:.0%} of its last calls failed"
+        elif latency * n_temperatures > latency_budget_ms:
+            excluded[f"{provider}:{model_name}"] = f"degraded: p90 latency {latency:.0f} ms alone exceeds the budget"
+        else:
+            candidates.append((provider, model_name))
+
+    best = None
+    scored = [c for c in candidates if table[f"{c[0]}:{c[1]}"]["mae"] is not None]
+    for size in range(max(1, min_members), min(max_members, len(scored)) + 1):
+        for members in itertools.combinations(scored, size):
+            latency = sum(table[f"{p}:{m}"]["latency_ms"] for p, m in members) * n_temperatures
+            cost = sum(table[f"{p}:{m}"]["cost_usd"] for p, m in members) * n_temperatures
+            if latency > latency_budget_ms or cost > cost_budget_usd:
+                continue
+            mae = expected_mae(members, forecasts, truths)
+            if mae is not None and (best is None or (mae, cost) < (best[1], best[3])):
+                best = (members, mae, latency, cost)
+
+    if best:
+        members, mae, latency, cost = best
+        reason = f"lowest expected MAE within {latency_budget_ms / 1000:.0f} s and ${cost_budget_usd:.2f} per run"
+    else:
+        members = [(c["provider"], c["model_name"]) for c in ENSEMBLE_MODEL_CONFIG
+                   if (c["provider"], c["model_name"]) in candidates]
+        # Fill up to min_members with the other candidates, most accurate then cheapest first.
+        ranked = sorted((c for c in candidates if c not in members), key=lambda c: (
+            table[f"{c[0]}:{c[1]}"]["mae"] is None, table[f"{c[0]}:{c[1]}"]["mae"] or 0, table[f"{c[0]}:{c[1]}"]["cost_usd"]))
+        filled = ranked[:max(0, min_members - len(members))]
+        members += filled
+        mae = expected_mae(members, forecasts, truths) if members else None
+        latency = sum(table[f"{p}:{m}"]["latency_ms"] for p, m in members) * n_temperatures
+        cost = sum(table[f"{p}:{m}"]["cost_usd"] for p, m in members) * n_temperatures
+        reason = (f"no composition of at least {min_members} backtested models fits the budgets; default ensemble "
+                  f"minus excluded models" + (f", filled up to {min_members} members" if filled else ""))
+    return {
+        "target": target,
+        "models": [_member_config(p, m) for p, m in members],
+        "expected_mae": round(mae, 3) if mae is not None else None,
+        "latency_ms": round(latency), "cost_usd": round(cost, 4),
+        "reason": reason, "excluded": excluded,
+        "budgets": {"latency_ms": latency_budget_ms, "cost_usd": cost_budget_usd},
+        "model_stats": table,
+        "decided_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+def fallback_model(routing, failed, in_use):
+    """
+    The replacement for a member whose calls all failed: the most accurate (then cheapest) model
+    from the routing's stats that is not excluded, failed or in use, preferring providers that
+    have not failed (an outage usually takes the whole provider down). Returns a MODEL_CONFIG-style
+    dict, or None.
+    """
+    failed_providers = {provider for provider, _ in failed}
+    options = []
+    for key, entry in routing["model_stats"].items():
+        provider, model_name = key.split(":", 1)
+        if key in routing["excluded"] or (provider, model_name) in failed or (provider, model_name) in in_use:
+            continue
+        options.append((provider in failed_providers, entry["mae"] is None, entry["mae"] or 0, entry["cost_usd"],
+                        provider, model_name))
+    if not options:
+        return None
+    *_, provider, model_name = min(options)
+    return _member_config(provider, model_name)
+
+def run_with_fallback(routing, run_model):
+    """
+    Runs run_model(config) -> list of prediction entries for each routed model. A model whose
+    entries all failed is replaced by fallback_model(), so a degraded provider costs one attempt.
+    """
+    queue = list(routing["models"])
+    in_use = {(c["provider"], c["model_name"]) for c in queue}
+    failed, entries = set(), []
+    while queue:
+        config = queue.pop(0)
+        model_entries = run_model(config)
+        entries.extend(model_entries)
+        if model_entries and all(e.get("error_message") or e.get("extracted_forecast") is None for e in model_entries):
+            failed.add((config["provider"], config["model_name"]))
+            replacement = fallback_model(routing, failed, in_use)
+            if replacement:
+                print(f"\n{config['provider']}:{config['model_name']} failed on every call; "
+                      f"falling back to {replacement['provider']}:{replacement['model_name']}.")
+                queue.append(replacement)
+                in_use.add((replacement["provider"], replacement["model_name"]))
+    return entries
+
+def route_models(targets=None, latency_budget_ms=DEFAULT_LATENCY_BUDGET_MS, cost_budget_usd=DEFAULT_COST_BUDGET_USD,
+                 output_json_file=ROUTING_FILE, db_path=REGISTRY_DB):
+    """Routes each target, prints the per-model stats and decisions and saves them to output_json_file."""
+    from dotenv import load_dotenv
+    load_dotenv(dotenv_path=".env")
+    decisions = {}
+    for target in targets or ["hotel", "trump"]:
+        decision = route(target, latency_budget_ms, cost_budget_usd, db_path=db_path)
+        decisions[target] = decision
+        print(f"\n{target}: {decision['reason']}")
+        print(f"  {'model':<44} {'calls':>5} {'err%':>5} {'p90 ms':>8} {'$/call':>8} {'MAE':>6}")
+        for key, entry in decision["model_stats"].items():
+            mae = f"{entry['mae']:.3f}" if entry["mae"] is not None else "-"
+            err = f"{entry['error_rate']:.0%}" if "error_rate" in entry else "-"
+            note = f"  ({decision['excluded'][key]})" if key in decision["excluded"] else ""
+            print(f"  {key:<44} {entry.get('calls', 0):>5} {err:>5} {entry['latency_ms']:>8.0f} "
+                  f"{entry['cost_usd']:>8.4f} {mae:>6}{note}")
+        members = ", ".join(f"{m['provider']}:{m['model_name']}" for m in decision["models"]) or "none"
+        print(f"  -> {members}: expected MAE {decision['expected_mae']}, ~{decision['latency_ms'] / 1000:.1f} s, "
+              f"${decision['cost_usd']:.4f} per run")
+    with open(output_json_file, 'w') as f:
+        json.dump(decisions, f, indent=4)
+    print(f"\nRouting decisions saved to {output_json_file}")
+    return decisions
+
+if __name__ == "__main__":
+    route_models()
@@ -1,11 +1,55 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+import os
+import re
+import json
+import hashlib
+
+BATCH_MANIFEST_FILE = "plot_manifest.json"
+# Bump when the chart styling changes so every cached PNG is re-rendered once.
+PLOT_STYLE_VERSION = 1
+FIGURE_SIZE = (12, 6)
+
+# Per-process figure reused across all series a batch worker renders.
+_worker_figure = None
+
+def _new_figure(figsize=FIGURE_SIZE):
+    """Creates a figure bound directly to the Agg canvas, bypassing pyplot's global state."""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    fig.add_subplot(111)
+    return fig
+
+def _draw_series(fig, dates, values, title, ylabel='Number of Posts', tight=True):
+    import matplotlib.dates as mdates
+    ax = fig.axes[0]
+    ax.clear()
+    if len(dates) == 0:
+        ax.set_title(f'{title} (No Data)')
+        ax.text(0.5, 0.5, 'No data available to plot.', ha='center', va='center', transform=ax.transAxes)
+    else:
+        ax.plot(dates, values, marker='o', linestyle='-', color='b')
+        ax.set_title(title)
+        ax.grid(True, which='both', linestyle='--', linewidth=0.5)
+        # Format x-axis to show dates more clearly
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
+        ax.xaxis.set_major_locator(mdates.AutoDateLocator(minticks=5, maxticks=15))
+        for label in ax.get_xticklabels():
+            label.set_rotation(45)
+    ax.set_xlabel('Date')
+    ax.set_ylabel(ylabel)
+    if tight:
+        fig.tight_layout() # Adjust layout to prevent labels from overlapping
 
 def plot_daily_trump_posts(input_csv_file="trump_posts_daily.csv", output_plot_file="trump_daily_posts_plot.png"):
     """
     Reads daily Trump post counts and generates a line plot of posts over time.
     """
+    if not os.path.exists(input_csv_file):
+        print(f"Error: Input file {input_csv_file} not found.")
+        return
+    import pandas as pd
+
     try:
         df = pd.read_csv(input_csv_file)
     except FileNotFoundError:
@@ -21,14 +65,10 @@ def plot_daily_trump_posts(input_csv_file="trump_posts_daily.csv", output_plot_f
 
     if df.empty:
         print(f"Input file {input_csv_file} is empty. Cannot generate plot.")
-        # Optionally, create a blank plot or just return
-        plt.figure(figsize=(10, 5))
-        plt.title('Daily Trump Posts (No Data)')
-        plt.xlabel('Date')
-        plt.ylabel('Number of Posts')
-        plt.text(0.5, 0.5, 'No data available to plot.', ha='center', va='center', transform=plt.gca().transAxes)
+        fig = _new_figure(figsize=(10, 5))
+        _draw_series(fig, [], [], 'Daily Trump Posts')
         try:
-            plt.savefig(output_plot_file)
+            fig.savefig(output_plot_file)
             print(f"Empty plot saved to {output_plot_file} as no data was available.")
         except Exception as e_save:
             print(f"Error saving empty plot to {output_plot_file}: {e_save}")
@@ -38,40 +78,122 @@ def plot_daily_trump_posts(input_csv_file="trump_posts_daily.csv", output_plot_f
         df['date'] = pd.to_datetime(df['date'])
         df = df.sort_values(by='date')
 
-        plt.figure(figsize=(12, 6))
-        plt.plot(df['date'], df['post_count'], marker='o', linestyle='-', color='b')
-        
-        plt.title('Daily Truth Social Post Counts for Donald Trump (Last 60 Days of Activity)')
-        plt.xlabel('Date')
-        plt.ylabel('Number of Posts')
-        plt.grid(True, which='both', linestyle='--', linewidth=0.5)
-        plt.xticks(rotation=45)
-        
-        # Format x-axis to show dates more clearly
-        ax = plt.gca()
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-        ax.xaxis.set_major_locator(mdates.AutoDateLocator(minticks=5, maxticks=15))
-        plt.tight_layout() # Adjust layout to prevent labels from overlapping
-
-        plt.savefig(output_plot_file)
+        fig = _new_figure()
+        _draw_series(fig, df['date'].to_numpy(), df['post_count'].to_numpy(),
+                     'Daily Truth Social Post Counts for Donald Trump (Last 60 Days of Activity)')
+        fig.savefig(output_plot_file)
         print(f"Plot of daily Trump post counts saved to {output_plot_file}")
         print("Plotting completed successfully.")
 
     except Exception as e_plot:
         print(f"An error occurred during plotting: {e_plot}")
 
-if __name__ == "__main__":
-    # Ensure Matplotlib uses a non-interactive backend if running in an environment without a display server
-    # This is generally good practice for scripts that save plots to files.
+def _series_hash(dates, values, title, ylabel):
+    """Hashes the exact data and labels that determine a chart's pixels."""
+    digest = hashlib.sha256()
+    digest.update(f"{PLOT_STYLE_VERSION}|{title}|{ylabel}|".encode("utf-8"))
+    digest.update(dates.astype("datetime64[D]").astype("int64").tobytes())
+    digest.update(values.astype("float64").tobytes())
+    return digest.hexdigest()
+
+def _safe_file_stem(series_key):
+    """A file-name-safe stem for series_key; the hash suffix keeps keys that sanitise alike apart."""
+    key = str(series_key)
+    readable = re.sub(r"[^A-Za-z0-9_.-]+", "_", key).strip("_") or "series"
+    return f"{readable}-{hashlib.sha256(key.encode('utf-8')).hexdigest()[:8]}"
+
+def _init_plot_worker():
+    global _worker_figure
+    import matplotlib
+    matplotlib.use('Agg')
+    _worker_figure = _new_figure()
+    # tight_layout() costs a full extra draw per chart; batch charts share one layout,
+    # so fixed margins that fit rotated date labels are set once per worker instead.
+    _worker_figure.subplots_adjust(left=0.07, right=0.98, top=0.93, bottom=0.2)
+
+def _render_series_job(job):
+    """Renders one series onto this worker's reused figure. Returns (series_key, error or None)."""
+    series_key, dates, values, title, ylabel, output_path = job
+    try:
+        _draw_series(_worker_figure, dates, values, title, ylabel=ylabel, tight=False)
+        _worker_figure.savefig(output_path)
+        return series_key, None
+    except Exception as e:
+        return series_key, str(e)
+
+def plot_daily_series_batch(input_csv_file, output_dir, series_column="account", value_column="post_count",
+                            date_column="date", title_template="Daily {value_label} for {series}",
+                            ylabel=None, max_workers=None, force=False):
+    """
+    Renders one PNG per series in a long-format daily CSV (e.g. one row per account and day) using
+    a process pool. Each worker keeps a single Agg figure and redraws it for every series it handles.
+    Series whose data hash matches the one recorded in the output directory's manifest are skipped
+    unless force=True.
+    """
+    if not os.path.exists(input_csv_file):
+        print(f"Error: Input file {input_csv_file} not found.")
+        return
+    import pandas as pd
+    from concurrent.futures import ProcessPoolExecutor
+
     try:
-        current_backend = plt.get_backend()
-        # print(f"Matplotlib backend: {current_backend}") # Optional: check current backend
-        # If the backend is interactive (e.g., TkAgg, QtAgg) and might cause issues in a headless environment,
-        # you could switch it. For saving to file, 'Agg' is often a safe choice.
-        if not plt.isinteractive() and current_backend.lower() not in ['agg', 'cairo', 'svg', 'pdf', 'ps']:
-            plt.switch_backend('Agg')
-            # print(f"Switched Matplotlib backend to: {plt.get_backend()}")
-    except Exception as e_backend:
-        print(f"Note: Could not switch Matplotlib backend if needed: {e_backend}")
-        
-    plot_daily_trump_posts() 
\ No newline at end of file
+        df = pd.read_csv(input_csv_file)
+    except Exception as e:
+        print(f"Error reading {input_csv_file}: {e}")
+        return
+
+    missing = [c for c in (series_column, date_column, value_column) if c not in df.columns]
+    if missing:
+        print(f"Error: Required columns {missing} not found in {input_csv_file}.")
+        return
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, BATCH_MANIFEST_FILE)
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        manifest = {}
+
+    value_label = value_column.replace('_', ' ')
+    ylabel = ylabel or value_label.capitalize()
+    df[date_column] = pd.to_datetime(df[date_column])
+    df = df.sort_values([series_column, date_column])
+
+    jobs = []
+    new_hashes = {}
+    skipped = 0
+    for series_key, group in df.groupby(series_column, sort=False):
+        dates = group[date_column].to_numpy()
+        values = group[value_column].to_numpy()
+        title = title_template.format(series=series_key, value_label=value_label)
+        series_hash = _series_hash(dates, values, title, ylabel)
+        output_path = os.path.join(output_dir, f"{_safe_file_stem(series_key)}.png")
+        key = str(series_key)
+        if not force and manifest.get(key) == series_hash and os.path.exists(output_path):
+            skipped += 1
+            continue
+        new_hashes[key] = series_hash
+        jobs.append((key, dates, values, title, ylabel, output_path))
+
+    print(f"{len(jobs)} series to render, {skipped} unchanged series skipped.")
+    failed = 0
+    if jobs:
+        chunksize = max(1, len(jobs) // ((max_workers or os.cpu_count() or 1) * 4))
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_plot_worker) as executor:
+            for series_key, error in executor.map(_render_series_job, jobs, chunksize=chunksize):
+                if error:
+                    failed += 1
+                    new_hashes.pop(series_key, None)
+                    print(f"Error rendering series '{series_key}': {error}")
+
+    manifest.update(new_hashes)
+    try:
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=4, sort_keys=True)
+    except Exception as e:
+        print(f"Error saving plot manifest to {manifest_path}: {e}")
+    print(f"Rendered {len(jobs) - failed} plots to {output_dir} ({failed} failed).")
+
+if __name__ == "__main__":
+    plot_daily_trump_posts()
@@ -1,113 +1,130 @@
 import json
-import pandas as pd
 from datetime import datetime, timedelta
+import data_store
+from data_store import STORE_DB
 
-def parse_and_count_daily_posts(input_json_file="trump_posts_raw.json", output_csv_file="trump_posts_daily.csv", days_to_include=60):
+def parse_and_count_daily_posts(input_json_file="trump_posts_raw.json", output_csv_file="trump_posts_daily.csv", days_to_include=60, export_dashboard=False,
+                                db_path=STORE_DB):
     """
     Parses raw Trump Truth Social posts from a JSON file, filters for the last 'days_to_include' days,
-    counts daily post frequency, and saves to a CSV file.
+    counts daily post frequency (UTC days), and saves to a CSV file.
+    The posts are synced into the local store (see data_store.py) and counted there with an index
+    range scan; the JSON file is only read again when it has changed.
+    If export_dashboard is set, daily/weekly/monthly series over all parsed posts are also
+    written to the dashboard directory (see export_dashboard_series.py).
     """
-    try:
-        with open(input_json_file, 'r') as f:
-            raw_posts = json.load(f)
-    except FileNotFoundError:
-        print(f"Error: Input file {input_json_file} not found.")
-        return
-    except json.JSONDecodeError:
-        print(f"Error: Could not decode JSON from {input_json_file}. It might be empty or malformed.")
-        # Check if it's an error/warning message from the previous script
+    accounts = data_store.synced_keys(input_json_file, "posts", db_path)
+    if accounts is None:
         try:
-            with open(input_json_file, 'r') as f_check:
-                content_check = f_check.read()
-                if "error" in content_check.lower() or "warning" in content_check.lower():
-                    print(f"Note: {input_json_file} seems to contain an error/warning message, not post data.")
-        except: pass # Ignore if this check fails
-        return
-    except Exception as e:
-        print(f"Error reading {input_json_file}: {e}")
-        return
+            with open(input_json_file, 'r') as f:
+                raw_posts = json.load(f)
+        except FileNotFoundError:
+            print(f"Error: Input file {input_json_file} not found.")
+            return
+        except json.JSONDecodeError:
+            print(f"Error: Could not decode JSON from {input_json_file}. It might be empty or malformed.")
+            # Check if it's an error/warning message from the previous script
+            try:
+                with open(input_json_file, 'r') as f_check:
+                    content_check = f_check.read()
+                    if "error" in content_check.lower() or "warning" in content_check.lower():
+                        print(f"Note: {input_json_file} seems to contain an error/warning message, not post data.")
+            except: pass # Ignore if this check fails
+            return
+        except Exception as e:
+            print(f"Error reading {input_json_file}: {e}")
+            return
 
-    if not isinstance(raw_posts, list) or not raw_posts:
-        print(f"No posts found in {input_json_file} or data is not in expected list format.")
-        # Create an empty CSV with correct headers if no posts
-        pd.DataFrame(columns=['date', 'post_count']).to_csv(output_csv_file, index=False)
-        print(f"Empty {output_csv_file} created.")
-        return
-    
-    # Check if the first item contains an error or warning key from the Apify script
-    if isinstance(raw_posts[0], dict) and ("error" in raw_posts[0] or "warning" in raw_posts[0]):
-        print(f"The content of {input_json_file} appears to be an error/warning message:")
-        print(raw_posts[0])
-        # Create an empty CSV with correct headers
-        pd.DataFrame(columns=['date', 'post_count']).to_csv(output_csv_file, index=False)
-        print(f"Empty {output_csv_file} created due to error/warning in input.")
-        return
+        import pandas as pd
 
-    processed_posts = []
-    for post in raw_posts:
-        if not isinstance(post, dict):
-            print(f"Warning: Skipping non-dictionary item in raw_posts: {post}")
-            continue
-        
-        # Date extraction - Apify's truth-social-scraper usually provides 'createdAt' or 'date'
-        # Let's check common keys and try to parse them.
-        date_str = None
-        possible_date_keys = ['createdAt', 'date', 'created_at', 'timestamp', 'created']
-        for key in possible_date_keys:
-            if key in post and post[key]:
-                date_str = post[key]
-                break
-        
-        if not date_str:
-            print(f"Warning: Could not find a recognizable date field in post: {post.get('id', 'N/A')}")
-            continue
+        if not isinstance(raw_posts, list) or not raw_posts:
+            print(f"No posts found in {input_json_file} or data is not in expected list format.")
+            # Create an empty CSV with correct headers if no posts
+            pd.DataFrame(columns=['date', 'post_count']).to_csv(output_csv_file, index=False)
+            print(f"Empty {output_csv_file} created.")
+            return
 
-        try:
-            # Attempt to parse the date string. It might be ISO format or epoch timestamp.
-            if isinstance(date_str, (int, float)):
-                # Assuming it might be a Unix timestamp (seconds or milliseconds)
-                if date_str > 1e11: # Likely milliseconds
-                    dt_object = datetime.fromtimestamp(date_str / 1000)
-                else: # Likely seconds
-                    dt_object = datetime.fromtimestamp(date_str)
-            else:
-                # Try parsing common ISO-like formats
-                # Apify often uses ISO format like "2024-05-20T10:00:00.000Z"
-                dt_object = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-            
-            processed_posts.append({"date": dt_object.date()}) # Keep only the date part
-        except ValueError as ve:
-            print(f"Warning: Could not parse date string '{date_str}' for post {post.get('id', 'N/A')}: {ve}")
-        except Exception as e_date:
-            print(f"Warning: Error processing date for post {post.get('id', 'N/A')}: {e_date}")
-
-    if not processed_posts:
+        # Check if the first item contains an error or warning key from the Apify script
+        if isinstance(raw_posts[0], dict) and ("error" in raw_posts[0] or "warning" in raw_posts[0]):
+            print(f"The content of {input_json_file} appears to be an error/warning message:")
+            print(raw_posts[0])
+            # Create an empty CSV with correct headers
+            pd.DataFrame(columns=['date', 'post_count']).to_csv(output_csv_file, index=False)
+            print(f"Empty {output_csv_file} created due to error/warning in input.")
+            return
+
+        accounts = data_store.ingest_posts(raw_posts, input_json_file, db_path)
+
+    import pandas as pd
+
+    if not accounts:
         print("No posts could be processed for date extraction.")
         pd.DataFrame(columns=['date', 'post_count']).to_csv(output_csv_file, index=False)
         print(f"Empty {output_csv_file} created.")
         return
 
-    df = pd.DataFrame(processed_posts)
-    df['date'] = pd.to_datetime(df['date'])
+    if export_dashboard:
+        from export_dashboard_series import export_dashboard_series
+        all_daily_counts = data_store.daily_post_counts(input_json_file, accounts, db_path=db_path).groupby('date')['post_count'].sum().reset_index()
+        export_dashboard_series(all_daily_counts, "trump_posts", sum_columns=['post_count'])
 
     # Filter for the last 'days_to_include' days
     cutoff_date = datetime.now().date() - timedelta(days=days_to_include)
-    df = df[df['date'].dt.date >= cutoff_date]
+    daily = data_store.daily_post_counts(input_json_file, accounts, start=cutoff_date, db_path=db_path)
 
-    if df.empty:
+    if daily.empty:
         print(f"No posts found within the last {days_to_include} days.")
         daily_counts_df = pd.DataFrame(columns=['date', 'post_count'])
     else:
-        # Group by date and count posts
-        daily_counts = df.groupby(df['date'].dt.date).size()
-        daily_counts_df = daily_counts.reset_index(name='post_count')
-        daily_counts_df.columns = ['date', 'post_count']
+        daily_counts_df = daily.groupby('date')['post_count'].sum().reset_index()
+        daily_counts_df['date'] = daily_counts_df['date'].dt.date
         daily_counts_df = daily_counts_df.sort_values(by='date', ascending=False)
 
     daily_counts_df.to_csv(output_csv_file, index=False)
     print(f"Daily post counts for the last {days_to_include} days saved to {output_csv_file}")
-    print(f"Total posts processed after date filtering: {df.shape[0]}")
+    print(f"Total posts processed after date filtering: {int(daily_counts_df['post_count'].sum())}")
     print(f"Number of days with posts: {daily_counts_df.shape[0]}")
 
+def count_daily_posts_by_account(input_json_file="truth_social_posts_raw.json",
+                                 output_csv_file="truth_social_posts_daily.csv", days_to_include=60, db_path=STORE_DB):
+    """
+    Counts daily posts per account for the multi-account fetch (see
+    fetch_truth_social_accounts_apify) and saves them as one long-format CSV with columns
+    account, date, post_count, instead of one CSV per account. The posts are synced into the
+    local store and grouped by (account, day) there, one index range scan per account.
+    """
+    accounts = data_store.synced_keys(input_json_file, "posts", db_path)
+    if accounts is None:
+        try:
+            with open(input_json_file, 'r') as f:
+                raw_posts = json.load(f)
+        except FileNotFoundError:
+            print(f"Error: Input file {input_json_file} not found.")
+            return
+        except json.JSONDecodeError:
+            print(f"Error: Could not decode JSON from {input_json_file}. It might be empty or malformed.")
+            return
+        if isinstance(raw_posts, list) and raw_posts and \
+                not (isinstance(raw_posts[0], dict) and ("error" in raw_posts[0] or "warning" in raw_posts[0])):
+            accounts = data_store.ingest_posts(raw_posts, input_json_file, db_path)
+
+    import pandas as pd
+    columns = ['account', 'date', 'post_count']
+    if not accounts:
+        print(f"No posts found in {input_json_file}, or it holds an error/warning message.")
+        pd.DataFrame(columns=columns).to_csv(output_csv_file, index=False)
+        print(f"Empty {output_csv_file} created.")
+        return
+
+    cutoff_date = datetime.now().date() - timedelta(days=days_to_include)
+    daily_counts_df = (data_store.daily_post_counts(input_json_file, accounts, start=cutoff_date, db_path=db_path)
+                       .sort_values(['account', 'date'], ascending=[True, False]))
+    daily_counts_df['date'] = daily_counts_df['date'].dt.date
+
+    daily_counts_df[columns].to_csv(output_csv_file, index=False)
+    print(f"Daily post counts per account for the last {days_to_include} days saved to {output_csv_file}")
+    print(f"Accounts: {daily_counts_df['account'].nunique()}, posts after date filtering: {int(daily_counts_df['post_count'].sum())}, "
+          f"(account, day) rows: {len(daily_counts_df)}")
+
 if __name__ == "__main__":
-    parse_and_count_daily_posts() 
\ No newline at end of file
+    parse_and_count_daily_posts()
@@ -0,0 +1,78 @@
+import os
+import re
+
+# Prompts are split into a static prefix that is identical across calls and the rest of the prompt
+# (forecast period, baseline numbers, daily data). The prompt files put the role, reasoning steps
+# and output format first and the per-call data last, so only a leading prefix is split off and
+# the model still reads the prompt in its original order; the prefix is sent as the system prompt
+# so providers can cache it (see llm_providers.py). A prompt that starts with per-call data is
+# sent unsplit.
+
+_MONTHS = (r"(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|June?|July?|Aug(?:ust)?|"
+           r"Sep(?:t(?:ember)?)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)")
+# A specific calendar day, e.g. "June 2", "May 09", "Apr 22nd", or an ISO date.
+_SPECIFIC_DATE = re.compile(rf"\b{_MONTHS}\.?\s+\d{{1,2}}(?:st|nd|rd|th)?\b|\b\d{{4}}-\d{{2}}-\d{{2}}\b")
+# A bulleted line carrying a number, e.g. "- Mean Daily Posts: 16.31".
+_DATA_BULLET = re.compile(r"^\s*[-*]\s.*\d", re.MULTILINE)
+# A placeholder left in a template, e.g. "{recent_daily_trends}".
+_PLACEHOLDER = re.compile(r"\{[a-z_]+\}")
+
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n\s*")
+
+def is_variable_paragraph(paragraph):
+    """True if a paragraph carries per-call data (a specific date, numeric data bullets or a placeholder)."""
+    return bool(_SPECIFIC_DATE.search(paragraph) or _DATA_BULLET.search(paragraph) or _PLACEHOLDER.search(paragraph))
+
+def _paragraphs(text):
+    """(paragraph, end offset) for each blank-line separated paragraph of text."""
+    paragraphs, start = [], 0
+    for match in list(_PARAGRAPH_BREAK.finditer(text)) + [None]:
+        end = match.start() if match else len(text)
+        paragraphs.append((text[start:end], end))
+        start = match.end() if match else end
+    return paragraphs
+
+def static_prefix_end(text, is_variable=lambda paragraph, end: is_variable_paragraph(paragraph)):
+    """
+    End offset of text's leading static paragraphs: those before the first variable one, less a
+    paragraph ending with ':' that introduces it. 0 if there are none or nothing variable follows.
+    is_variable is called with each paragraph and its end offset.
+    """
+    paragraphs = _paragraphs(text)
+    prefix_end = 0
+    for i, (paragraph, end) in enumerate(paragraphs):
+        if is_variable(paragraph, end):
+            return prefix_end
+        if (paragraph.rstrip().endswith(":") and i + 1 < len(paragraphs)
+                and is_variable(*paragraphs[i + 1])):
+            return prefix_end
+        prefix_end = end
+    return 0
+
+def split_prompt(prompt_text, template=None):
+    """
+    Splits a prompt into (static_prefix, rest) without reordering it. template is the text the
+    prompt was made from: a template with {placeholders}, or a prompt file before its forecast
+    period was rewritten for a backtest window. With it, the prefix is the leading paragraphs that
+    carry no placeholder and that the prompt left unchanged, so it is the same for every rendering.
+    Without it, the prefix is the leading paragraphs without a specific date or numeric data
+    bullets. If there is no such prefix the prompt is returned unsplit as ("", prompt_text).
+    """
+    if template is not None:
+        same = len(os.path.commonprefix([prompt_text, template]))
+        end = static_prefix_end(template, lambda paragraph, end: bool(_PLACEHOLDER.search(paragraph)) or end >= same)
+    else:
+        end = static_prefix_end(prompt_text)
+    separator = _PARAGRAPH_BREAK.match(prompt_text, end) if end else None
+    if not separator or separator.end() == len(prompt_text):
+        return "", prompt_text
+    return prompt_text[:end], prompt_text[separator.end():]
+
+def prompt_template(prompt_file):
+    """The template text prompt_file is generated from by build_prompt_context, or None."""
+    from build_prompt_context import GENERATED_PROMPT_FILES
+    template_file = GENERATED_PROMPT_FILES.get(os.path.basename(prompt_file))
+    if not template_file or not os.path.exists(template_file):
+        return None
+    with open(template_file, 'r') as f:
+        return f.read()
@@ -0,0 +1,158 @@
+import os
+import re
+import math
+import functools
+
+# Fits the data-bearing part of a prompt into a per-model input token budget.
+#   - Tokens are counted locally: with tiktoken when it is installed and TIKTOKEN_CACHE_DIR holds its
+#     encoding files (tiktoken would otherwise download them), else with a conservative word/digit/
+#     punctuation estimate scaled per provider.
+#   - The daily review table is packed at the first PACKING_LEVELS entry whose rendered prompt fits:
+#     every day run-length encoded, then recent days in detail with older days as weekly summaries
+#     plus their top-k anomalous days, then weekly summaries only, then a one-line summary.
+
+# Input token budget of the whole prompt per model: what MAX_INPUT_COST_PER_CALL buys at the model's
+# input price (model_router.PRICE_PER_MILLION_TOKENS), capped by its context window less
+# RESPONSE_TOKEN_RESERVE, and never below MIN_CACHEABLE_PROMPT_TOKENS, the shortest prompt OpenAI and
+# Anthropic cache (see prompt_caching.py). E.g. Claude 3 Opus at $15/M gets 2000 tokens, GPT-4o at $2.50/M 12000.
+MAX_INPUT_COST_PER_CALL = 0.03  # USD
+MIN_CACHEABLE_PROMPT_TOKENS = 1024
+RESPONSE_TOKEN_RESERVE = 1024
+# Context windows in tokens; models not listed get DEFAULT_CONTEXT_WINDOW.
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-4o": 128_000,
+    "gpt-4o-mini": 128_000,
+    "gpt-3.5-turbo": 16_385,
+    "claude-3-opus-20240229": 200_000,
+    "claude-3-5-sonnet-20240620": 200_000,
+    "claude-3-haiku-20240307": 200_000,
+    "gemini-1.5-pro-latest": 2_000_000,
+    "gemini-1.5-flash-latest": 1_000_000,
+}
+DEFAULT_CONTEXT_WINDOW = 8_192
+# Heuristic tokens are scaled by this per provider (Claude's tokenizer splits text more finely).
+PROVIDER_TOKEN_FACTORS = {"openai": 1.0, "anthropic": 1.15, "google": 1.0}
+HEURISTIC_TOKEN_PATTERN = re.compile(r"[^\W\d_]+|\d{1,3}|[^\w\s]|_")
+TIKTOKEN_DEFAULT_ENCODING = "o200k_base"
+
+# (name, days shown in detail (None = all), weekly summaries for the rest, anomalies kept from the rest)
+PACKING_LEVELS = [
+    ("daily", None, False, 0),
+    ("recent-14-weekly", 14, True, 5),
+    ("recent-7-weekly", 7, True, 3),
+    ("weekly", 0, True, 3),
+    ("summary", 0, False, 1),
+]
+
+def input_budget(model_name):
+    from model_router import DEFAULT_PRICE, PRICE_PER_MILLION_TOKENS
+    input_price = PRICE_PER_MILLION_TOKENS.get(model_name, DEFAULT_PRICE)[0]
+    affordable = int(MAX_INPUT_COST_PER_CALL / input_price * 1_000_000)
+    context_limit = MODEL_CONTEXT_WINDOWS.get(model_name, DEFAULT_CONTEXT_WINDOW) - RESPONSE_TOKEN_RESERVE
+    return max(MIN_CACHEABLE_PROMPT_TOKENS, min(affordable, context_limit))
+
+@functools.lru_cache(maxsize=None)
+def _tiktoken_encoding(model_name):
+    if not os.getenv("TIKTOKEN_CACHE_DIR"):
+        return None
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding(TIKTOKEN_DEFAULT_ENCODING)
+    except Exception:  # Encoding files not cached locally
+        return None
+
+def count_tokens(text, model_name=None, provider="openai"):
+    """Input tokens of text for model_name, counted without any network access."""
+    encoding = _tiktoken_encoding(model_name) if provider == "openai" and model_name else None
+    if encoding is not None:
+        return len(encoding.encode(text))
+    tokens = 0
+    for piece in HEURISTIC_TOKEN_PATTERN.findall(text):
+        # Short words are one token, long ones two or more; digits go in groups of up to three.
+        tokens += 1 + len(piece) // 8 if piece[0].isalpha() else 1
+    return math.ceil(tokens * PROVIDER_TOKEN_FACTORS.get(provider, 1.0))
+
+def weekly_summary_lines(days, counts, means, lo, hi):
+    """One line per 7-day block of [lo, hi], counted back from hi (the oldest block may be shorter)."""
+    from build_prompt_context import format_day_range
+    lines = []
+    for end in range(hi, lo - 1, -7):
+        start = max(lo, end - 6)
+        total = int(counts[start:end + 1].sum())
+        label = format_day_range(days[start], days[end])
+        if total == 0:
+            lines.append(f"- {label}: No new reviews.")
+        else:
+            mean = float(counts[start:end + 1] @ means[start:end + 1] / total)
+            lines.append(f"- {label}: {total} new reviews, mean rating {mean:.1f}.")
+    return lines[::-1]
+
+def top_anomalies(counts, means, lo, hi, k, reference):
+    """
+    Indices of the k days in [lo, hi] whose mean rating is furthest from reference, weighted by
+    the square root of their review count, in date order.
+    """
+    import numpy as np
+    if k <= 0 or reference is None or hi < lo:
+        return []
+    window_counts = counts[lo:hi + 1]
+    scores = np.abs(means[lo:hi + 1] - reference) * np.sqrt(window_counts)
+    scores[window_counts == 0] = 0
+    ranked = [i for i in np.argsort(-scores, kind="stable")[:k].tolist() if scores[i] > 0]
+    return sorted(lo + i for i in ranked)
+
+def pack_review_trends(days, counts, means, lo, hi, level):
+    """The recent_daily_trends text for days[lo..hi] at one of the PACKING_LEVELS."""
+    from build_prompt_context import run_boundaries, describe_review_runs, format_day, format_day_range
+    _, detail_days, weekly, n_anomalies = level
+    window_counts = counts[lo:hi + 1]
+    total = int(window_counts.sum())
+    reference = float(window_counts @ means[lo:hi + 1] / total) if total else None
+    cut = lo if detail_days is None else max(lo, hi - detail_days + 1)
+
+    sections = []
+    if cut > lo:
+        if weekly:
+            sections.append(f"Weekly summary, {format_day_range(days[lo], days[cut - 1])}:")
+            sections.extend(weekly_summary_lines(days, counts, means, lo, cut - 1))
+        else:
+            older = int(counts[lo:cut].sum())
+            older_mean = f", mean rating {float(counts[lo:cut] @ means[lo:cut] / older):.1f}" if older else ""
+            sections.append(f"- {format_day_range(days[lo], days[cut - 1])}: {older} new reviews{older_mean}.")
+        anomalies = top_anomalies(counts, means, lo, cut - 1, n_anomalies, reference)
+        if anomalies:
+            sections.append("Most unusual days in that period:")
+            sections.extend(f"- {format_day(days[i])}: {int(counts[i])} new reviews, mean rating {means[i]:.1f} "
+                            f"({means[i] - reference:+.1f} vs the window mean)." for i in anomalies)
+    if hi >= cut:
+        starts, ends = run_boundaries(counts[cut:hi + 1], means[cut:hi + 1])
+        starts, ends = starts + cut, ends + cut
+        if sections:
+            sections.append(f"Daily detail, {format_day_range(days[cut], days[hi])}:")
+        sections.append(describe_review_runs(days, counts, means, starts, ends, reference))
+    return "\n".join(sections)
+
+def pack_review_context(days, counts, means, hi, window_days, render, budget, model_name=None, provider="openai"):
+    """
+    The hotel review context dict (as build_prompt_context.build_hotel_review_contexts returns) for
+    the window ending at index hi, packed at the first level whose render(context) prompt fits in
+    budget tokens. Returns (context, level name, prompt tokens); the last level is used if none fits.
+    """
+    from build_prompt_context import format_day
+    lo = max(0, hi - window_days + 1)
+    context = {
+        "window_days": hi - lo + 1,
+        "window_start": f"{format_day(days[lo])}, {days[lo].year}",
+        "window_end": f"{days[hi]:%B} {days[hi].day:02d}, {days[hi].year}",
+    }
+    for level in PACKING_LEVELS:
+        context["recent_daily_trends"] = pack_review_trends(days, counts, means, lo, hi, level)
+        tokens = count_tokens(render(context), model_name, provider)
+        if tokens <= budget:
+            break
+    return context, level[0], tokens
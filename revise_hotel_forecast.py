@@ -1,5 +1,5 @@
 import json
-import numpy as np
+import statistics
 
 RAW_PREDICTIONS_FILE = "hotel_preds_raw.json"
 FINAL_FORECAST_FILE = "hotel_final.json"
@@ -62,8 +62,8 @@ def main():
             "notes": "No valid individual forecasts after outlier removal."
         }
     else:
-        mean_forecast = round(np.mean(valid_forecasts), 2)
-        std_dev_forecast = round(np.std(valid_forecasts), 2)
+        mean_forecast = round(statistics.fmean(valid_forecasts), 2)
+        std_dev_forecast = round(statistics.pstdev(valid_forecasts), 2)
         
         final_data = {
             "forecast_period": "June 2, 2025 - June 6, 2025",
@@ -0,0 +1,220 @@
+import os
+import re
+import json
+import asyncio
+from dotenv import load_dotenv
+from llm_providers import API_KEY_ENV, get_completion_async, is_same_member
+from prompt_caching import split_prompt
+
+import aggregate_hotel_forecasts
+import aggregate_trump_forecasts
+import critique_hotel_forecast
+import critique_trump_forecast
+import run_registry
+
+# Every target goes through the same critique -> revise loop: aggregate the raw ensemble,
+# have each critic review it, then re-aggregate without the members the critics flagged.
+TARGETS = {
+    "hotel": {
+        "raw_predictions_file": aggregate_hotel_forecasts.RAW_PREDICTIONS_FILE,
+        "final_forecast_file": aggregate_hotel_forecasts.FINAL_FORECAST_FILE,
+        "critique_output_file": critique_hotel_forecast.CRITIQUE_OUTPUT_FILE,
+        "recommendations_file": "hotel_critique_recommendations.json",
+        "rationale_file": "hotel_revision_rationale.txt",
+        "aggregate": aggregate_hotel_forecasts.aggregate_predictions,
+        "build_prompt": critique_hotel_forecast.build_critic_prompt,
+        "prompt_template": critique_hotel_forecast.CRITIC_PROMPT_TEMPLATE,
+    },
+    "trump": {
+        "raw_predictions_file": aggregate_trump_forecasts.RAW_PREDICTIONS_FILE,
+        "final_forecast_file": aggregate_trump_forecasts.FINAL_FORECAST_FILE,
+        "critique_output_file": critique_trump_forecast.CRITIQUE_OUTPUT_FILE,
+        "recommendations_file": "trump_critique_recommendations.json",
+        "rationale_file": "trump_revision_rationale.txt",
+        "aggregate": aggregate_trump_forecasts.aggregate_predictions,
+        "build_prompt": critique_trump_forecast.build_critic_prompt,
+        "prompt_template": critique_trump_forecast.CRITIC_PROMPT_TEMPLATE,
+    },
+}
+
+CRITIC_MODELS = [
+    {"provider": "openai", "model_name": "gpt-4o"},
+]
+CRITIC_TEMPERATURE = 0.3 # Low temp for focused critique
+CRITIC_MAX_TOKENS = 1500
+# Fraction of responding critics that must flag a member before it is excluded.
+MIN_CRITIC_AGREEMENT = 0.5
+
+STRUCTURED_RECOMMENDATION_INSTRUCTIONS = """
+The individual ensemble members behind this forecast were:
+{member_lines}
+
+After your critique, finish your response with your recommendations as a JSON object in a ```json fenced block, with exactly these keys:
+{{"exclude_members": [{{"provider": "...", "model_name": "...", "temperature": 0.0}}], "confidence": "low" | "medium" | "high", "adjustment_rationale": "one sentence"}}
+Only list a member in "exclude_members" if you judge its forecast to be an unjustified outlier; otherwise use an empty list.
+"""
+
+def format_member_lines(raw_predictions):
+    lines = []
+    for pred in raw_predictions:
+        outcome = pred.get("extracted_forecast") if pred.get("error_message") is None else f"error ({pred.get('error_message')})"
+        lines.append(f"- provider={pred.get('provider')}, model_name={pred.get('model_name')}, "
+                     f"temperature={pred.get('temperature')}: forecast {outcome}")
+    return "\n".join(lines)
+
+def parse_recommendations(critique_text, raw_predictions):
+    """
+    Extracts the trailing JSON recommendation block from a critique. Exclusions that don't match
+    an actual ensemble member are dropped. Returns None if no valid block is found.
+    """
+    if not critique_text:
+        return None
+    blocks = re.findall(r"```json\s*(\{.*?\})\s*```", critique_text, re.DOTALL)
+    if not blocks:
+        blocks = re.findall(r"(\{[^{}]*\"exclude_members\".*\})", critique_text, re.DOTALL)
+    for block in reversed(blocks):
+        try:
+            recommendations = json.loads(block)
+        except json.JSONDecodeError:
+            continue
+        if not isinstance(recommendations, dict):
+            continue
+        members = recommendations.get("exclude_members") or []
+        recommendations["exclude_members"] = [
+            {"provider": p.get("provider"), "model_name": p.get("model_name"), "temperature": p.get("temperature")}
+            for p in raw_predictions
+            if any(isinstance(m, dict) and is_same_member(p, m) for m in members)
+        ]
+        return recommendations
+    return None
+
+def merge_exclusions(recommendations_list, raw_predictions):
+    """Returns the members flagged by at least MIN_CRITIC_AGREEMENT of the critics that responded."""
+    responding = [r for r in recommendations_list if r is not None]
+    if not responding:
+        return []
+    excluded = []
+    for pred in raw_predictions:
+        member = {"provider": pred.get("provider"), "model_name": pred.get("model_name"), "temperature": pred.get("temperature")}
+        if member in excluded:
+            continue
+        votes = sum(1 for r in responding if member in r["exclude_members"])
+        if votes / len(responding) >= MIN_CRITIC_AGREEMENT:
+            excluded.append(member)
+    return excluded
+
+async def run_critic(target, critic, api_key, prompt):
+    print(f"Sending {target} critique request to {critic['provider']} {critic['model_name']}...")
+    # The critic instructions are the same for every run; only the forecast JSON and member list vary.
+    template = TARGETS[target]["prompt_template"] + STRUCTURED_RECOMMENDATION_INSTRUCTIONS
+    system_prompt, user_prompt = split_prompt(prompt, template)
+    try:
+        text = await get_completion_async(critic["provider"], api_key, critic["model_name"], user_prompt,
+                                          CRITIC_TEMPERATURE, max_tokens=CRITIC_MAX_TOKENS,
+                                          system_prompt=system_prompt or None)
+        return {"critic": critic, "critique_text": text, "error_message": None}
+    except Exception as e:
+        print(f"Error calling {critic['provider']} {critic['model_name']} for {target}: {e}")
+        return {"critic": critic, "critique_text": None, "error_message": str(e)}
+
+async def run_all_critics(jobs):
+    return await asyncio.gather(*(run_critic(*job) for job in jobs))
+
+def revise_target(target, config, raw_predictions, critic_results):
+    """Parses each critic's recommendations, re-aggregates the target and writes its outputs."""
+    for result in critic_results:
+        result["recommendations"] = parse_recommendations(result["critique_text"], raw_predictions)
+        if result["critique_text"] and result["recommendations"] is None:
+            print(f"Warning: No parsable recommendations from {result['critic']['model_name']} for {target}.")
+
+    excluded = merge_exclusions([r["recommendations"] for r in critic_results], raw_predictions)
+    final_data = config["aggregate"](raw_predictions, excluded_members=excluded)
+    if excluded and final_data.get("number_of_valid_forecasts", 0) == 0:
+        print(f"Warning: Critic exclusions would leave no valid {target} forecasts. Keeping all members.")
+        excluded = []
+        final_data = config["aggregate"](raw_predictions)
+
+    outputs = [
+        (config["final_forecast_file"], json.dumps(final_data, indent=4)),
+        (config["critique_output_file"], "\n\n".join(
+            f"=== Critique by {r['critic']['provider']} {r['critic']['model_name']} ===\n"
+            f"{r['critique_text'] or 'Error: ' + str(r['error_message'])}" for r in critic_results)),
+        (config["recommendations_file"], json.dumps({
+            "critics": [{"critic": r["critic"], "recommendations": r["recommendations"],
+                         "error_message": r["error_message"]} for r in critic_results],
+            "excluded_members": excluded,
+        }, indent=4)),
+        (config["rationale_file"], (
+            f"{target.capitalize()} forecast revised by the critique stage.\n"
+            f"{len(critic_results)} critic(s) reviewed {len(raw_predictions)} ensemble members.\n"
+            f"Members excluded (flagged by at least {MIN_CRITIC_AGREEMENT:.0%} of responding critics): "
+            f"{excluded if excluded else 'none'}.\n"
+            f"Revised forecast is based on {final_data.get('number_of_valid_forecasts')} forecasts: "
+            f"{final_data.get('individual_valid_forecasts')}.\n")),
+    ]
+    for path, content in outputs:
+        try:
+            with open(path, 'w') as f:
+                f.write(content)
+            print(f"Saved {path}")
+        except Exception as e:
+            print(f"Error saving {path}: {e}")
+    run_registry.record_final(target, final_data, kind="revision", config={"excluded_members": excluded})
+    return final_data
+
+def run_critique_stage(targets=None, critic_models=None):
+    """
+    Critiques and revises every target in one pass, running all (target, critic) requests
+    concurrently, then feeds each critic's structured recommendations into the aggregation step.
+    """
+    load_dotenv(dotenv_path=".env")
+    targets = targets or list(TARGETS)
+    critic_models = critic_models or CRITIC_MODELS
+
+    raw_by_target = {}
+    jobs = []
+    for target in targets:
+        config = TARGETS[target]
+        try:
+            with open(config["raw_predictions_file"], 'r') as f:
+                raw_predictions = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            print(f"Error: Could not load {config['raw_predictions_file']} for {target}: {e}")
+            continue
+        raw_by_target[target] = raw_predictions
+        initial_final = config["aggregate"](raw_predictions)
+        prompt = config["build_prompt"](json.dumps(initial_final, indent=4)) + \
+            STRUCTURED_RECOMMENDATION_INSTRUCTIONS.format(member_lines=format_member_lines(raw_predictions))
+        for critic in critic_models:
+            api_key = os.getenv(API_KEY_ENV[critic["provider"]])
+            if not api_key:
+                print(f"Warning: {API_KEY_ENV[critic['provider']]} not found. Skipping critic {critic['model_name']}.")
+                continue
+            jobs.append((target, critic, api_key, prompt))
+
+    if not jobs:
+        print("Error: No critique requests could be made.")
+        return
+    results = asyncio.run(run_all_critics(jobs))
+
+    for target, raw_predictions in raw_by_target.items():
+        critic_results = [r for job, r in zip(jobs, results) if job[0] == target]
+        if critic_results:
+            revise_target(target, TARGETS[target], raw_predictions, critic_results)
+
+def main(targets=None, critics=None):
+    critic_models = None
+    if critics:
+        # "provider:model_name", e.g. "anthropic:claude-3-opus-20240229"
+        critic_models = []
+        for critic in critics:
+            provider, _, model_name = critic.partition(":")
+            if not model_name or provider not in API_KEY_ENV:
+                print(f"Error: Invalid critic '{critic}'; expected provider:model_name with provider one of "
+                      f"{', '.join(API_KEY_ENV)}.")
+                return
+            critic_models.append({"provider": provider, "model_name": model_name})
+    run_critique_stage(targets=targets, critic_models=critic_models)
+
+if __name__ == "__main__":
+    main()
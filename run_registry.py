@@ -0,0 +1,396 @@
+import os
+import json
+import zlib
+import sqlite3
+import hashlib
+import subprocess
+from datetime import datetime, timezone
+
+# Embedded SQLite registry of every ensemble, evaluation and aggregation run, so history survives
+# the flat files being overwritten and runs can be compared with SQL instead of loading JSON blobs.
+#   runs        - one row per run (kind, target, time, git commit, config, final output)
+#   prompts     - each distinct prompt text once, keyed by its SHA-256, zlib-compressed
+#   calls       - one row per ensemble member / evaluation call, with the parsed forecast
+#   responses   - the raw response text of a call, zlib-compressed
+#   evaluations - forecast vs ground truth per prompt and period
+# The flat files (hotel_preds_raw.json, trump_prompt_eval_details.json, *_final.json) can be
+# re-exported from any recorded run. Recording never breaks a pipeline step: failures only warn.
+
+REGISTRY_DB = "run_registry.sqlite"
+COMPRESSION_LEVEL = 6
+# Keys of a raw prediction entry stored in their own columns; any other keys (e.g. low, high,
+# data_file) go to calls.extra_json so exports reproduce the entry exactly.
+CALL_COLUMNS = ["provider", "model_name", "temperature", "extracted_forecast", "error_message"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    target TEXT,
+    created_at TEXT NOT NULL,
+    git_commit TEXT,
+    config_json TEXT,
+    output_json TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_kind_target ON runs (kind, target, created_at);
+
+CREATE TABLE IF NOT EXISTS prompts (
+    id INTEGER PRIMARY KEY,
+    sha256 TEXT NOT NULL UNIQUE,
+    prompt_file TEXT,
+    text BLOB NOT NULL,
+    created_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    prompt_id INTEGER REFERENCES prompts (id),
+    prompt_file TEXT,
+    provider TEXT,
+    model_name TEXT,
+    temperature REAL,
+    extracted_forecast REAL,
+    error_message TEXT,
+    latency_ms REAL,
+    extra_json TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS calls_run ON calls (run_id);
+CREATE INDEX IF NOT EXISTS calls_model ON calls (provider, model_name, created_at);
+
+CREATE TABLE IF NOT EXISTS responses (
+    call_id INTEGER PRIMARY KEY REFERENCES calls (id),
+    body BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS evaluations (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    call_id INTEGER REFERENCES calls (id),
+    prompt_id INTEGER REFERENCES prompts (id),
+    prompt_file TEXT,
+    target TEXT,
+    period TEXT,
+    ground_truth REAL,
+    forecast REAL,
+    abs_error REAL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS evaluations_run ON evaluations (run_id);
+CREATE INDEX IF NOT EXISTS evaluations_prompt ON evaluations (prompt_id, created_at);
+
+-- Per-prompt, per-day error sums kept up to date by a trigger, so "MAE by prompt over the last
+-- N days" reads at most prompts x N rows however many evaluations have been recorded.
+CREATE TABLE IF NOT EXISTS evaluation_daily (
+    prompt_id INTEGER NOT NULL,
+    target TEXT NOT NULL,
+    day TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    abs_error_sum REAL NOT NULL,
+    PRIMARY KEY (day, target, prompt_id)
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS evaluations_daily_rollup AFTER INSERT ON evaluations
+WHEN NEW.abs_error IS NOT NULL AND NEW.prompt_id IS NOT NULL
+BEGIN
+    INSERT INTO evaluation_daily (prompt_id, target, day, n, abs_error_sum)
+    VALUES (NEW.prompt_id, COALESCE(NEW.target, ''), date(NEW.created_at), 1, NEW.abs_error)
+    ON CONFLICT (day, target, prompt_id) DO UPDATE SET n = n + 1, abs_error_sum = abs_error_sum + excluded.abs_error_sum;
+END;
+
+CREATE VIEW IF NOT EXISTS v_calls AS
+    SELECT c.id AS call_id, r.id AS run_id, r.kind, r.target, c.created_at, c.provider, c.model_name,
+           c.temperature, c.prompt_file, p.sha256 AS prompt_sha256, c.extracted_forecast, c.error_message,
+           c.latency_ms
+    FROM calls c JOIN runs r ON r.id = c.run_id LEFT JOIN prompts p ON p.id = c.prompt_id;
+
+CREATE VIEW IF NOT EXISTS v_evaluations AS
+    SELECT e.id AS evaluation_id, e.run_id, e.target, e.created_at, e.period, e.prompt_file,
+           p.sha256 AS prompt_sha256, e.ground_truth, e.forecast, e.abs_error
+    FROM evaluations e LEFT JOIN prompts p ON p.id = e.prompt_id;
+"""
+
+def _now():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+def compress(text):
+    return zlib.compress(text.encode("utf-8"), COMPRESSION_LEVEL)
+
+def decompress(blob):
+    return zlib.decompress(blob).decode("utf-8") if blob is not None else None
+
+def connect(db_path=REGISTRY_DB):
+    """Opens (creating if needed) the registry. The connection has a decompress() SQL function."""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.create_function("decompress", 1, decompress, deterministic=True)
+    conn.executescript(SCHEMA)
+    return conn
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=False).stdout.strip() or None
+    except OSError:
+        return None
+
+def prompt_id(conn, text, prompt_file=None):
+    """Id of the prompt with this exact text, inserting it (compressed) the first time it is seen."""
+    if text is None:
+        return None
+    sha = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    row = conn.execute("SELECT id FROM prompts WHERE sha256 = ?", (sha,)).fetchone()
+    if row:
+        return row["id"]
+    return conn.execute("INSERT INTO prompts (sha256, prompt_file, text, created_at) VALUES (?, ?, ?, ?)",
+                        (sha, prompt_file, compress(text), _now())).lastrowid
+
+def start_run(conn, kind, target=None, config=None, created_at=None):
+    return conn.execute("INSERT INTO runs (kind, target, created_at, git_commit, config_json) VALUES (?, ?, ?, ?, ?)",
+                        (kind, target, created_at or _now(), _git_commit(),
+                         json.dumps(config) if config is not None else None)).lastrowid
+
+def add_call(conn, run_id, entry, prompt_text=None, created_at=None):
+    """Stores one raw prediction entry (the dicts in *_preds_raw.json) and its response; returns the call id."""
+    extra = {k: v for k, v in entry.items()
+             if k not in CALL_COLUMNS and k not in ("prompt_file", "raw_response", "latency_ms")}
+    call_id = conn.execute(
+        "INSERT INTO calls (run_id, prompt_id, prompt_file, provider, model_name, temperature, extracted_forecast, "
+        "error_message, latency_ms, extra_json, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (run_id, prompt_id(conn, prompt_text, entry.get("prompt_file")), entry.get("prompt_file"),
+         *(entry.get(k) for k in CALL_COLUMNS), entry.get("latency_ms"),
+         json.dumps(extra) if extra else None, created_at or _now())).lastrowid
+    if entry.get("raw_response") is not None:
+        conn.execute("INSERT INTO responses (call_id, body) VALUES (?, ?)", (call_id, compress(entry["raw_response"])))
+    return call_id
+
+def _read_prompt(prompt_file):
+    if prompt_file and os.path.exists(prompt_file):
+        with open(prompt_file, 'r') as f:
+            return f.read()
+    return None
+
+def record_predictions(kind, target, entries, config=None, db_path=REGISTRY_DB):
+    """
+    Records a run of raw prediction entries (an ensemble, gated or statistical run). Prompt texts
+    are read from each entry's prompt_file. Returns the run id, or None if recording failed.
+    """
+    try:
+        with connect(db_path) as conn:
+            run_id = start_run(conn, kind, target, config)
+            prompts = {}
+            for entry in entries:
+                prompt_file = entry.get("prompt_file")
+                if prompt_file not in prompts:
+                    prompts[prompt_file] = _read_prompt(prompt_file)
+                add_call(conn, run_id, entry, prompts[prompt_file])
+        return run_id
+    except sqlite3.Error as e:
+        print(f"Warning: Could not record the {target} {kind} run in {db_path}: {e}")
+        return None
+
+def record_evaluations(target, evaluations, config=None, db_path=REGISTRY_DB):
+    """
+    Records a prompt evaluation run. Each evaluation is a dict with prompt_file, prompt_text,
+    period, ground_truth and forecast, and optionally the call it came from (an entry dict
+    under "call"). Returns the run id, or None if recording failed.
+    """
+    try:
+        with connect(db_path) as conn:
+            run_id = start_run(conn, "evaluation", target, config)
+            for evaluation in evaluations:
+                call_id = None
+                if evaluation.get("call"):
+                    call_id = add_call(conn, run_id, evaluation["call"], evaluation.get("prompt_text"))
+                forecast, truth = evaluation.get("forecast"), evaluation.get("ground_truth")
+                conn.execute(
+                    "INSERT INTO evaluations (run_id, call_id, prompt_id, prompt_file, target, period, ground_truth, "
+                    "forecast, abs_error, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (run_id, call_id, prompt_id(conn, evaluation.get("prompt_text"), evaluation.get("prompt_file")),
+                     evaluation.get("prompt_file"), target, evaluation.get("period"), truth, forecast,
+                     abs(forecast - truth) if forecast is not None and truth is not None else None, _now()))
+        return run_id
+    except sqlite3.Error as e:
+        print(f"Warning: Could not record the {target} evaluation run in {db_path}: {e}")
+        return None
+
+def record_final(target, final_data, kind="aggregate", config=None, db_path=REGISTRY_DB):
+    """Records an aggregated forecast (the *_final.json dict). Returns the run id, or None if recording failed."""
+    try:
+        with connect(db_path) as conn:
+            run_id = start_run(conn, kind, target, config)
+            conn.execute("UPDATE runs SET output_json = ? WHERE id = ?", (json.dumps(final_data), run_id))
+        return run_id
+    except sqlite3.Error as e:
+        print(f"Warning: Could not record the {target} {kind} in {db_path}: {e}")
+        return None
+
+# --- Queries and exports ---
+
+def list_runs(kind=None, target=None, limit=20, db_path=REGISTRY_DB):
+    with connect(db_path) as conn:
+        rows = conn.execute(
+            "SELECT r.id, r.kind, r.target, r.created_at, r.git_commit, COUNT(c.id) AS calls FROM runs r "
+            "LEFT JOIN calls c ON c.run_id = r.id WHERE (? IS NULL OR r.kind = ?) AND (? IS NULL OR r.target = ?) "
+            "GROUP BY r.id ORDER BY r.id DESC LIMIT ?", (kind, kind, target, target, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+def latest_run_id(conn, kinds, target):
+    placeholders = ",".join("?" * len(kinds))
+    row = conn.execute(f"SELECT id FROM runs WHERE kind IN ({placeholders}) AND target = ? ORDER BY id DESC LIMIT 1",
+                       (*kinds, target)).fetchone()
+    return row["id"] if row else None
+
+def mae_by_prompt(days=90, target=None, db_path=REGISTRY_DB):
+    """
+    Mean absolute error and evaluation count per prompt over the last `days` days (whole days,
+    today included), best first. Reads the evaluation_daily rollup, not the evaluations themselves.
+    """
+    with connect(db_path) as conn:
+        rows = conn.execute(
+            "SELECT p.prompt_file, p.sha256, SUM(d.n) AS evaluations, SUM(d.abs_error_sum) / SUM(d.n) AS mae "
+            "FROM evaluation_daily d JOIN prompts p ON p.id = d.prompt_id "
+            "WHERE d.day > date('now', ?) AND (? IS NULL OR d.target = ?) "
+            "GROUP BY d.prompt_id ORDER BY mae", (f"-{int(days)} days", target, target)).fetchall()
+    return [dict(row) for row in rows]
+
+def run_entries(conn, run_id):
+    """The raw prediction entries of a run, as they appear in *_preds_raw.json."""
+    rows = conn.execute(
+        "SELECT c.*, decompress(r.body) AS raw_response FROM calls c LEFT JOIN responses r ON r.call_id = c.id "
+        "WHERE c.run_id = ? ORDER BY c.id", (run_id,)).fetchall()
+    entries = []
+    for row in rows:
+        entry = {"provider": row["provider"], "model_name": row["model_name"], "temperature": row["temperature"],
+                 "prompt_file": row["prompt_file"], "raw_response": row["raw_response"],
+                 "extracted_forecast": row["extracted_forecast"], "error_message": row["error_message"]}
+        if row["latency_ms"] is not None:
+            entry["latency_ms"] = row["latency_ms"]
+        entry.update(json.loads(row["extra_json"] or "{}"))
+        entries.append(entry)
+    return entries
+
+def export_run(target, kind="predictions", run_id=None, output_file=None, db_path=REGISTRY_DB):
+    """
+    Writes a recorded run back out in its flat-file format:
+      predictions - the latest ensemble or gated run, as <target>_preds_raw.json
+      statistical - the latest statistical members alone, as <target>_statistical_preds.json
+      evaluation  - the latest evaluation run, as <target>_prompt_eval_details.json
+      final       - the latest aggregate, as <target>_final.json
+    run_id picks a specific run instead of the latest.
+    """
+    kinds = {"predictions": ("ensemble", "gated"), "statistical": ("statistical",), "evaluation": ("evaluation",),
+             "final": ("aggregate", "revision")}[kind]
+    default_file = {"predictions": f"{target}_preds_raw.json", "statistical": f"{target}_statistical_preds.json",
+                    "evaluation": f"{target}_prompt_eval_details.json", "final": f"{target}_final.json"}[kind]
+    with connect(db_path) as conn:
+        run_id = run_id or latest_run_id(conn, kinds, target)
+        if run_id is None:
+            print(f"Error: No recorded {kind} run for {target} in {db_path}.")
+            return None
+        if kind in ("predictions", "statistical"):
+            data = run_entries(conn, run_id)
+        elif kind == "final":
+            data = json.loads(conn.execute("SELECT output_json FROM runs WHERE id = ?", (run_id,)).fetchone()[0])
+        else:
+            rows = conn.execute(
+                "SELECT e.*, decompress(p.text) AS prompt_text, decompress(r.body) AS raw_response, c.error_message "
+                "FROM evaluations e LEFT JOIN prompts p ON p.id = e.prompt_id LEFT JOIN calls c ON c.id = e.call_id "
+                "LEFT JOIN responses r ON r.call_id = e.call_id WHERE e.run_id = ? ORDER BY e.id", (run_id,)).fetchall()
+            data = [{"prompt_file": row["prompt_file"], "backtest_period": row["period"],
+                     "ground_truth": row["ground_truth"], "modified_prompt_sent": row["prompt_text"],
+                     "raw_response": row["raw_response"], "extracted_forecast": row["forecast"],
+                     "mae": round(row["abs_error"], 2) if row["abs_error"] is not None else None,
+                     "api_error": row["error_message"]} for row in rows]
+    output_file = output_file or default_file
+    with open(output_file, 'w') as f:
+        json.dump(data, f, indent=4)
+    print(f"Exported {kind} run {run_id} for {target} to {output_file}")
+    return output_file
+
+def evaluations_from_details(details, model_name=None, temperature=None):
+    """Converts trump_prompt_eval_details.json entries into record_evaluations() input."""
+    return [
+        {"prompt_file": d.get("prompt_file"), "prompt_text": d.get("modified_prompt_sent"),
+         "period": d.get("backtest_period"), "ground_truth": d.get("ground_truth"),
+         "forecast": d.get("extracted_forecast"),
+         "call": {"provider": "openai", "model_name": model_name, "temperature": temperature,
+                  "prompt_file": d.get("prompt_file"), "raw_response": d.get("raw_response"),
+                  "extracted_forecast": d.get("extracted_forecast"), "error_message": d.get("api_error")}
+         if d.get("modified_prompt_sent") else None}
+        for d in details]
+
+def import_existing_files(db_path=REGISTRY_DB):
+    """Backfills the registry from the flat files currently in the working directory."""
+    for target in ("hotel", "trump"):
+        preds_file = f"{target}_preds_raw.json"
+        if os.path.exists(preds_file):
+            with open(preds_file, 'r') as f:
+                record_predictions("ensemble", target, json.load(f), {"imported_from": preds_file}, db_path)
+        final_file = f"{target}_final.json"
+        if os.path.exists(final_file):
+            with open(final_file, 'r') as f:
+                record_final(target, json.load(f), config={"imported_from": final_file}, db_path=db_path)
+    if os.path.exists("trump_prompt_eval_details.json"):
+        from evaluate_trump_prompts import MODEL_TO_USE, TEMPERATURE
+        with open("trump_prompt_eval_details.json", 'r') as f:
+            details = json.load(f)
+        # The details file doesn't name its model; it is written by evaluate_trump_prompts.py.
+        record_evaluations("trump", evaluations_from_details(details, MODEL_TO_USE, TEMPERATURE),
+                           {"imported_from": "trump_prompt_eval_details.json"}, db_path)
+    if os.path.exists("hotel_prompt_eval.csv"):
+        import csv
+        with open("hotel_prompt_eval.csv", 'r', newline='') as f:
+            rows = list(csv.DictReader(f))
+
+        def number(value):
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return None
+        record_evaluations("hotel", [
+            {"prompt_file": r["prompt_file"], "prompt_text": _read_prompt(r["prompt_file"]),
+             "period": r["backtest_target_period"], "ground_truth": number(r["ground_truth_rating"]),
+             "forecast": number(r["llm_forecast"])} for r in rows], {"imported_from": "hotel_prompt_eval.csv"}, db_path)
+    for run in list_runs(limit=10, db_path=db_path):
+        print(f"  run {run['id']}: {run['kind']} {run['target']} ({run['calls']} calls)")
+
+def print_mae_by_prompt(days=90, target=None, db_path=REGISTRY_DB):
+    rows = mae_by_prompt(days, target, db_path)
+    if not rows:
+        print(f"No evaluations in the last {days} days.")
+    for row in rows:
+        print(f"{row['prompt_file'] or row['sha256'][:12]:>32}  MAE {row['mae']:.3f} over {row['evaluations']} evaluations")
+    return rows
+
+def benchmark_registry(n_evaluations=200_000, n_prompts=50, db_path=None):
+    """Fills a scratch registry with synthetic evaluations and times the MAE-by-prompt query."""
+    import time
+    import random
+    import tempfile
+    from datetime import timedelta
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = db_path or os.path.join(tmp, "registry.sqlite")
+        with connect(db_path) as conn:
+            run_id = start_run(conn, "evaluation", "synthetic")
+            prompt_ids = [prompt_id(conn, f"synthetic prompt {i}", f"prompt_{i}.txt") for i in range(n_prompts)]
+            now = datetime.now(timezone.utc)
+            conn.executemany(
+                "INSERT INTO evaluations (run_id, prompt_id, prompt_file, target, period, ground_truth, forecast, "
+                "abs_error, created_at) VALUES (?, ?, ?, 'synthetic', NULL, 0, ?, ?, ?)",
+                ((run_id, pid, f"prompt_{pid}.txt", err, abs(err),
+                  (now - timedelta(days=rng.uniform(0, 365))).strftime("%Y-%m-%d %H:%M:%S"))
+                 for pid, err in ((rng.choice(prompt_ids), rng.gauss(0, 2)) for _ in range(n_evaluations))))
+        mae_by_prompt(90, db_path=db_path)  # Warm the page cache
+        start = time.perf_counter()
+        rows = mae_by_prompt(90, db_path=db_path)
+        elapsed = time.perf_counter() - start
+    print(f"MAE by prompt over the last 90 days: {len(rows)} prompts from {n_evaluations:,} evaluations "
+          f"in {elapsed * 1000:.1f} ms.")
+    return elapsed
+
+if __name__ == "__main__":
+    import_existing_files()
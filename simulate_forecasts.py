@@ -0,0 +1,339 @@
+import os
+import json
+import run_registry
+from statistical_forecasts import (COUNT_WINDOW_DAYS, SINGLE_SERIES_ID, forecast_dates, load_post_count_matrix,
+                                   load_rating_matrices, read_prior_mean_rating, review_rating_variance, shrinkage_mean)
+
+# Monte Carlo predictive distributions for the forecast period, drawn with NumPy for many targets at once.
+#   - Each draw first picks the target's level: from the ensemble members (normal around their mean with
+#     their spread) with probability ENSEMBLE_WEIGHT, otherwise from the statistical fit (normal around
+#     its estimate with its standard error).
+#   - Posts: the period's total is then drawn from the fitted count model around that level, Poisson or
+#     (where the recent counts are overdispersed) negative binomial as a gamma-Poisson mixture.
+#   - Ratings: the number of reviews in the period is Poisson, and each review's stars come from the
+#     series' star mixture (rating shares over 1-5 stars), shifted to the drawn level. Periods with at
+#     most EXACT_REVIEW_DRAWS reviews draw their exact star total; busier ones use the normal limit of
+#     their mean. As draws are exchangeable, review counts and star totals are drawn per series as
+#     multinomial counts rather than one by one.
+#   - Draws are (targets x draws) arrays generated CHUNK_ELEMENTS at a time, in parallel processes, so
+#     thousands of targets x SIMULATION_DRAWS draws run in seconds within bounded memory. Quantiles come
+#     from per-target histograms of the draws (integer post totals, 0.001-star rating bins), not sorts.
+# The quantiles and central intervals are added to *_final.json as "predictive_distribution".
+
+SIMULATION_DRAWS = 100_000
+SIMULATION_SEED = 0
+QUANTILES = [0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95]
+INTERVALS = {"50%": (0.25, 0.75), "80%": (0.1, 0.9), "90%": (0.05, 0.95)}
+ENSEMBLE_WEIGHT = 0.5
+EXACT_REVIEW_DRAWS = 4
+CHUNK_ELEMENTS = 4_000_000
+RATING_GRID = 1000     # Rating quantiles are read off a histogram with 0.001-star bins
+STARS = 5
+
+def member_spread(forecasts):
+    """(mean, standard deviation) of the ensemble member forecasts, or (NaN, NaN) without any."""
+    import numpy as np
+    forecasts = np.asarray(forecasts, dtype=float)
+    if len(forecasts) == 0:
+        return np.nan, np.nan
+    return forecasts.mean(), forecasts.std(ddof=1) if len(forecasts) > 1 else 0.0
+
+def _level_weights(ensemble_mean, ensemble_sd, weight):
+    import numpy as np
+    ensemble_mean = np.asarray(ensemble_mean, dtype=float)
+    available = ~np.isnan(ensemble_mean)
+    return (np.where(available, weight, 0.0), np.where(available, ensemble_mean, 0.0),
+            np.where(available, np.nan_to_num(np.asarray(ensemble_sd, dtype=float)), 0.0))
+
+def post_count_model(Y, n_days, ensemble_mean=None, ensemble_sd=None, weight=ENSEMBLE_WEIGHT, window=COUNT_WINDOW_DAYS):
+    """
+    Per-series simulation parameters for the average daily posts over n_days: the recent mean and its
+    standard error, the negative binomial dispersion r (inf for Poisson series, as in
+    statistical_forecasts.count_model) and the ensemble level. ensemble_mean/sd may be NaN per series.
+    """
+    import numpy as np
+    recent = Y[:, -window:]
+    mean = recent.mean(axis=1)
+    var = recent.var(axis=1, ddof=1) if recent.shape[1] > 1 else mean
+    overdispersed = var > mean * 1.0001
+    nan = np.full(len(Y), np.nan)
+    weights, level_mean, level_sd = _level_weights(nan if ensemble_mean is None else ensemble_mean,
+                                                   nan if ensemble_sd is None else ensemble_sd, weight)
+    return {
+        "stat_mean": mean,
+        "stat_se": np.sqrt(np.maximum(var, mean) / recent.shape[1]),
+        "r": np.where(overdispersed, mean ** 2 / np.where(overdispersed, var - mean, 1.0), np.inf),
+        "ensemble_weight": weights,
+        "ensemble_mean": level_mean,
+        "ensemble_sd": level_sd,
+        "n_days": np.full(len(Y), float(n_days)),
+    }
+
+def star_mixture(counts, rating_sums, prior_strength):
+    """
+    Share of reviews at each of 1-5 stars per series. A day's mean rating is split between the two
+    star values around it (4.3 from 10 reviews counts as 7 four-star and 3 five-star reviews), and the
+    shares are shrunk towards the pooled shares with the weight of prior_strength reviews.
+    """
+    import numpy as np
+    day_means = np.clip(np.divide(rating_sums, counts, out=np.ones_like(rating_sums), where=counts > 0), 1, STARS)
+    lower = np.minimum(np.floor(day_means), STARS - 1)
+    upper_share = day_means - lower
+    histogram = np.stack([(counts * ((lower == s) * (1 - upper_share) + (lower == s - 1) * upper_share)).sum(axis=1)
+                          for s in range(1, STARS + 1)], axis=1)
+    pooled = histogram.sum(axis=0)
+    pooled = pooled / pooled.sum() if pooled.sum() > 0 else np.full(STARS, 1 / STARS)
+    return (histogram + prior_strength * pooled) / (histogram.sum(axis=1, keepdims=True) + prior_strength)
+
+def rating_model(counts, rating_sums, n_days, prior_mean=None, ensemble_mean=None, ensemble_sd=None,
+                 weight=ENSEMBLE_WEIGHT):
+    """
+    Per-series simulation parameters for the mean rating over n_days: the shrinkage mean and its
+    standard error, the expected number of reviews, and the cumulative star mixture with its mean and
+    variance. ensemble_mean/sd may be NaN per series.
+    """
+    import numpy as np
+    shrunk, _, n, k = shrinkage_mean(counts, rating_sums, prior_mean)
+    within = review_rating_variance(counts, rating_sums)
+    shares = star_mixture(counts, rating_sums, k)
+    stars = np.arange(1, STARS + 1)
+    star_mean = shares @ stars
+    nan = np.full(len(counts), np.nan)
+    weights, level_mean, level_sd = _level_weights(nan if ensemble_mean is None else ensemble_mean,
+                                                   nan if ensemble_sd is None else ensemble_sd, weight)
+    return {
+        "stat_mean": shrunk,
+        "stat_se": np.sqrt(within / (n + k)),
+        "expected_reviews": n / counts.shape[1] * n_days,
+        "star_cdf": np.cumsum(shares, axis=1)[:, :-1],
+        "star_mean": star_mean,
+        "star_var": shares @ stars ** 2 - star_mean ** 2,
+        "ensemble_weight": weights,
+        "ensemble_mean": level_mean,
+        "ensemble_sd": level_sd,
+    }
+
+def draw_levels(model, n_draws, rng):
+    """(series x draws) levels from the ensemble/statistical mixture, independent of the draw's position."""
+    import numpy as np
+    shape = (len(model["stat_mean"]), n_draws)
+    from_ensemble = rng.random(shape, dtype=np.float32) < model["ensemble_weight"][:, None]
+    centre = np.where(from_ensemble, model["ensemble_mean"][:, None].astype(np.float32),
+                      model["stat_mean"][:, None].astype(np.float32))
+    spread = np.where(from_ensemble, model["ensemble_sd"][:, None].astype(np.float32),
+                      model["stat_se"][:, None].astype(np.float32))
+    return centre + spread * rng.standard_normal(shape, dtype=np.float32)
+
+def draw_post_counts(model, n_draws, rng):
+    """(series x draws) total posts over the period's n_days."""
+    import numpy as np
+    level = np.maximum(draw_levels(model, n_draws, rng), 0)
+    n_days = model["n_days"][:, None].astype(np.float32)
+    negative_binomial = np.isfinite(model["r"])
+    if not negative_binomial.any():
+        return rng.poisson(n_days * level)
+    # Sum of n iid NB(r, level) counts: Poisson with a Gamma(n * r, level / r) rate.
+    r = np.where(negative_binomial, model["r"], 1.0)[:, None]
+    gamma = rng.standard_gamma(np.broadcast_to(n_days * r, level.shape), dtype=np.float32)
+    return rng.poisson(np.where(negative_binomial[:, None], gamma * level / r.astype(np.float32), n_days * level))
+
+def poisson_pmf(rates, k_max):
+    """(series x k_max + 1) Poisson probabilities of 0..k_max, the tail beyond k_max added to k_max."""
+    import numpy as np
+    k = np.arange(k_max + 1)
+    log_factorial = np.concatenate([[0.0], np.cumsum(np.log(k[1:]))])
+    with np.errstate(divide="ignore"):
+        pmf = np.exp(k * np.log(rates[:, None]) - rates[:, None] - log_factorial)
+    pmf[rates == 0, 0] = 1.0
+    pmf[:, -1] += np.clip(1 - pmf.sum(axis=1), 0, None)
+    return pmf / pmf.sum(axis=1, keepdims=True)
+
+def draw_ratings(model, n_draws, rng):
+    """
+    (series x draws) mean rating of the reviews posted over the period (at least one review).
+    Draws are exchangeable, so instead of drawing each one's review count and stars, each row draws
+    how many of its draws get n reviews (and, for up to EXACT_REVIEW_DRAWS reviews, each star total)
+    from a multinomial, and lays them out in order; the levels are independent of the position.
+    """
+    import numpy as np
+    level = draw_levels(model, n_draws, rng)
+    rows = len(level)
+    rates = model["expected_reviews"]
+    k_max = max(int(np.ceil(rates.max() + 10 * np.sqrt(rates.max()))) + 10, EXACT_REVIEW_DRAWS + 1)
+    review_pmf = poisson_pmf(rates, k_max)
+    review_pmf[:, 1] += review_pmf[:, 0]
+    review_pmf[:, 0] = 0
+    draws_with = rng.multinomial(n_draws, review_pmf)
+    n_reviews = np.repeat(np.tile(np.arange(k_max + 1), rows), draws_with.ravel()).reshape(rows, n_draws)
+
+    # Exact mean stars for draws with 1..EXACT_REVIEW_DRAWS reviews: the star total of n reviews has
+    # the n-fold convolution of the star mixture as its distribution.
+    shares = np.diff(np.concatenate([np.zeros((rows, 1)), model["star_cdf"], np.ones((rows, 1))], axis=1), axis=1)
+    values, counts, total_pmf = [], [], np.ones((rows, 1))
+    for n in range(1, EXACT_REVIEW_DRAWS + 1):
+        total_pmf = sum(np.pad(total_pmf, ((0, 0), (s, STARS - 1 - s))) * shares[:, [s]] for s in range(STARS))
+        total_pmf = np.clip(total_pmf, 0, None) / total_pmf.sum(axis=1, keepdims=True)
+        values.append(np.broadcast_to(np.arange(n, n * STARS + 1) / n, total_pmf.shape))
+        counts.append(rng.multinomial(draws_with[:, n], total_pmf))
+    # The remaining draws (more reviews) take the normal limit of their mean.
+    values.append(np.full((rows, 1), np.nan))
+    counts.append(n_draws - draws_with[:, :EXACT_REVIEW_DRAWS + 1].sum(axis=1, keepdims=True))
+    review_mean = np.repeat(np.concatenate(values, axis=1).ravel(),
+                            np.concatenate(counts, axis=1).ravel()).reshape(rows, n_draws).astype(np.float32)
+    star_mean = model["star_mean"][:, None].astype(np.float32)
+    many = n_reviews > EXACT_REVIEW_DRAWS
+    if many.any():
+        limit = star_mean + np.sqrt(model["star_var"][:, None].astype(np.float32) / n_reviews) \
+            * rng.standard_normal(level.shape, dtype=np.float32)
+        review_mean = np.where(many, limit, review_mean)
+    return np.clip(level + review_mean - star_mean, 1, STARS)
+
+def binned_quantiles(bins, n_bins, quantiles=QUANTILES):
+    """
+    Quantiles (as bin numbers) of each row of non-negative integer bins, from a per-row histogram:
+    a bincount and a cumulative sum instead of a sort of every row.
+    """
+    import numpy as np
+    rows, n_draws = bins.shape
+    offsets = (np.arange(rows) * n_bins)[:, None]
+    cdf = np.bincount((bins + offsets).ravel(), minlength=rows * n_bins).reshape(rows, n_bins).cumsum(axis=1)
+    ranks = np.ceil(np.asarray(quantiles) * n_draws)
+    return np.stack([(cdf < rank).sum(axis=1) for rank in ranks])
+
+def _simulate_chunk(kind, model, n_draws, seed_sequence):
+    import numpy as np
+    rng = np.random.default_rng(seed_sequence)
+    if kind == "posts":
+        totals = draw_post_counts(model, n_draws, rng)
+        return totals.mean(axis=1) / model["n_days"], binned_quantiles(totals, int(totals.max()) + 1) / model["n_days"]
+    ratings = draw_ratings(model, n_draws, rng)
+    bins = np.rint((ratings - 1) * RATING_GRID).astype(np.int64)
+    return ratings.mean(axis=1), 1 + binned_quantiles(bins, (STARS - 1) * RATING_GRID + 1) / RATING_GRID
+
+def simulate(kind, model, n_draws=SIMULATION_DRAWS, seed=SIMULATION_SEED, chunk_elements=CHUNK_ELEMENTS, workers=None):
+    """
+    Draws n_draws period outcomes per series (kind "posts": average daily posts, "ratings": mean
+    rating), a chunk of series at a time, spread over `workers` processes (all CPUs by default).
+    Each chunk has its own random stream spawned from seed, so the result doesn't depend on workers.
+    Returns (mean, quantiles) with quantiles shaped (len(QUANTILES), series); rating quantiles are
+    on a 1 / RATING_GRID grid.
+    """
+    import numpy as np
+    n_series = len(model["stat_mean"])
+    chunk = max(1, chunk_elements // n_draws)
+    starts = range(0, n_series, chunk)
+    jobs = [(kind, {key: value[lo:lo + chunk] for key, value in model.items()}, n_draws, seed_sequence)
+            for lo, seed_sequence in zip(starts, np.random.SeedSequence(seed).spawn(len(starts)))]
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_simulate_chunk, *zip(*jobs)))
+    else:
+        results = [_simulate_chunk(*job) for job in jobs]
+    return (np.concatenate([means for means, _ in results]),
+            np.concatenate([quantiles for _, quantiles in results], axis=1))
+
+def distribution_summary(mean, quantiles, n_draws, seed):
+    """The "predictive_distribution" entry of a *_final.json for one series (quantiles as one column)."""
+    values = dict(zip(QUANTILES, (round(float(q), 2) for q in quantiles)))
+    return {
+        "method": (f"Monte Carlo, {n_draws} draws (seed {seed}): level from the ensemble members "
+                   f"({ENSEMBLE_WEIGHT:.0%} of draws) or the statistical fit, period outcome from the fitted "
+                   f"count / star-mixture model"),
+        "mean": round(float(mean), 2),
+        "quantiles": {f"{q:g}": v for q, v in values.items()},
+        "intervals": {name: [values[lo], values[hi]] for name, (lo, hi) in INTERVALS.items()},
+    }
+
+def _valid_member_forecasts(final_data):
+    forecasts = final_data.get("individual_valid_forecasts") or []
+    return [f for f in forecasts if isinstance(f, (int, float))]
+
+def simulate_forecasts(targets=("trump", "hotel"), n_draws=SIMULATION_DRAWS, seed=SIMULATION_SEED,
+                       forecast_start=None, forecast_end=None,
+                       trump_daily_csv="trump_posts_daily.csv", hotel_daily_csv="hotel_daily_metrics.csv",
+                       trump_final_file="trump_final.json", hotel_final_file="hotel_final.json",
+                       baseline_file="hotel_baseline.txt"):
+    """
+    Adds quantiles and 50/80/90% intervals to each target's *_final.json. Run it after aggregation
+    (or the critique stage), which rewrite those files.
+    """
+    start, end = forecast_dates(forecast_start, forecast_end)
+    n_days = (end - start).days + 1
+    for target, daily_csv, final_file in (("trump", trump_daily_csv, trump_final_file),
+                                          ("hotel", hotel_daily_csv, hotel_final_file)):
+        if target not in targets:
+            continue
+        missing = [path for path in (daily_csv, final_file) if not os.path.exists(path)]
+        if missing:
+            print(f"Error: {', '.join(missing)} not found; skipping the {target} simulation.")
+            continue
+        with open(final_file, 'r') as f:
+            final_data = json.load(f)
+        ensemble_mean, ensemble_sd = member_spread(_valid_member_forecasts(final_data))
+        if target == "trump":
+            series_ids, _, Y = load_post_count_matrix(daily_csv)
+            model = post_count_model(Y, n_days, [ensemble_mean], [ensemble_sd])
+            kind = "posts"
+        else:
+            series_ids, _, counts, rating_sums = load_rating_matrices(daily_csv)
+            model = rating_model(counts, rating_sums, n_days, read_prior_mean_rating(baseline_file),
+                                 [ensemble_mean], [ensemble_sd])
+            kind = "ratings"
+        model = {key: value[[series_ids.index(SINGLE_SERIES_ID)]] for key, value in model.items()}
+        means, quantiles = simulate(kind, model, n_draws, seed)
+        final_data["predictive_distribution"] = distribution_summary(means[0], quantiles[:, 0], n_draws, seed)
+        with open(final_file, 'w') as f:
+            json.dump(final_data, f, indent=4)
+        intervals = final_data["predictive_distribution"]["intervals"]
+        print(f"{target}: median {final_data['predictive_distribution']['quantiles']['0.5']}, "
+              + ", ".join(f"{name} interval {lo}-{hi}" for name, (lo, hi) in intervals.items())
+              + f" (saved to {final_file})")
+        run_registry.record_final(target, final_data, kind="simulation",
+                                  config={"n_draws": n_draws, "seed": seed, "ensemble_weight": ENSEMBLE_WEIGHT})
+
+def simulate_series_table(daily_csv, series_column, output_csv_file, kind="posts", n_draws=SIMULATION_DRAWS,
+                          seed=SIMULATION_SEED, forecast_start=None, forecast_end=None, baseline_file="hotel_baseline.txt",
+                          workers=None):
+    """Writes the simulated mean and quantiles of every series in a long-format daily table (statistical level only)."""
+    import pandas as pd
+    start, end = forecast_dates(forecast_start, forecast_end)
+    n_days = (end - start).days + 1
+    if kind == "posts":
+        series_ids, _, Y = load_post_count_matrix(daily_csv, series_column)
+        model = post_count_model(Y, n_days)
+    else:
+        series_ids, _, counts, rating_sums = load_rating_matrices(daily_csv, series_column)
+        model = rating_model(counts, rating_sums, n_days, read_prior_mean_rating(baseline_file))
+    means, quantiles = simulate(kind, model, n_draws, seed, workers=workers)
+    table = pd.DataFrame({series_column: series_ids, "mean": means.round(2)})
+    for q, values in zip(QUANTILES, quantiles):
+        table[f"q{q:g}"] = values.round(2)
+    table.to_csv(output_csv_file, index=False)
+    print(f"Simulated {n_draws} draws for {len(series_ids)} series; quantiles saved to {output_csv_file}")
+
+def benchmark_simulation(n_series=2000, n_draws=SIMULATION_DRAWS, n_days=60, workers=None):
+    """Times simulating both kinds of series on synthetic data, with an ensemble level for every series."""
+    import time
+    import numpy as np
+    rng = np.random.default_rng(0)
+    rates = rng.gamma(2.0, 8.0, size=(n_series, 1))
+    posts = rng.negative_binomial(3, 3 / (3 + rates), size=(n_series, n_days)).astype(float)
+    reviews = rng.poisson(rng.gamma(2.0, 1.0, size=(n_series, 1)), size=(n_series, n_days)).astype(float)
+    ratings = np.clip(rng.normal(rng.normal(4.1, 0.3, size=(n_series, 1)), 0.5, size=(n_series, n_days)), 1, 5).round(1)
+    ensemble = rng.normal(1.0, 0.05, size=n_series)
+    timings = {}
+    for kind, model in (
+        ("posts", post_count_model(posts, 5, rates[:, 0] * ensemble, rates[:, 0] * 0.05)),
+        ("ratings", rating_model(reviews, reviews * ratings, 5, 4.1, np.clip(4.1 * ensemble, 1, 5), np.full(n_series, 0.1))),
+    ):
+        t0 = time.perf_counter()
+        simulate(kind, model, n_draws, workers=workers)
+        timings[kind] = time.perf_counter() - t0
+        print(f"Simulated {n_series} {kind} series x {n_draws} draws ({n_series * n_draws:,} outcomes) "
+              f"in {timings[kind]:.2f}s with {workers or os.cpu_count() or 1} worker(s)")
+    return timings
+
+if __name__ == "__main__":
+    simulate_forecasts()
@@ -0,0 +1,359 @@
+import os
+import json
+from datetime import datetime, timedelta
+import run_registry
+
+# Local statistical forecasters that join the LLM ensemble as zero-cost members:
+#   post counts - seasonal naive, simple exponential smoothing, and a Poisson model that becomes
+#                 negative binomial when the recent counts are overdispersed
+#   ratings     - the recent mean rating shrunk towards a prior mean (empirical Bayes)
+# Every model is fitted on a (series x days) matrix at once, so the same code fits the single
+# series in trump_posts_daily.csv / hotel_daily_metrics.csv or thousands of series from a
+# long-format table (e.g. truth_social_posts_daily.csv from process-accounts).
+# Results are appended to *_preds_raw.json with provider "statistical".
+
+PROVIDER = "statistical"
+SEASON_DAYS = 7
+COUNT_WINDOW_DAYS = 28     # Days of history the count model's mean and variance come from
+SES_ALPHAS = [0.05 * i for i in range(1, 20)]
+INTERVAL_COVERAGE = 0.8
+# Used when there are too few series to estimate the prior from the data: the prior counts as
+# this many reviews at the baseline mean rating.
+RATING_PRIOR_STRENGTH = 10
+MIN_SERIES_FOR_POOLED_PRIOR = 20
+SINGLE_SERIES_ID = "all"
+
+def forecast_dates(forecast_start, forecast_end):
+    from build_prompt_context import FORECAST_START, FORECAST_END
+    start = datetime.strptime(forecast_start, "%Y-%m-%d").date() if forecast_start else FORECAST_START
+    end = datetime.strptime(forecast_end, "%Y-%m-%d").date() if forecast_end else FORECAST_END
+    return start, end
+
+def daily_matrix(df, value_columns, series_column=None, date_column="date"):
+    """
+    Pivots a daily table into one (series x days) float matrix per value column, over every day
+    from the first to the last date in the table; days missing from the table are zeros.
+    Returns (series_ids, last_date, {column: matrix}).
+    """
+    import numpy as np
+    import pandas as pd
+    df = df.copy()
+    df[date_column] = pd.to_datetime(df[date_column]).dt.normalize()
+    if series_column is None:
+        series_column = "_series"
+        df[series_column] = SINGLE_SERIES_ID
+    days = pd.date_range(df[date_column].min(), df[date_column].max(), freq="D")
+    matrices = {}
+    for column in value_columns:
+        table = df.pivot_table(index=series_column, columns=date_column, values=column, aggfunc="sum", fill_value=0)
+        matrices[column] = table.reindex(columns=days, fill_value=0).to_numpy(dtype=np.float64)
+    return table.index.tolist(), days[-1].date(), matrices
+
+def seasonal_naive(Y, horizon_offsets, season=SEASON_DAYS):
+    """
+    Mean over the forecast days of the value observed one (or more) whole seasons earlier.
+    horizon_offsets are the forecast days as offsets (>= 1) from the last observed day.
+    """
+    import numpy as np
+    offsets = np.asarray(horizon_offsets)
+    source = Y.shape[1] - 1 + offsets - season * -(-offsets // season)
+    return Y[:, source].mean(axis=1)
+
+def simple_exponential_smoothing(Y, alphas=SES_ALPHAS):
+    """
+    Fits the smoothing constant per series by one-step-ahead squared error over a grid of alphas,
+    all series and alphas updated together. Returns (final level, chosen alpha) per series.
+    """
+    import numpy as np
+    alphas = np.asarray(alphas)
+    level = np.repeat(Y[:, :1], len(alphas), axis=1)
+    sse = np.zeros_like(level)
+    for t in range(1, Y.shape[1]):
+        error = Y[:, t:t + 1] - level
+        sse += error ** 2
+        level += alphas * error
+    best = sse.argmin(axis=1)
+    rows = np.arange(Y.shape[0])
+    return level[rows, best], alphas[best]
+
+def count_model(Y, n_days, window=COUNT_WINDOW_DAYS, coverage=INTERVAL_COVERAGE):
+    """
+    Poisson rate from the last `window` days, or a negative binomial with method-of-moments
+    dispersion where the counts are overdispersed. The interval is for the mean daily count over
+    n_days forecast days, from the exact distribution of their sum.
+    Returns (mean, low, high, is_negative_binomial) per series.
+    """
+    import numpy as np
+    recent = Y[:, -window:]
+    mean = recent.mean(axis=1)
+    var = recent.var(axis=1, ddof=1) if recent.shape[1] > 1 else mean
+    overdispersed = var > mean * 1.0001
+    # Sum of n_days iid counts: Poisson(n * mean) or NB(n * r, p) with r = mean^2 / (var - mean).
+    r = np.where(overdispersed, mean ** 2 / np.where(overdispersed, var - mean, 1.0), np.inf)
+    total_mean = n_days * mean
+    total_sd = np.sqrt(n_days * np.maximum(var, mean))
+    k_max = int(np.ceil((total_mean + 10 * total_sd).max())) + 10
+    k = np.arange(k_max)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # log pmf built from the ratio p(k+1) / p(k), which is stable for large means.
+        nb_p = np.where(overdispersed, r / (r + mean), 1.0)
+        nb_r = np.where(overdispersed, n_days * r, 0.0)
+        log_p0 = np.where(overdispersed, nb_r * np.log(nb_p), -total_mean)
+        log_ratio = np.where(overdispersed[:, None],
+                             np.log(k[None, :-1] + nb_r[:, None]) + np.log1p(-nb_p)[:, None],
+                             np.log(total_mean)[:, None]) - np.log(k[None, 1:])
+    log_pmf = np.concatenate([log_p0[:, None], log_p0[:, None] + np.cumsum(log_ratio, axis=1)], axis=1)
+    cdf = np.cumsum(np.exp(np.nan_to_num(log_pmf, nan=-np.inf)), axis=1)
+    cdf[total_mean == 0] = 1.0  # A series with no recent posts: all mass at zero.
+    tail = (1 - coverage) / 2
+    low = (cdf >= tail).argmax(axis=1) / n_days
+    high = (cdf >= 1 - tail).argmax(axis=1) / n_days
+    return mean, low, high, overdispersed
+
+def shrinkage_mean(counts, rating_sums, prior_mean=None, prior_strength=None):
+    """
+    Mean rating per series shrunk towards a prior: (k * prior + sum of ratings) / (k + n reviews).
+    With enough series the prior mean is the pooled mean and k the ratio of the within-series
+    rating variance to the between-series variance; otherwise prior_mean and prior_strength
+    (RATING_PRIOR_STRENGTH by default) are used. Returns (shrunk mean, raw mean, n, k) per series.
+    """
+    import numpy as np
+    n = counts.sum(axis=1)
+    total = rating_sums.sum(axis=1)
+    raw = np.divide(total, n, out=np.full(len(n), np.nan), where=n > 0)
+    k = float(prior_strength or RATING_PRIOR_STRENGTH)
+    if len(n) >= MIN_SERIES_FOR_POOLED_PRIOR and (n > 0).sum() >= MIN_SERIES_FOR_POOLED_PRIOR:
+        prior_mean = total.sum() / n.sum()
+        # Each day's mean has variance sigma^2 / count, so count * (day mean - series mean)^2
+        # estimates sigma^2.
+        day_means = np.divide(rating_sums, counts, out=np.zeros_like(rating_sums), where=counts > 0)
+        deviations = counts * (day_means - np.nan_to_num(raw)[:, None]) ** 2
+        within = deviations.sum() / max((counts > 0).sum() - (n > 0).sum(), 1)
+        rated = n > 0
+        between = raw[rated].var() - (within / n[rated]).mean()
+        if between > 0:
+            k = within / between
+    elif prior_mean is None:
+        raise ValueError("prior_mean is required when there are too few series to pool")
+    return (k * prior_mean + total) / (k + n), raw, n, k
+
+def _member(model_name, forecast, description, data_file):
+    return {
+        "provider": PROVIDER,
+        "model_name": model_name,
+        "temperature": None,
+        "prompt_file": None,
+        "data_file": data_file,
+        "raw_response": f"{description}\nFinal Forecast: {forecast:.2f}",
+        "extracted_forecast": round(float(forecast), 2),
+        "error_message": None,
+    }
+
+def load_post_count_matrix(daily_csv="trump_posts_daily.csv", series_column=None):
+    """Reads a daily post-count table (date, post_count[, series_column]); returns (series_ids, last_day, Y)."""
+    import pandas as pd
+    series_ids, last_day, matrices = daily_matrix(pd.read_csv(daily_csv, encoding='utf-8-sig'), ["post_count"], series_column)
+    return series_ids, last_day, matrices["post_count"]
+
+def load_rating_matrices(daily_csv="hotel_daily_metrics.csv", series_column=None):
+    """
+    Reads a daily review table (date, new_review_count, mean_rating[, series_column]); returns
+    (series_ids, last_day, review counts, rating sums).
+    """
+    import pandas as pd
+    df = pd.read_csv(daily_csv, encoding='utf-8-sig')
+    df["rating_sum"] = df["mean_rating"] * df["new_review_count"]
+    series_ids, last_day, matrices = daily_matrix(df, ["new_review_count", "rating_sum"], series_column)
+    return series_ids, last_day, matrices["new_review_count"], matrices["rating_sum"]
+
+def fit_post_count_models(Y, last_day, start, end):
+    """
+    Fits all post-count models to Y for the forecast period start..end (dates after last_day).
+    Returns a dict of per-series arrays: seasonal_naive (NaN with less than a season of data),
+    exponential_smoothing, alpha, count_mean, low, high and overdispersed.
+    """
+    import numpy as np
+    offsets = np.arange((start - last_day).days, (end - last_day).days + 1)
+    if offsets[0] < 1:
+        raise ValueError(f"Forecast period starts on {start}, not after the last day of data ({last_day})")
+    level, alpha = simple_exponential_smoothing(Y)
+    mean, low, high, overdispersed = count_model(Y, len(offsets))
+    return {
+        "seasonal_naive": seasonal_naive(Y, offsets) if Y.shape[1] >= SEASON_DAYS else np.full(len(Y), np.nan),
+        "exponential_smoothing": level,
+        "alpha": alpha,
+        "count_mean": mean,
+        "low": low,
+        "high": high,
+        "overdispersed": overdispersed,
+    }
+
+def review_rating_variance(counts, rating_sums):
+    """
+    Per-series variance of a single review's rating, from how far each day's mean strays from the
+    series mean (count-weighted); series with fewer than two rated days get the pooled variance.
+    """
+    import numpy as np
+    n = counts.sum(axis=1)
+    days_with_reviews = (counts > 0).sum(axis=1)
+    series_mean = np.divide(rating_sums.sum(axis=1), n, out=np.zeros(len(n)), where=n > 0)
+    day_means = np.divide(rating_sums, counts, out=np.zeros_like(rating_sums), where=counts > 0)
+    deviations = (counts * (day_means - series_mean[:, None]) ** 2).sum(axis=1)
+    pooled = deviations.sum() / max((days_with_reviews - 1).clip(min=0).sum(), 1)
+    within = np.where(days_with_reviews > 1, deviations / np.maximum(days_with_reviews - 1, 1), pooled)
+    return np.where(within > 0, within, pooled if pooled > 0 else 1.0)
+
+def rating_interval(counts, rating_sums, shrunk, prior_strength, n_days, coverage=INTERVAL_COVERAGE):
+    """
+    Normal-approximation interval for the mean rating of the reviews posted over n_days: the
+    uncertainty of the shrunk mean plus the sampling noise of the reviews expected in the period
+    (at the series' recent daily rate, at least one). Returns (low, high) clipped to 1-5 stars.
+    """
+    import numpy as np
+    from statistics import NormalDist
+    n = counts.sum(axis=1)
+    within = review_rating_variance(counts, rating_sums)
+    expected_reviews = np.maximum(n / counts.shape[1] * n_days, 1.0)
+    sd = np.sqrt(within / (n + prior_strength) + within / expected_reviews)
+    z = NormalDist().inv_cdf(1 - (1 - coverage) / 2)
+    return np.clip(shrunk - z * sd, 1.0, 5.0), np.clip(shrunk + z * sd, 1.0, 5.0)
+
+def fit_rating_models(counts, rating_sums, start, end, prior_mean=None):
+    """Returns a dict of per-series arrays: shrinkage_mean, raw_mean, n_reviews, low, high, plus the prior strength k."""
+    shrunk, raw, n, k = shrinkage_mean(counts, rating_sums, prior_mean)
+    low, high = rating_interval(counts, rating_sums, shrunk, k, (end - start).days + 1)
+    return {"shrinkage_mean": shrunk, "raw_mean": raw, "n_reviews": n, "low": low, "high": high, "k": k}
+
+def post_members(fit, i, last_day, n_history_days, period, data_file):
+    import numpy as np
+    entries = []
+    if not np.isnan(fit["seasonal_naive"][i]):
+        entries.append(_member(f"seasonal_naive_{SEASON_DAYS}d", fit["seasonal_naive"][i],
+                               f"Seasonal naive ({SEASON_DAYS}-day season, data to {last_day}): average daily posts "
+                               f"for {period} taken from the same weekdays in the last observed week(s).", data_file))
+    entries.append(_member("exponential_smoothing", fit["exponential_smoothing"][i],
+                           f"Simple exponential smoothing (alpha={fit['alpha'][i]:.2f}, fitted on {n_history_days} days to "
+                           f"{last_day}): flat forecast of the smoothed daily post count for {period}.", data_file))
+    name = "negative_binomial" if fit["overdispersed"][i] else "poisson"
+    entries.append(_member(name, fit["count_mean"][i],
+                           f"{name.replace('_', ' ').capitalize()} model of the last {min(COUNT_WINDOW_DAYS, n_history_days)} "
+                           f"days: average daily posts for {period}, {INTERVAL_COVERAGE:.0%} interval "
+                           f"{fit['low'][i]:.1f}-{fit['high'][i]:.1f}.", data_file))
+    return entries
+
+def rating_members(fit, i, last_day, period, data_file):
+    n = int(fit["n_reviews"][i])
+    raw_text = f"{fit['raw_mean'][i]:.2f} from {n} reviews" if n else "no reviews"
+    return [_member("shrinkage_mean", fit["shrinkage_mean"][i],
+                    f"Shrinkage mean: recent mean rating ({raw_text} up to {last_day}) shrunk towards the prior "
+                    f"with the weight of {fit['k']:.1f} reviews; flat forecast for {period}, "
+                    f"{INTERVAL_COVERAGE:.0%} interval {fit['low'][i]:.2f}-{fit['high'][i]:.2f}.", data_file)]
+
+def forecast_post_counts(daily_csv="trump_posts_daily.csv", forecast_start=None, forecast_end=None,
+                         series_column=None):
+    """
+    Fits the post-count models to every series in daily_csv (date, post_count[, series_column])
+    and returns {series_id: [member entries]} for the average daily posts over the forecast period.
+    """
+    start, end = forecast_dates(forecast_start, forecast_end)
+    series_ids, last_day, Y = load_post_count_matrix(daily_csv, series_column)
+    fit = fit_post_count_models(Y, last_day, start, end)
+    period = f"{start} to {end}"
+    return {series_id: post_members(fit, i, last_day, Y.shape[1], period, daily_csv)
+            for i, series_id in enumerate(series_ids)}
+
+def read_prior_mean_rating(baseline_file="hotel_baseline.txt"):
+    """The baseline mean rating from calculate_hotel_stats.py, or None if the file doesn't exist."""
+    from build_prompt_context import read_hotel_baseline
+    if not os.path.exists(baseline_file):
+        return None
+    return float(read_hotel_baseline(baseline_file)["baseline_mean_rating"])
+
+def forecast_ratings(daily_csv="hotel_daily_metrics.csv", baseline_file="hotel_baseline.txt",
+                     forecast_start=None, forecast_end=None, series_column=None):
+    """
+    Shrinkage-mean forecast of the average rating over the forecast period for every series in
+    daily_csv (date, new_review_count, mean_rating[, series_column]). Returns {series_id: [member]}.
+    """
+    start, end = forecast_dates(forecast_start, forecast_end)
+    series_ids, last_day, counts, rating_sums = load_rating_matrices(daily_csv, series_column)
+    fit = fit_rating_models(counts, rating_sums, start, end, read_prior_mean_rating(baseline_file))
+    period = f"{start} to {end}"
+    return {series_id: rating_members(fit, i, last_day, period, daily_csv) for i, series_id in enumerate(series_ids)}
+
+def append_statistical_members(raw_predictions_file, members):
+    """Replaces any earlier statistical entries in raw_predictions_file with `members`, keeping the LLM entries."""
+    predictions = []
+    if os.path.exists(raw_predictions_file):
+        with open(raw_predictions_file, 'r') as f:
+            predictions = json.load(f)
+    predictions = [p for p in predictions if p.get("provider") != PROVIDER] + members
+    with open(raw_predictions_file, 'w') as f:
+        json.dump(predictions, f, indent=4)
+    print(f"Added {len(members)} statistical forecasts to {raw_predictions_file}: "
+          + ", ".join(f"{m['model_name']}={m['extracted_forecast']}" for m in members))
+
+def run_statistical_forecasts(targets=("trump", "hotel"), forecast_start=None, forecast_end=None,
+                              trump_daily_csv="trump_posts_daily.csv", hotel_daily_csv="hotel_daily_metrics.csv",
+                              trump_output="trump_preds_raw.json", hotel_output="hotel_preds_raw.json"):
+    """
+    Fits the statistical models and adds them to the raw prediction files as ensemble members.
+    Run it after the ensemble scripts, which rewrite those files.
+    """
+    for target, daily_csv, output, fit in (
+        ("trump", trump_daily_csv, trump_output, forecast_post_counts),
+        ("hotel", hotel_daily_csv, hotel_output, forecast_ratings),
+    ):
+        if target not in targets:
+            continue
+        if not os.path.exists(daily_csv):
+            print(f"Error: {daily_csv} not found; skipping the {target} statistical forecasts.")
+            continue
+        members = fit(daily_csv, forecast_start=forecast_start, forecast_end=forecast_end)
+        append_statistical_members(output, members[SINGLE_SERIES_ID])
+        run_registry.record_predictions("statistical", target, members[SINGLE_SERIES_ID],
+                                        {"forecast_start": forecast_start, "forecast_end": forecast_end})
+
+def forecast_series_table(daily_csv, series_column, output_csv_file, kind="posts", forecast_start=None, forecast_end=None):
+    """Writes one row per (series, model) with the forecast for a long-format daily table of many series."""
+    import pandas as pd
+    if kind == "posts":
+        members = forecast_post_counts(daily_csv, forecast_start, forecast_end, series_column)
+    else:
+        members = forecast_ratings(daily_csv, forecast_start=forecast_start, forecast_end=forecast_end, series_column=series_column)
+    rows = [{series_column: series_id, "model_name": m["model_name"], "forecast": m["extracted_forecast"]}
+            for series_id, entries in members.items() for m in entries]
+    pd.DataFrame(rows).to_csv(output_csv_file, index=False)
+    print(f"Statistical forecasts for {len(members)} series saved to {output_csv_file}")
+
+def benchmark_statistical_forecasts(n_series=5000, n_days=60):
+    """Times fitting all post-count models and the shrinkage mean on synthetic series."""
+    import time
+    import tempfile
+    import numpy as np
+    import pandas as pd
+    from build_prompt_context import FORECAST_START
+    rng = np.random.default_rng(0)
+    days = pd.date_range(end=FORECAST_START - timedelta(days=4), periods=n_days, freq="D")
+    rates = rng.gamma(2.0, 8.0, size=(n_series, 1))
+    posts = rng.negative_binomial(3, 3 / (3 + rates), size=(n_series, n_days))
+    reviews = rng.poisson(rng.gamma(2.0, 1.0, size=(n_series, 1)), size=(n_series, n_days))
+    ratings = np.clip(rng.normal(rng.normal(4.1, 0.3, size=(n_series, 1)), 0.5, size=(n_series, n_days)), 1, 5).round(1)
+    series = np.repeat(np.arange(n_series), n_days)
+    long = pd.DataFrame({"account": series, "date": np.tile(days.strftime("%Y-%m-%d"), n_series),
+                         "post_count": posts.ravel(), "new_review_count": reviews.ravel(),
+                         "mean_rating": np.where(reviews > 0, ratings, 0.0).ravel()})
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "series.csv")
+        long.to_csv(path, index=False)
+        t0 = time.perf_counter()
+        post_members = forecast_post_counts(path, series_column="account")
+        t1 = time.perf_counter()
+        rating_members = forecast_ratings(path, baseline_file=os.path.join(tmp, "none.txt"), series_column="account")
+        t2 = time.perf_counter()
+    print(f"Fitted 3 post-count models to {len(post_members)} series x {n_days} days in {t1 - t0:.2f}s "
+          f"and the shrinkage mean to {len(rating_members)} series in {t2 - t1:.2f}s (CSV reading included).")
+    return t2 - t0
+
+if __name__ == "__main__":
+    run_statistical_forecasts()
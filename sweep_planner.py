@@ -0,0 +1,182 @@
+import os
+import json
+import hashlib
+
+# Plans and runs prompt x model x temperature x window sweeps from a declarative grid.
+#   - A sweep is a list of named experiments, each a grid over targets, prompts, models,
+#     temperatures and backtest windows (see DEFAULT_SWEEP, or pass a JSON file of the same shape).
+#   - Cells that would send the identical request (same rendered prompt, provider, model,
+#     temperature and max tokens), whether in another experiment or another target, share one
+#     call.
+#   - The unique requests run as one backtest_scheduler job, so every experiment and target draws
+#     from the same concurrency budget, and an interrupted sweep resumes.
+#   - Each cell's result goes into a results cube (one row per experiment x target x prompt x
+#     model x temperature x window) saved as SWEEP_CUBE_FILE. slice_cube() gives the MAE by any
+#     combination of dimensions.
+
+SWEEP_CUBE_FILE = "sweep_cube.csv"
+DEFAULT_MAX_IN_FLIGHT = 32
+CUBE_DIMENSIONS = ["experiment", "target", "prompt_file", "provider", "model_name", "temperature", "window_start"]
+
+# The ensemble composition at its temperatures against every prompt, and the backtest model
+# (the only one the evaluate scripts try) across a wider temperature range.
+DEFAULT_SWEEP = {
+    "name": "sweep",
+    "n_windows": 20,
+    "experiments": [
+        {"name": "ensemble-models"},
+        {"name": "backtest-temperatures", "models": ["openai:gpt-3.5-turbo"], "temperatures": [0.0, 0.2, 0.5, 0.7, 1.0]},
+    ],
+}
+
+def load_sweep(sweep_file=None):
+    if not sweep_file:
+        return DEFAULT_SWEEP
+    with open(sweep_file, 'r') as f:
+        return json.load(f)
+
+def expand_sweep(sweep):
+    """
+    Every cell of every experiment as (experiment, task) pairs, with task a backtest_scheduler task
+    tuple. Experiment keys not given fall back to the sweep's, then to plan_tasks' defaults;
+    "prompts" may be a list or a {target: [prompt files]} mapping.
+    """
+    import backtest_scheduler
+    cells = []
+    for experiment in sweep["experiments"]:
+        settings = {key: experiment.get(key, sweep.get(key)) for key in
+                    ("targets", "prompts", "models", "temperatures", "n_windows")}
+        models = [tuple(m.split(":", 1)) if isinstance(m, str) else tuple(m) for m in settings["models"]] \
+            if settings["models"] else None
+        for target in settings["targets"] or backtest_scheduler.TARGETS:
+            prompts = settings["prompts"]
+            if isinstance(prompts, dict):
+                prompts = prompts.get(target)
+            tasks = backtest_scheduler.plan_tasks([target], prompts, models, settings["temperatures"],
+                                                  settings["n_windows"] or backtest_scheduler.DEFAULT_WINDOWS)
+            cells.extend((experiment["name"], task) for task in tasks)
+    return cells
+
+def request_key(task, templates):
+    """Hash of what is actually sent for a task: rendered prompt, provider, model, temperature, max tokens."""
+    import backtest_scheduler
+    target, prompt_file, provider, model_name, temperature, window_start, window_end, _ = task
+    if prompt_file not in templates:
+        with open(prompt_file, 'r') as f:
+            templates[prompt_file] = f.read()
+    prompt = backtest_scheduler.render_prompt(target, templates[prompt_file], window_start, window_end)
+    max_tokens = backtest_scheduler._module(target, "ensemble_module").MAX_TOKENS.get(provider)
+    return hashlib.sha256(json.dumps([prompt, provider, model_name, temperature, max_tokens]).encode("utf-8")).hexdigest()
+
+def deduplicate(cells):
+    """
+    Returns the tasks to run (one per distinct request) and, for each cell, the task whose result it
+    uses.
+    """
+    templates, first_task, unique_tasks, cell_tasks = {}, {}, [], []
+    for _, task in cells:
+        key = request_key(task, templates)
+        if key not in first_task:
+            first_task[key] = task
+            unique_tasks.append(task)
+        cell_tasks.append(first_task[key])
+    return unique_tasks, cell_tasks
+
+def build_cube(cells, cell_tasks, job, queue_db=None):
+    """The results cube: one row per cell with the forecast of the task it shares, scored against its own ground truth."""
+    import pandas as pd
+    import backtest_scheduler
+    conn = backtest_scheduler.connect(queue_db or backtest_scheduler.QUEUE_DB)
+    results = {tuple(row[:7]): row[7:] for row in conn.execute(
+        "SELECT target, prompt_file, provider, model_name, temperature, window_start, window_end, forecast, latency_ms "
+        "FROM tasks WHERE job = ? AND status = 'done'", (job,))}
+    conn.close()
+    rows = []
+    for (experiment, task), shared_task in zip(cells, cell_tasks):
+        target, prompt_file, provider, model_name, temperature, window_start, window_end, truth = task
+        forecast, latency_ms = results.get(tuple(shared_task[:7]), (None, None))
+        rows.append((experiment, target, prompt_file, provider, model_name, temperature, window_start, window_end,
+                     truth, forecast, None if forecast is None else round(abs(forecast - truth), 4), latency_ms,
+                     shared_task != task))
+    cube = pd.DataFrame(rows, columns=CUBE_DIMENSIONS + ["window_end", "ground_truth", "forecast", "abs_error",
+                                                          "latency_ms", "shared_call"])
+    # Categorical dimensions keep groupby slicing fast on large sweeps
+    for column in CUBE_DIMENSIONS:
+        if column != "temperature":
+            cube[column] = cube[column].astype("category")
+    return cube
+
+def load_cube(cube_file=SWEEP_CUBE_FILE):
+    import pandas as pd
+    cube = pd.read_csv(cube_file)
+    for column in CUBE_DIMENSIONS:
+        if column != "temperature":
+            cube[column] = cube[column].astype(str).astype("category")
+    return cube
+
+def slice_cube(cube, by, where=None):
+    """
+    MAE and counts grouped by the `by` dimensions, best first, over the cells matching `where`
+    ({dimension: value or list of values}). Cells whose call failed are left out.
+    """
+    for dimension, values in (where or {}).items():
+        values = values if isinstance(values, (list, tuple, set)) else [values]
+        if dimension == "temperature":
+            values = [float(v) for v in values]
+        cube = cube[cube[dimension].isin(values)]
+    grouped = cube.dropna(subset=["abs_error"]).groupby(list(by), observed=True)["abs_error"]
+    return grouped.agg(n="count", mae="mean").round({"mae": 3}).sort_values("mae").reset_index()
+
+def run_sweep(sweep_file=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT, workers=None, dry_run=False,
+              cube_file=SWEEP_CUBE_FILE, queue_db=None):
+    """
+    Expands the sweep, deduplicates its requests and runs them as one backtest job with at most
+    max_in_flight calls in flight in total, then writes the results cube. With dry_run, only
+    reports the plan.
+    """
+    import backtest_scheduler
+    sweep = load_sweep(sweep_file)
+    cells = expand_sweep(sweep)
+    unique_tasks, cell_tasks = deduplicate(cells)
+    print(f"Sweep '{sweep['name']}': {len(sweep['experiments'])} experiments, {len(cells)} cells, "
+          f"{len(unique_tasks)} distinct calls ({len(cells) - len(unique_tasks)} shared).")
+    for experiment in dict.fromkeys(name for name, _ in cells):
+        in_experiment = [t for (name, _), t in zip(cells, cell_tasks) if name == experiment]
+        print(f"  {experiment}: {len(in_experiment)} cells, {len(set(in_experiment))} distinct calls")
+    if dry_run or not unique_tasks:
+        return None
+
+    workers = workers or min(os.cpu_count() or 1, max(1, max_in_flight // backtest_scheduler.DEFAULT_CONCURRENCY))
+    concurrency = max(1, max_in_flight // workers)
+    queue_db = queue_db or backtest_scheduler.QUEUE_DB
+    backtest_scheduler.run_backtest(tasks=unique_tasks, workers=workers, concurrency=concurrency, job=sweep["name"],
+                                    queue_db=queue_db, output_csv_file=f"{sweep['name']}_mae.csv")
+
+    cube = build_cube(cells, cell_tasks, sweep["name"], queue_db)
+    cube.to_csv(cube_file, index=False)
+    print(f"\nResults cube ({len(cube)} cells, {int(cube['abs_error'].notna().sum())} scored) saved to {cube_file}")
+    for dimension in ("model_name", "temperature", "prompt_file"):
+        print(f"\nMAE by target and {dimension}:")
+        print(slice_cube(cube, ["target", dimension]).to_string(index=False))
+    return cube
+
+def print_cube_slice(by, where=None, cube_file=SWEEP_CUBE_FILE):
+    """Prints slice_cube for a saved cube; where is a list of "dimension=value" strings."""
+    if not os.path.exists(cube_file):
+        print(f"Error: Results cube {cube_file} not found. Run the sweep first.")
+        return
+    conditions = {}
+    for condition in where or []:
+        dimension, _, value = condition.partition("=")
+        if dimension not in CUBE_DIMENSIONS:
+            print(f"Error: Unknown dimension '{dimension}' (expected one of {', '.join(CUBE_DIMENSIONS)}).")
+            return
+        conditions.setdefault(dimension, []).append(value)
+    unknown = [d for d in by if d not in CUBE_DIMENSIONS]
+    if unknown:
+        print(f"Error: Unknown dimension(s) {', '.join(unknown)} (expected one of {', '.join(CUBE_DIMENSIONS)}).")
+        return
+    print(slice_cube(load_cube(cube_file), by, conditions).to_string(index=False))
+
+if __name__ == "__main__":
+    run_sweep()